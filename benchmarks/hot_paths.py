@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+# Benchmarks of the hot paths of hamoco (landmark processing, filtering, mouse
+# control, overlays, inference and dataset loading). They run on a headless
+# CPU machine: inputs are built from the images and `.dat` snapshots bundled
+# in tests/data, mouse calls are recorded instead of executed, and datasets of
+# increasing size are synthesized from the snapshots. Results are saved to a
+# JSON file that can serve as a baseline for the next runs: benchmarks that
+# got slower than the baseline by more than a threshold are reported as
+# regressions (and the script exits with a non-zero status).
+
+import os
+import sys
+import json
+import timeit
+import itertools
+import platform
+import tempfile
+import argparse
+import types
+
+import numpy
+
+path_to_repository = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+path_to_tests_data = os.path.join(path_to_repository, 'tests', 'data')
+# The package of the checkout is benchmarked, even if it is not installed
+sys.path.insert(0, path_to_repository)
+
+class Skip(Exception):
+    pass
+
+# Inputs shared by the benchmarks
+
+def bundled_samples():
+    '''Features and labels of the `.dat` snapshots in tests/data.'''
+    from hamoco.dataset import list_text_samples, read_text_sample
+    samples = [read_text_sample(path) for path in list_text_samples(path_to_tests_data)]
+    X = numpy.array([x for x, _ in samples], dtype=numpy.float32)
+    y = numpy.array([y for _, y in samples], dtype=numpy.int32)
+    return X, y
+
+def bundled_images():
+    '''Images in tests/data (sorted by name).'''
+    import cv2
+    files = sorted(f for f in os.listdir(path_to_tests_data) if f.endswith('.jpg'))
+    return [cv2.imread(os.path.join(path_to_tests_data, f)) for f in files]
+
+def raw_landmarks(X):
+    '''Landmark coordinates in [0, 1] (like mediapipe's) from processed features.'''
+    return 0.5 + 0.1 * X.astype(numpy.float64)
+
+def detect_landmarks(images):
+    '''Mediapipe hand landmarks detected in the images (None if mediapipe is not installed).'''
+    try:
+        import mediapipe as mp
+    except ImportError:
+        return None
+    with mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=1) as hands:
+        results = [hands.process(image) for image in images]
+    return [result.multi_hand_landmarks[0] for result in results if result.multi_hand_landmarks]
+
+def synthetic_dataset(path, n_samples, X, y, seed=0):
+    '''Write a binary dataset with `n_samples` noisy copies of the raw landmarks of the snapshots.'''
+    from hamoco.dataset import DatasetWriter
+    rng = numpy.random.default_rng(seed)
+    chunk_size = 65536
+    with DatasetWriter(path, n_features=X.shape[1]) as writer:
+        for start in range(0, n_samples, chunk_size):
+            n = min(chunk_size, n_samples - start)
+            indices = rng.integers(len(y), size=n)
+            features = raw_landmarks(X[indices]) + rng.normal(scale=0.01, size=(n, X.shape[1]))
+            writer.extend(y[indices], features, timestamps=numpy.zeros(n))
+
+# Benchmarks: each group yields (name, function, number of items per call)
+
+def bench_hand(context):
+    from hamoco.hand import Hand
+    X = raw_landmarks(context.X)
+    # Mediapipe landmarks, or objects with the same x/y attributes
+    if context.landmarks:
+        landmarks = context.landmarks[0].landmark
+    else:
+        landmarks = [types.SimpleNamespace(x=x, y=y) for x, y in X[0].reshape(-1, 2)]
+    out = numpy.empty(X.shape[1])
+    yield 'vectorize_landmarks', lambda: Hand.vectorize_landmarks(landmarks, out=out), 1
+    processed = numpy.empty((1, X.shape[1]), dtype=numpy.float32)
+    yield 'feature_process_landmarks', lambda: Hand.feature_process_landmarks(X[0], out=processed), 1
+    batch = numpy.resize(X, (10000, X.shape[1]))
+    processed_batch = numpy.empty_like(batch)
+    yield 'feature_process_landmarks[10k]', lambda: Hand.feature_process_landmarks(batch, out=processed_batch), batch.shape[0]
+
+def bench_filter(context):
+    from hamoco.filter import OneEuroFilter, OneEuroArrayFilter
+    one_euro_filter = OneEuroFilter(0, 0.5, min_cutoff=0.1, beta=0.0)
+    frames = itertools.count(1)
+    yield 'OneEuroFilter', lambda: one_euro_filter(next(frames), 0.5), 1
+    landmarks = raw_landmarks(context.X).reshape(len(context.y), -1, 2)
+    array_filter = OneEuroArrayFilter(0, landmarks[0], min_cutoff=0.1, beta=0.5)
+    out = numpy.empty_like(landmarks[0])
+    samples = itertools.cycle(landmarks)
+    yield 'OneEuroArrayFilter[21x2]', lambda: array_filter(next(frames), next(samples), out=out), landmarks[0].size
+
+def bench_controller(context):
+    from hamoco.hand import Hand
+    from hamoco.controller import HandyMouseController
+    X = raw_landmarks(context.X)
+    controller = HandyMouseController(backend='recording')
+    samples = itertools.cycle(X)
+    yield 'palm_center', lambda: controller.palm_center(next(samples)), 1
+    # Mostly moves, with clicks, scrolling and dragging from time to time
+    poses = [Hand.Pose.OPEN] * 20 + [Hand.Pose.INDEX_UP] * 2 + [Hand.Pose.CLOSE] * 5 + \
+            [Hand.Pose.THUMB_SIDE] * 10 + [Hand.Pose.OPEN] * 5 + [Hand.Pose.INDEX_MIDDLE_UP] * 10
+    frames = itertools.cycle([(Hand(pose=pose), x) for pose, x in zip(poses, itertools.cycle(X))])
+    def operate():
+        hand, x = next(frames)
+        controller.operate_mouse(hand, controller.palm_center(x), 0.9)
+    yield 'operate_mouse', operate, 1
+
+def bench_draw(context):
+    from hamoco.utils import draw_control_bounds, draw_palm_center, draw_scrolling_origin, write_pose, draw_hand_landmarks
+    image = context.images[0].copy()
+    height, width, _ = image.shape
+    bounds = [width // 8, height // 8, width - width // 8, height - height // 8]
+    yield 'draw_control_bounds', lambda: draw_control_bounds(image, bounds), 1
+    yield 'draw_palm_center', lambda: draw_palm_center(image, numpy.array([0.5, 0.5]), size=0.03), 1
+    yield 'draw_scrolling_origin', lambda: draw_scrolling_origin(image, 0.5, 0.1), 1
+    yield 'write_pose', lambda: write_pose(image, 'OPEN'), 1
+    if context.landmarks:
+        yield 'draw_hand_landmarks', lambda: draw_hand_landmarks(image, context.landmarks[0]), 1
+    from hamoco.utils import PreviewRenderer
+    renderer = PreviewRenderer()
+    yield 'PreviewRenderer.draw_control_bounds', lambda: renderer.draw_control_bounds(image, bounds), 1
+    if context.landmarks:
+        yield 'PreviewRenderer.draw_hand_landmarks', lambda: renderer.draw_hand_landmarks(image, context.landmarks[0]), 1
+
+def bench_detect(context):
+    try:
+        import mediapipe as mp
+    except ImportError:
+        raise Skip('mediapipe is not installed')
+    from hamoco.sources import downscale
+    hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=1)
+    images = itertools.cycle(context.images)
+    yield 'detect', lambda: hands.process(next(images)), 1
+    # 1080p webcam frame, with the hand tracked from one frame to the next
+    # (full frame, and downscaled as with hamoco-run --working_size)
+    import cv2
+    frame = cv2.resize(cv2.cvtColor(context.images[0], cv2.COLOR_BGR2RGB), (1440, 1080))
+    frame = cv2.copyMakeBorder(frame, 0, 0, 240, 240, cv2.BORDER_REPLICATE)
+    tracking = mp.solutions.hands.Hands(static_image_mode=False, max_num_hands=1)
+    yield 'detect[tracking 1080p]', lambda: tracking.process(frame), 1
+    tracking_downscaled = mp.solutions.hands.Hands(static_image_mode=False, max_num_hands=1)
+    yield 'detect[tracking 1080p->320]', lambda: tracking_downscaled.process(downscale(frame, 320)), 1
+
+def bench_inference(context):
+    from hamoco.hand import Hand
+    from hamoco.inference import load_model
+    from hamoco.models import __default_model__
+    model = load_model(__default_model__)
+    X = Hand.feature_process_landmarks(raw_landmarks(context.X)).astype(numpy.float32)
+    yield 'predict', lambda: model.predict(X[:1]), 1
+    # Both hands classified with a single call
+    hands = numpy.resize(X, (2, X.shape[1]))
+    yield 'predict[2 hands]', lambda: model.predict(hands), 2
+    batch = numpy.resize(X, (1024, X.shape[1]))
+    yield 'predict[1024]', lambda: model.predict(batch), batch.shape[0]
+
+def bench_dataset(context):
+    from hamoco.dataset import list_text_samples, read_text_sample
+    paths = list_text_samples(path_to_tests_data)
+    yield 'read_text_samples', lambda: [read_text_sample(path) for path in paths], len(paths)
+    # Reading and vectorized processing (without Keras, as on a headless machine)
+    from hamoco.cache import load_processed_dataset
+    datasets = []
+    for n_samples in context.sizes:
+        path = os.path.join(context.tmp_dir, f'dataset-{n_samples}.hamoco')
+        synthetic_dataset(path, n_samples, context.X, context.y)
+        datasets.append((n_samples, path))
+        yield f'read_dataset[{size_label(n_samples)}]', lambda path=path: load_processed_dataset(path, cache=False), n_samples
+    # Same through the training model, if Keras is installed
+    try:
+        from hamoco.model import ClassificationModel
+    except ImportError as error:
+        raise Skip(f'cannot import the training model ({error})')
+    model = ClassificationModel()
+    for n_samples, path in datasets:
+        def read_dataset(path=path):
+            model.read_dataset(path)
+            model.process_dataset()
+        yield f'ClassificationModel.read_dataset[{size_label(n_samples)}]', read_dataset, n_samples
+
+def bench_startup(context):
+    from startup import entry_points, start_interpreter
+    for entry_point, module in entry_points.items():
+        yield f'startup[{entry_point}]', lambda module=module: start_interpreter(module), 1
+
+groups = {'hand': bench_hand,
+          'filter': bench_filter,
+          'controller': bench_controller,
+          'draw': bench_draw,
+          'detect': bench_detect,
+          'inference': bench_inference,
+          'dataset': bench_dataset,
+          'startup': bench_startup}
+
+def size_label(n):
+    for factor, suffix in [(1000000, 'M'), (1000, 'k')]:
+        if n >= factor and n % factor == 0:
+            return f'{n // factor}{suffix}'
+    return str(n)
+
+# Measures
+
+def measure(function, repeat=5):
+    '''Time per call (in seconds) over `repeat` runs of as many calls as fit in ~0.2s.'''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = numpy.array(timer.repeat(repeat=repeat, number=number)) / number
+    return {'number': number,
+            'repeat': repeat,
+            'min': float(times.min()),
+            'median': float(numpy.median(times))}
+
+def metadata():
+    from hamoco.core import __version__
+    return {'hamoco': __version__,
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor()}
+
+def compare(results, baseline, threshold):
+    '''Benchmarks slower than in the baseline by more than `threshold` (relative
+    difference of the best time per call), as a list of (name, ratio).'''
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['min'] / baseline[name]['min']
+            if ratio > 1 + threshold:
+                regressions.append((name, ratio))
+    return regressions
+
+def format_time(seconds):
+    for factor, unit in [(1, 's'), (1e-3, 'ms'), (1e-6, 'us')]:
+        if seconds >= factor:
+            return f'{seconds / factor:.3f}{unit}'
+    return f'{seconds / 1e-9:.1f}ns'
+
+def main():
+
+    # Parser
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.description = 'Benchmark the hot paths of hamoco and compare the results to a baseline.'
+    parser.add_argument('groups',
+                        nargs='*',
+                        default=[group for group in groups if group != 'startup'],
+                        help=f'Groups of benchmarks to run, among: {", ".join(groups)}')
+    parser.add_argument('-k', '--filter',
+                        type=str,
+                        default=None,
+                        help='Only run the benchmarks whose name contains this string')
+    parser.add_argument('-s', '--sizes',
+                        nargs='+',
+                        type=int,
+                        default=[10000, 100000, 1000000],
+                        help='Number of samples of the synthetic datasets')
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        default=5,
+                        help='Number of timing runs of each benchmark')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        default=None,
+                        help='Save the results to a JSON file (e.g. to use it as a baseline)')
+    parser.add_argument('-b', '--baseline',
+                        type=str,
+                        default=None,
+                        help='JSON file with previous results to compare to')
+    parser.add_argument('-t', '--threshold',
+                        type=float,
+                        default=0.25,
+                        help='Relative slowdown with respect to the baseline reported as a regression')
+    args = parser.parse_args()
+    for group in args.groups:
+        if group not in groups:
+            parser.error(f'unknown group of benchmarks "{group}"')
+
+    # Inputs
+    X, y = bundled_samples()
+    images = bundled_images()
+    landmarks = detect_landmarks(images) if 'draw' in args.groups or 'hand' in args.groups else None
+    tmp_dir = tempfile.TemporaryDirectory()
+    context = types.SimpleNamespace(X=X, y=y, images=images, landmarks=landmarks,
+                                    sizes=args.sizes, tmp_dir=tmp_dir.name)
+
+    # Run
+    results = {}
+    for group in args.groups:
+        try:
+            for name, function, n_items in groups[group](context):
+                if args.filter is not None and args.filter not in name:
+                    continue
+                try:
+                    result = measure(function, repeat=args.repeat)
+                except Exception as error:
+                    print(f'{name:<32} failed: {error}')
+                    continue
+                result['items'] = n_items
+                results[name] = result
+                per_item = f' ({format_time(result["min"] / n_items)}/item)' if n_items > 1 else ''
+                print(f'{name:<32} min={format_time(result["min"]):>10} median={format_time(result["median"]):>10}{per_item}')
+        except Skip as reason:
+            print(f'{group:<32} skipped: {reason}')
+    tmp_dir.cleanup()
+
+    # Save
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump({'metadata': metadata(), 'benchmarks': results}, output, indent=4)
+
+    # Compare to the baseline
+    if args.baseline is not None:
+        if not os.path.isfile(args.baseline):
+            print(f'# no baseline found at "{args.baseline}"')
+            return
+        with open(args.baseline) as file:
+            baseline = json.load(file)['benchmarks']
+        regressions = compare(results, baseline, args.threshold)
+        for name, ratio in regressions:
+            print(f'# regression: {name} is {ratio:.2f}x slower than the baseline')
+        if regressions:
+            sys.exit(1)
+        print(f'# no regression (threshold: +{100 * args.threshold:.0f}%)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Cold-start time of the console scripts: each entry point module is imported
+# in a fresh interpreter several times, and the import time of the slowest
+# modules is reported with `python -X importtime`.
+
+import os
+import sys
+import time
+import json
+import argparse
+import subprocess
+
+entry_points = {'hamoco': 'hamoco',
+                'hamoco-run': 'hamoco.cli.hamoco_run',
+                'hamoco-data': 'hamoco.cli.hamoco_data',
+                'hamoco-train': 'hamoco.cli.hamoco_train',
+                'hamoco-convert': 'hamoco.cli.hamoco_convert',
+                'hamoco-ingest': 'hamoco.cli.hamoco_ingest'}
+
+# The package of the checkout is imported, even if it is not installed
+path_to_repository = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+def interpreter_environment():
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [path_to_repository, environment.get('PYTHONPATH')]))
+    return environment
+
+def start_interpreter(module):
+    '''Start a fresh interpreter that only imports `module`.'''
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True, env=interpreter_environment())
+
+def startup_time(module, repeat=5):
+    '''Wall-clock times (in seconds) to start an interpreter and import `module`.'''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        start_interpreter(module)
+        times.append(time.perf_counter() - start)
+    return times
+
+def slowest_imports(module, n=10):
+    '''Modules with the largest cumulative import time (in seconds) when importing `module`.'''
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            check=True, capture_output=True, text=True, env=interpreter_environment()).stderr
+    imports = []
+    for line in output.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative) * 1e-6, name.strip()))
+    imports.sort(reverse=True)
+    return imports[:n]
+
+def main():
+
+    # Parser
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.description = 'Measure the cold-start time of the hamoco entry points.'
+    parser.add_argument('entry_points',
+                        nargs='*',
+                        default=list(entry_points),
+                        help='Entry points to measure')
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        default=5,
+                        help='Number of fresh interpreters per entry point')
+    parser.add_argument('-d', '--details',
+                        action='store_true',
+                        help='Show the slowest imports of each entry point')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        default=None,
+                        help='Save the results to a JSON file')
+    args = parser.parse_args()
+
+    # Baseline: empty interpreter
+    results = {'python': startup_time('sys', repeat=args.repeat)}
+    for entry_point in args.entry_points:
+        results[entry_point] = startup_time(entry_points[entry_point], repeat=args.repeat)
+
+    # Report
+    for entry_point, times in results.items():
+        times.sort()
+        print(f'{entry_point:<16} min={times[0]:.3f}s median={times[len(times)//2]:.3f}s')
+        if args.details and entry_point in entry_points:
+            for cumulative, name in slowest_imports(entry_points[entry_point]):
+                print(f'    {cumulative:.3f}s {name}')
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,21 @@
-from .hand import Hand, HandSnapshot
-from .filter import OneEuroFilter
-from .model import ClassificationModel
-from .controller import HandyMouseController
+import importlib
+
+# Public classes and the modules that define them. Modules are only imported
+# when a class is first accessed, so that heavy dependencies (e.g. Keras and
+# TensorFlow for the classification model) are not loaded needlessly.
+_exports = {'Hand': 'hand',
+            'HandSnapshot': 'hand',
+            'OneEuroFilter': 'filter',
+            'OneEuroArrayFilter': 'filter',
+            'HandyMouseController': 'controller',
+            'NumpyModel': 'inference',
+            'ClassificationModel': 'model'}
+
+def __getattr__(name):
+    if name in _exports:
+        module = importlib.import_module(f'.{_exports[name]}', __name__)
+        return getattr(module, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(list(globals()) + list(_exports))
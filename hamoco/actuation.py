@@ -0,0 +1,227 @@
+import time
+
+class MouseBackend:
+    '''Base class of the mouse actuation backends. Relative pointer moves and
+    scroll ticks are accumulated by `move` and `scroll`, and sent as a single
+    event of each kind by `flush` (once per actuation tick). Button events are
+    sent immediately, after the pending moves.'''
+
+    def __init__(self):
+        self._dx = 0.0
+        self._dy = 0.0
+        self._scroll = 0
+        # Number of events sent to the system
+        self.n_events = 0
+
+    def size(self):
+        '''Screen resolution (width, height) in pixels.'''
+        raise NotImplementedError
+
+    def position(self):
+        '''Current pointer position (x, y) in pixels.'''
+        raise NotImplementedError
+
+    def move(self, dx, dy):
+        self._dx += dx
+        self._dy += dy
+
+    def scroll(self, clicks):
+        self._scroll += clicks
+
+    def flush(self):
+        '''Send the pending pointer move and scroll ticks.'''
+        # Sub-pixel moves are kept for the next tick
+        dx, dy = int(round(self._dx)), int(round(self._dy))
+        if dx != 0 or dy != 0:
+            self._dx -= dx
+            self._dy -= dy
+            self._move(dx, dy)
+            self.n_events += 1
+        if self._scroll != 0:
+            clicks, self._scroll = self._scroll, 0
+            self._scroll_clicks(clicks)
+            self.n_events += 1
+
+    def left_click(self):
+        self._button('left', down=True)
+        self._button('left', down=False)
+
+    def right_click(self):
+        self._button('right', down=True)
+        self._button('right', down=False)
+
+    def mouse_down(self):
+        self._button('left', down=True)
+
+    def mouse_up(self):
+        self._button('left', down=False)
+
+    def close(self):
+        pass
+
+    def _button(self, button, down):
+        # The button is pressed or released where the pointer is expected to be
+        self.flush()
+        self._press(button, down)
+        self.n_events += 1
+
+    def _move(self, dx, dy):
+        raise NotImplementedError
+
+    def _scroll_clicks(self, clicks):
+        raise NotImplementedError
+
+    def _press(self, button, down):
+        raise NotImplementedError
+
+class PyAutoGUIBackend(MouseBackend):
+    '''Mouse actions performed with pyautogui (cross-platform).'''
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+        # Allow mouse to go on the border of the screen
+        pyautogui.FAILSAFE = False
+        self.pyautogui = pyautogui
+
+    def size(self):
+        return tuple(self.pyautogui.size())
+
+    def position(self):
+        return tuple(self.pyautogui.position())
+
+    def _move(self, dx, dy):
+        self.pyautogui.move(dx, dy, _pause=False)
+
+    def _scroll_clicks(self, clicks):
+        self.pyautogui.scroll(clicks, _pause=False)
+
+    def _press(self, button, down):
+        if down:
+            self.pyautogui.mouseDown(button=button, _pause=False)
+        else:
+            self.pyautogui.mouseUp(button=button, _pause=False)
+
+class XTestBackend(MouseBackend):
+    '''Mouse actions sent directly to the X server with the XTest extension
+    (Linux/X11, requires python-xlib).'''
+
+    buttons = {'left': 1, 'right': 3}
+    # Wheel buttons
+    scroll_up = 4
+    scroll_down = 5
+
+    def __init__(self, display=None):
+        super().__init__()
+        from Xlib import X, display as xdisplay
+        from Xlib.ext import xtest
+        self.X = X
+        self.xtest = xtest
+        self.display = xdisplay.Display(display)
+        if not self.display.has_extension('XTEST'):
+            raise RuntimeError('the X server does not support the XTest extension')
+        self.screen = self.display.screen()
+
+    def size(self):
+        return self.screen.width_in_pixels, self.screen.height_in_pixels
+
+    def position(self):
+        pointer = self.screen.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def close(self):
+        self.display.close()
+
+    def _move(self, dx, dy):
+        # detail=True: relative motion
+        self.xtest.fake_input(self.display, self.X.MotionNotify, detail=True, x=dx, y=dy)
+        self.display.flush()
+
+    def _scroll_clicks(self, clicks):
+        button = self.scroll_up if clicks > 0 else self.scroll_down
+        for _ in range(abs(clicks)):
+            self.xtest.fake_input(self.display, self.X.ButtonPress, button)
+            self.xtest.fake_input(self.display, self.X.ButtonRelease, button)
+        self.display.flush()
+
+    def _press(self, button, down):
+        event_type = self.X.ButtonPress if down else self.X.ButtonRelease
+        self.xtest.fake_input(self.display, event_type, self.buttons[button])
+        self.display.flush()
+
+class UInputBackend(MouseBackend):
+    '''Mouse actions sent through a virtual input device with uinput (Linux,
+    requires python-evdev and write access to /dev/uinput). Works on X11 and
+    Wayland, but the screen resolution must be given and the pointer position
+    cannot be queried.'''
+
+    def __init__(self, resolution=(1920, 1080)):
+        super().__init__()
+        from evdev import UInput, ecodes
+        self.ecodes = ecodes
+        self.buttons = {'left': ecodes.BTN_LEFT, 'right': ecodes.BTN_RIGHT}
+        capabilities = {ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y, ecodes.REL_WHEEL],
+                        ecodes.EV_KEY: list(self.buttons.values())}
+        self.device = UInput(capabilities, name='hamoco')
+        self.resolution = tuple(resolution)
+
+    def size(self):
+        return self.resolution
+
+    def position(self):
+        return None
+
+    def close(self):
+        self.device.close()
+
+    def _move(self, dx, dy):
+        self.device.write(self.ecodes.EV_REL, self.ecodes.REL_X, dx)
+        self.device.write(self.ecodes.EV_REL, self.ecodes.REL_Y, dy)
+        self.device.syn()
+
+    def _scroll_clicks(self, clicks):
+        self.device.write(self.ecodes.EV_REL, self.ecodes.REL_WHEEL, clicks)
+        self.device.syn()
+
+    def _press(self, button, down):
+        self.device.write(self.ecodes.EV_KEY, self.buttons[button], int(down))
+        self.device.syn()
+
+class RecordingBackend(MouseBackend):
+    '''Mouse actions recorded in memory instead of being performed (e.g. for
+    tests and benchmarks). `events` lists (time, name, *arguments) for every
+    event that would be sent to the system.'''
+
+    def __init__(self, resolution=(1920, 1080)):
+        super().__init__()
+        self.resolution = tuple(resolution)
+        self.x, self.y = self.resolution[0] // 2, self.resolution[1] // 2
+        self.events = []
+
+    def size(self):
+        return self.resolution
+
+    def position(self):
+        return self.x, self.y
+
+    def _move(self, dx, dy):
+        self.x = min(max(self.x + dx, 0), self.resolution[0] - 1)
+        self.y = min(max(self.y + dy, 0), self.resolution[1] - 1)
+        self.events.append((time.perf_counter(), 'move', dx, dy))
+
+    def _scroll_clicks(self, clicks):
+        self.events.append((time.perf_counter(), 'scroll', clicks))
+
+    def _press(self, button, down):
+        self.events.append((time.perf_counter(), 'down' if down else 'up', button))
+
+backends = {'pyautogui': PyAutoGUIBackend,
+            'xtest': XTestBackend,
+            'uinput': UInputBackend,
+            'recording': RecordingBackend}
+
+def open_backend(name='pyautogui', **kwargs):
+    '''Create a mouse backend from its name (see `backends`).'''
+    if name not in backends:
+        raise ValueError(f'unknown mouse backend "{name}" (available: {", ".join(backends)})')
+    return backends[name](**kwargs)
@@ -0,0 +1,170 @@
+import os
+import time
+
+import numpy
+import cv2
+
+from .dataset import header_dtype, read_header, write_header, open_records
+
+# Frame archive: encoded images appended one after the other to chunk files of
+# limited size, and an index file with one record per image (snapshot number,
+# label and timestamp of the snapshot, then location of the image)
+default_archive = 'frames'
+archive_magic = b'HAMOCOFA'
+archive_version = 1
+
+def archive_dtype(n_features=0):
+    # Same header as the datasets, without features
+    return numpy.dtype([('snapshot', '<i8'),
+                        ('label', '<i4'),
+                        ('time', '<f8'),
+                        ('chunk', '<u4'),
+                        ('offset', '<u8'),
+                        ('length', '<u4')])
+
+def archive_index_path(path):
+    return f'{path}.index'
+
+def archive_chunk_path(path, chunk):
+    return f'{path}.{chunk:04d}.chunk'
+
+def open_archive_index(path, mode='r'):
+    '''Memory-map the index of a frame archive (`path` without extension).'''
+    return open_records(archive_index_path(path), archive_dtype, archive_magic, mode=mode)
+
+def remove_archive_label(path, label):
+    '''Remove the images of every snapshot with a given label from the index of
+    a frame archive (the chunk files are left untouched).'''
+    index = open_archive_index(path)
+    kept = index[index['label'] != label]
+    path_to_tmp = archive_index_path(path) + '.tmp'
+    with open(path_to_tmp, 'wb') as tmp_file:
+        write_header(tmp_file, magic=archive_magic, version=archive_version, n_features=0)
+        tmp_file.write(kept.tobytes())
+    del index
+    os.replace(path_to_tmp, archive_index_path(path))
+    return kept.size
+
+class FrameArchiveWriter:
+    '''Append images (JPEG-encoded) to a frame archive: a few large chunk files
+    of at most `chunk_size` bytes each instead of one file per image.'''
+
+    def __init__(self, path, chunk_size=64*2**20, quality=90):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.encode_parameters = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.dtype = archive_dtype()
+        path_to_index = archive_index_path(path)
+        new_file = not os.path.isfile(path_to_index) or os.path.getsize(path_to_index) == 0
+        if not new_file:
+            read_header(path_to_index, magic=archive_magic)
+        self.index = open(path_to_index, 'ab')
+        if new_file:
+            write_header(self.index, magic=archive_magic, version=archive_version, n_features=0)
+        # Drop an incomplete record at the end of the index (interrupted write)
+        else:
+            size = os.path.getsize(path_to_index) - header_dtype.itemsize
+            if size % self.dtype.itemsize:
+                self.index.truncate(header_dtype.itemsize + size - size % self.dtype.itemsize)
+        self.index.seek(0, os.SEEK_END)
+        self.n_images = (self.index.tell() - header_dtype.itemsize) // self.dtype.itemsize
+        # Images are appended to the last chunk
+        self.chunk = 0
+        while os.path.isfile(archive_chunk_path(path, self.chunk + 1)):
+            self.chunk += 1
+        self.data = open(archive_chunk_path(path, self.chunk), 'ab')
+
+    def append(self, image, snapshot=-1, label=-1, timestamp=None):
+        '''Encode and append an image. Returns its position in the archive.'''
+        success, data = cv2.imencode('.jpg', image, self.encode_parameters)
+        if not success:
+            raise ValueError('cannot encode the image')
+        return self.append_encoded(data.tobytes(), snapshot=snapshot, label=label, timestamp=timestamp)
+
+    def append_encoded(self, data, snapshot=-1, label=-1, timestamp=None):
+        '''Append an image that is already encoded (bytes).'''
+        offset = self.data.tell()
+        if offset > 0 and offset + len(data) > self.chunk_size:
+            self.data.close()
+            self.chunk += 1
+            self.data = open(archive_chunk_path(self.path, self.chunk), 'ab')
+            offset = 0
+        self.data.write(data)
+        timestamp = time.time() if timestamp is None else timestamp
+        record = numpy.array([(snapshot, label, timestamp, self.chunk, offset, len(data))], dtype=self.dtype)
+        self.index.write(record.tobytes())
+        self.n_images += 1
+        return self.n_images - 1
+
+    def flush(self):
+        # Images first, so that the index never points to missing data
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class FrameArchive:
+    '''Random access to the images of a frame archive, by position, by
+    snapshot, or for the samples of a binary dataset (matched by label and
+    timestamp, as recorded by hamoco-data).'''
+
+    def __init__(self, path):
+        self.path = path
+        self.index = open_archive_index(path)
+        self._chunks = {}
+        self._samples = None
+
+    def __len__(self):
+        return self.index.size
+
+    def read_encoded(self, position):
+        '''Encoded (JPEG) image at a given position, as bytes.'''
+        record = self.index[position]
+        chunk = int(record['chunk'])
+        if chunk not in self._chunks:
+            self._chunks[chunk] = open(archive_chunk_path(self.path, chunk), 'rb')
+        file = self._chunks[chunk]
+        file.seek(int(record['offset']))
+        return file.read(int(record['length']))
+
+    def read(self, position):
+        '''Decoded (BGR) image at a given position.'''
+        data = numpy.frombuffer(self.read_encoded(position), dtype=numpy.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def find_snapshot(self, label, snapshot):
+        '''Position of the last image recorded for a snapshot number and label, or None.'''
+        positions = numpy.flatnonzero((self.index['label'] == label) & (self.index['snapshot'] == snapshot))
+        return int(positions[-1]) if positions.size > 0 else None
+
+    def find_sample(self, label, timestamp):
+        '''Position of the image of a dataset sample, or None.'''
+        if self._samples is None:
+            self._samples = {(int(label_), float(time_)): position
+                             for position, (label_, time_) in enumerate(zip(self.index['label'], self.index['time']))}
+        return self._samples.get((int(label), float(timestamp)))
+
+    def sample_image(self, records, i):
+        '''Image of the `i`-th sample of a binary dataset (see `hamoco.dataset.open_dataset`), or None.'''
+        position = self.find_sample(records['label'][i], records['time'][i])
+        return None if position is None else self.read(position)
+
+    def close(self):
+        for file in self._chunks.values():
+            file.close()
+        self._chunks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
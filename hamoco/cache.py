@@ -0,0 +1,186 @@
+import os
+import json
+import hashlib
+import warnings
+
+import numpy
+
+from .hand import Hand
+from .dataset import DatasetWriter, find_dataset, open_dataset, read_dataset, read_timestamps, read_text_sample, list_text_samples
+from .dataset import warn_ignored_text_samples
+
+# Processed samples of a data directory, stored in a hidden directory next to
+# the data (binary dataset file of processed features, and the manifest of the
+# data it was built from)
+cache_directory = '.hamoco_cache'
+cache_file = 'processed.hamoco'
+manifest_file = 'manifest.json'
+# To be increased when the processing of the samples changes
+cache_version = 2
+
+class DatasetCache:
+    '''On-disk cache of the processed samples (X, y) of a dataset: a directory
+    of text samples or a binary dataset file. The cache is valid as long as the
+    manifest of the data is unchanged (names, sizes and modification times of
+    the text samples, or number of records and fingerprint of a binary file).
+    When samples were only added (new text files, records appended to the
+    binary file), only the new samples are read, processed and appended to
+    the cache; otherwise, the cache is rebuilt. If the cache cannot be written
+    (e.g. read-only data directory), the samples are processed without it.'''
+
+    def __init__(self, path_to_dataset, n_features=42, chunk_size=65536):
+        self.path_to_dataset = path_to_dataset
+        self.n_features = n_features
+        self.chunk_size = chunk_size
+        self.path_to_binary = find_dataset(path_to_dataset)
+        directory = path_to_dataset if os.path.isdir(path_to_dataset) else os.path.dirname(path_to_dataset)
+        self.directory = os.path.join(directory, cache_directory)
+        self.path_to_cache = os.path.join(self.directory, cache_file)
+        self.path_to_manifest = os.path.join(self.directory, manifest_file)
+        # Outcome of the last `load`, with the recording times of the samples
+        self.timestamps = None
+        self.n_cached = 0
+        self.n_new = 0
+        self.rebuilt = False
+
+    def load(self):
+        '''Processed samples (X, y), memory-mapped from the up-to-date cache.'''
+        manifest = self._read_manifest()
+        if self.path_to_binary is not None:
+            warn_ignored_text_samples(self.path_to_dataset)
+            new_manifest, new_samples = self._binary_update(manifest)
+        else:
+            new_manifest, new_samples = self._text_update(manifest)
+
+        # Rebuild or extend the cache (an interrupted update is rebuilt next time)
+        self.rebuilt = new_samples is None
+        try:
+            if self.rebuilt:
+                manifest = None
+                if os.path.isfile(self.path_to_cache):
+                    os.remove(self.path_to_cache)
+                new_samples = self._all_samples()
+            os.makedirs(self.directory, exist_ok=True)
+            n_samples = 0 if manifest is None else manifest['n_samples']
+            self.n_cached = n_samples
+            self.n_new = 0
+            with DatasetWriter(self.path_to_cache, n_features=self.n_features) as writer:
+                for X, y, timestamps in new_samples:
+                    Hand.feature_process_landmarks(X, out=X)
+                    writer.extend(y, X, timestamps=timestamps)
+                    self.n_new += y.size
+            new_manifest['n_samples'] = n_samples + self.n_new
+            if self.rebuilt or self.n_new > 0 or new_manifest != manifest:
+                self._write_manifest(new_manifest)
+        except OSError as error:
+            warnings.warn(f'the dataset cache cannot be written in "{self.directory}" ({error}), '
+                          'so the samples are processed without it', stacklevel=2)
+            return self._load_uncached()
+
+        records = open_dataset(self.path_to_cache, mode='c')
+        self.timestamps = records['time']
+        return records['features'], records['label']
+
+    def _load_uncached(self):
+        X, y = read_dataset(self.path_to_dataset, n_features=self.n_features)
+        self.timestamps = read_timestamps(self.path_to_dataset)
+        self.n_cached = 0
+        self.n_new = y.size
+        self.rebuilt = False
+        return Hand.feature_process_landmarks(numpy.asarray(X, dtype=numpy.float32)), numpy.array(y, dtype=numpy.int32)
+
+    def clear(self):
+        for path in [self.path_to_manifest, self.path_to_cache]:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def _read_manifest(self):
+        if not (os.path.isfile(self.path_to_manifest) and os.path.isfile(self.path_to_cache)):
+            return None
+        with open(self.path_to_manifest) as file:
+            manifest = json.load(file)
+        if manifest.get('version') != cache_version or manifest.get('n_features') != self.n_features:
+            return None
+        # Interrupted update: the cache does not match its manifest
+        if open_dataset(self.path_to_cache).size != manifest['n_samples']:
+            return None
+        return manifest
+
+    def _write_manifest(self, manifest):
+        path_to_tmp = self.path_to_manifest + '.tmp'
+        with open(path_to_tmp, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(path_to_tmp, self.path_to_manifest)
+
+    def _new_manifest(self, **kwargs):
+        return dict(version=cache_version, n_features=self.n_features, **kwargs)
+
+    # Binary dataset file: records are only ever appended (or the file is rewritten)
+    def _binary_update(self, manifest):
+        records = open_dataset(self.path_to_binary)
+        n_records = records.size
+        new_manifest = self._new_manifest(binary=os.path.abspath(self.path_to_binary),
+                                          n_records=n_records,
+                                          fingerprint=_fingerprint(records, n_records))
+        if manifest is None or manifest.get('binary') != new_manifest['binary']:
+            return new_manifest, None
+        n_cached = manifest['n_records']
+        if n_cached > n_records or _fingerprint(records, n_cached) != manifest['fingerprint']:
+            return new_manifest, None
+        return new_manifest, self._binary_samples(n_cached)
+
+    def _binary_samples(self, start=0):
+        records = open_dataset(self.path_to_binary)
+        for i in range(start, records.size, self.chunk_size):
+            chunk = records[i:i+self.chunk_size]
+            yield numpy.array(chunk['features'], dtype=numpy.float32), numpy.array(chunk['label'], dtype=numpy.int32), chunk['time']
+
+    # Text samples: one file per sample
+    def _text_update(self, manifest):
+        paths = list_text_samples(self.path_to_dataset)
+        files = {}
+        for path in paths:
+            stat = os.stat(path)
+            files[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+        new_manifest = self._new_manifest(files=files)
+        if manifest is None or 'files' not in manifest:
+            return new_manifest, None
+        # Cached samples must be unchanged
+        cached_files = manifest['files']
+        if any(files.get(name) != entry for name, entry in cached_files.items()):
+            return new_manifest, None
+        new_paths = [path for path in paths if os.path.basename(path) not in cached_files]
+        return new_manifest, self._text_samples(new_paths)
+
+    def _text_samples(self, paths):
+        for start in range(0, len(paths), self.chunk_size):
+            chunk = paths[start:start+self.chunk_size]
+            X = numpy.empty((len(chunk), self.n_features), dtype=numpy.float32)
+            y = numpy.empty(len(chunk), dtype=numpy.int32)
+            timestamps = numpy.empty(len(chunk))
+            for i, path in enumerate(chunk):
+                X[i,:], y[i] = read_text_sample(path)
+                timestamps[i] = os.path.getmtime(path)
+            yield X, y, timestamps
+
+    def _all_samples(self):
+        if self.path_to_binary is not None:
+            return self._binary_samples()
+        return self._text_samples(list_text_samples(self.path_to_dataset))
+
+def _fingerprint(records, n_records):
+    # Hash of the first and last records of the first `n_records` (cheap, but
+    # catches rewritten files, e.g. when a label is removed)
+    digest = hashlib.sha1()
+    if n_records > 0:
+        digest.update(records[:1].tobytes())
+        digest.update(records[n_records-1:n_records].tobytes())
+    return digest.hexdigest()
+
+def load_processed_dataset(path_to_dataset, n_features=42, cache=True):
+    '''Processed samples (X, y) of a dataset, through its `DatasetCache` unless
+    `cache` is False.'''
+    if cache:
+        return DatasetCache(path_to_dataset, n_features=n_features).load()
+    X, y = read_dataset(path_to_dataset, n_features=n_features)
+    return Hand.feature_process_landmarks(numpy.asarray(X, dtype=numpy.float32)), numpy.array(y, dtype=numpy.int32)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import os
+import argparse
+
+from hamoco.dataset import convert_text_dataset, default_dataset_file
+
+def main():
+
+    # Parser
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    description = f"""{parser.prog} converts a directory of snapshots recorded in text format
+    (one `.dat` file per snapshot) to a single binary dataset file that can be read much faster
+    for training.""".replace('\n',' ')
+    parser.description = description
+    parser.add_argument('path_to_data',
+                        type=str,
+                        help='Path to the directory containing the snapshots in text format')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        default=None,
+                        help=f'Path to the binary dataset file (default: "{default_dataset_file}" in the data directory)')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Replace the binary dataset file if it already exists (the samples it contains are lost)')
+    args = parser.parse_args()
+    # Custom variables linked to parser
+    path_to_data = args.path_to_data
+    path_to_file = args.output
+    force = args.force
+    if path_to_file is None:
+        path_to_file = os.path.join(path_to_data, default_dataset_file)
+
+    # Convert (converting twice would duplicate the samples)
+    if os.path.exists(path_to_file) and not force:
+        parser.error(f'"{path_to_file}" already exists (use --force to replace it)')
+    n_samples = convert_text_dataset(path_to_data, path_to_file, overwrite=force)
+    print(f'# Converted {n_samples} snapshots to "{path_to_file}"')
+
+if __name__ == '__main__':
+    main()
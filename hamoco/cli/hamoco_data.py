@@ -5,8 +5,13 @@ import time
 import argparse
 
 import cv2
+import numpy
 import mediapipe as mp
 from hamoco import Hand, HandSnapshot
+from hamoco.dataset import DatasetWriter, default_dataset_file, open_dataset, remove_label
+from hamoco.sources import open_source
+from hamoco.pipeline import SnapshotWriter
+from hamoco.archive import FrameArchiveWriter, remove_archive_label, archive_index_path, default_archive
 from hamoco.utils import draw_hand_landmarks, __window_name__
 
 # Mediapipe shortcuts
@@ -48,6 +53,34 @@ def main():
     parser.add_argument('-i', '--images',
                         action='store_true',
                         help='Path to the directory that will store the recorded data')
+    parser.add_argument('--image_format',
+                        type=str,
+                        choices=['jpg', 'archive'],
+                        default='jpg',
+                        help=f'Format of the images saved with --images: one file per snapshot, or appended to a single frame archive ("{default_archive}.index" and "{default_archive}.*.chunk" files) that can be read with hamoco.archive.FrameArchive')
+    parser.add_argument('-f', '--format',
+                        type=str,
+                        choices=['binary', 'text'],
+                        default='binary',
+                        help=f'Format of the recorded data: appended to a single binary dataset file ("{default_dataset_file}") or one text file per snapshot')
+    parser.add_argument('--max_num_hands',
+                        type=int,
+                        default=1,
+                        help='Maximum number of hands to detect; every detected hand is recorded with the same pose')
+    parser.add_argument('--source',
+                        type=str,
+                        default='0',
+                        help='Input frames: webcam index, video file, directory of images, or .npy stack of frames')
+    parser.add_argument('--fast',
+                        action='store_true',
+                        help='Process the frames of a video file, directory or frame stack as fast as possible instead of in real time (the delay between snapshots is measured in recording time)')
+    parser.add_argument('--write_queue',
+                        type=int,
+                        default=64,
+                        help='Maximum number of snapshots waiting to be written in the background (snapshots are dropped when it is full)')
+    parser.add_argument('--sync_writes',
+                        action='store_true',
+                        help='Write the snapshots on the capture thread instead of in the background')
     parser.add_argument('-t', '--test',
                         action='store_true',
                         help='Do not save the data and only show real-time information about hand detection')
@@ -59,84 +92,154 @@ def main():
     delay_between_snapshots = args.delay
     stop_after = args.stop_after
     save_images = args.images
+    data_format = args.format
+    image_format = args.image_format
+    source = args.source
+    fast = args.fast
+    max_num_hands = args.max_num_hands
+    write_queue = args.write_queue
+    sync_writes = args.sync_writes
     record = not(args.test)
 
     # Track snapshots
-    last_snapshot = time.time()
+    last_snapshot = 0.0
     snapshot_index = 0
     training_pose = Hand.Pose[pose_name]
 
     # Remove previously recorded files (both data files and images)
+    path_to_file = os.path.join(path_to_data, default_dataset_file)
+    path_to_archive = os.path.join(path_to_data, default_archive)
     files = os.listdir(path_to_data)
     files = [f for f in files if f.startswith('snapshot_') and pose_name in f]
     files.sort()
     if reset:
         for file in files:
                 os.remove(os.path.join(path_to_data, file))
-    # Find next snapshot index to append to previous files
+        if os.path.isfile(path_to_file):
+            remove_label(path_to_file, training_pose.value)
+        if os.path.isfile(archive_index_path(path_to_archive)):
+            remove_archive_label(path_to_archive, training_pose.value)
+    # Find next snapshot index to append to previous samples
+    elif data_format == 'binary':
+        if os.path.isfile(path_to_file):
+            snapshot_index = numpy.count_nonzero(open_dataset(path_to_file)['label'] == training_pose.value)
     else:
         files = [f for f in files if f.endswith('.dat')]
         if len(files) > 0:
             snapshot_index = int(files[-1][9:13]) + 1
 
-    # Webcam input
-    capture = cv2.VideoCapture(0)
-    with mp_hands.Hands(static_image_mode=False,
-                        model_complexity=1,
-                        max_num_hands=1,
-                        min_detection_confidence=0.5,
-                        min_tracking_confidence=0.5) as hands:
-
-        # Detect hand movement while the video capture is on
-        while capture.isOpened():
-            success, image = capture.read()
-            image = cv2.flip(image, 1)
-
-            if not success:
-                print("Ignoring empty camera frame.")
-                # If loading a video, use 'break' instead of 'continue'.
-                continue
-
-            # Hand detection results
-            results = hands.process(image)
-            hand_detected = bool(results.multi_hand_landmarks)
-            if hand_detected:
-                    # Draw the hand annotations on the image
-                    draw_hand_landmarks(image, results.multi_hand_landmarks[0])
-
-            # Snapshot every `delay_between_snapshot` seconds
-            if time.time() - last_snapshot > delay_between_snapshots:
-
+    # Text samples are not read for training once a binary file exists
+    if record and data_format == 'text' and os.path.isfile(path_to_file):
+        print(f'# Warning: "{path_to_file}" exists, so the text snapshots are ignored for training until they are converted with hamoco-convert --force')
+
+    # Binary dataset file
+    writer = None
+    if record and data_format == 'binary':
+        writer = DatasetWriter(path_to_file)
+
+    # Frame archive
+    archive = None
+    if record and save_images and image_format == 'archive':
+        archive = FrameArchiveWriter(path_to_archive)
+
+    # Snapshots written in the background (unless synchronous)
+    snapshot_writer = SnapshotWriter(writer, maxsize=write_queue, frame_archive=archive)
+    if record and not sync_writes:
+        snapshot_writer.start()
+
+    # Input frames
+    capture = open_source(source, realtime=not fast)
+    try:
+        with mp_hands.Hands(static_image_mode=capture.static,
+                            model_complexity=1,
+                            max_num_hands=max_num_hands,
+                            min_detection_confidence=0.5,
+                            min_tracking_confidence=0.5) as hands:
+
+            # Detect hand movement while the video capture is on
+            while capture.isOpened():
+                success, image = capture.read()
+
+                if not success:
+                    # End of a video file, directory or frame stack
+                    if capture.finite:
+                        break
+                    print("Ignoring empty camera frame.")
+                    continue
+                image = cv2.flip(image, 1)
+
+                # Hand detection results
+                results = hands.process(image)
+                hand_detected = bool(results.multi_hand_landmarks)
                 if hand_detected:
-
-                    # Get the landmarks
-                    landmarks = results.multi_hand_landmarks[0].landmark
-
-                    # Save the data (an optionally the corresponding image)
-                    if record:
-                        hand = Hand(pose=training_pose)
-                        snapshot = HandSnapshot(hand=hand)
-                        current_file = f'snapshot_{snapshot_index:04}_pose-{hand.pose.value}-{hand.pose.name}'
-                        output_path = os.path.join(path_to_data, current_file)
-                        snapshot.save_landmarks_vector(landmarks, path=output_path)
-                        if save_images:
-                            snapshot.save_processed_image(image, path=output_path)
-                        
-                        saved_at = time.strftime('%H:%M:%S')
-                        print(f'# Saved snapshot #{snapshot_index} for pose "{pose_name}" ({saved_at})')
-                        last_snapshot = time.time()
-                        snapshot_index += 1
-
-                    # Only basic information about the detection
-                    else:
-                        which_hand = results.multi_handedness[0].classification[0].label
-                        confidence = int(100 * results.multi_handedness[0].classification[0].score)
-                        print('Hand detected={} | Confidence={}%'.format(which_hand, confidence))
-
-            # Display the image (stop if ESC key is pressed)
-            cv2.imshow(__window_name__, image)
-            if cv2.waitKey(5) & 0xFF == 27 or  snapshot_index >= stop_after:
-                break
+                    # Draw the hand annotations on the image
+                    for hand_landmarks in results.multi_hand_landmarks:
+                        draw_hand_landmarks(image, hand_landmarks)
+
+                # Snapshot every `delay_between_snapshot` seconds
+                if capture.timestamp - last_snapshot > delay_between_snapshots:
+
+                    if hand_detected:
+
+                        # Get the landmarks of every detected hand
+                        multi_landmarks = [hand_landmarks.landmark for hand_landmarks in results.multi_hand_landmarks]
+                        n_hands = len(multi_landmarks)
+
+                        # Save the data (an optionally the corresponding image)
+                        if record:
+                            hand = Hand(pose=training_pose)
+                            snapshot = HandSnapshot(hand=hand)
+                            current_file = f'snapshot_{snapshot_index:04}_pose-{hand.pose.value}-{hand.pose.name}'
+                            output_path = os.path.join(path_to_data, current_file)
+                            landmarks = numpy.empty((n_hands, Hand.dimension * Hand.n_landmarks))
+                            for i, hand_landmarks in enumerate(multi_landmarks):
+                                Hand.vectorize_landmarks(hand_landmarks, out=landmarks[i])
+                            text_paths = None
+                            if data_format == 'text':
+                                text_paths = [os.path.join(path_to_data, f'snapshot_{snapshot_index+i:04}_pose-{hand.pose.value}-{hand.pose.name}')
+                                              for i in range(n_hands)]
+                            saved = snapshot_writer.submit(snapshot,
+                                                           landmarks,
+                                                           text_paths=text_paths,
+                                                           image=image if save_images else None,
+                                                           image_path=output_path,
+                                                           snapshot_index=snapshot_index)
+
+                            saved_at = time.strftime('%H:%M:%S')
+                            hands_saved = '' if n_hands == 1 else f' ({n_hands} hands)'
+                            if saved:
+                                print(f'# Saved snapshot #{snapshot_index} for pose "{pose_name}"{hands_saved} ({saved_at})')
+                                snapshot_index += n_hands
+                            else:
+                                print(f'# Dropped snapshot #{snapshot_index}: {snapshot_writer.depth} snapshots are waiting to be written ({saved_at})')
+                            last_snapshot = capture.timestamp
+
+                        # Only basic information about the detection
+                        else:
+                            for handedness in results.multi_handedness:
+                                which_hand = handedness.classification[0].label
+                                confidence = int(100 * handedness.classification[0].score)
+                                print('Hand detected={} | Confidence={}%'.format(which_hand, confidence))
+
+                # Display the image (stop if ESC key is pressed)
+                cv2.imshow(__window_name__, image)
+                if cv2.waitKey(5) & 0xFF == 27 or (stop_after is not None and snapshot_index >= stop_after):
+                    break
+    # Ctrl+C stops the recording like ESC
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Write the pending snapshots (the files are closed even if a write failed)
+        capture.release()
+        try:
+            snapshot_writer.stop()
+        finally:
+            if writer is not None:
+                writer.close()
+            if archive is not None:
+                archive.close()
+    if record:
+        print(f'# Wrote {snapshot_writer.n_written} snapshots (dropped: {snapshot_writer.n_dropped}, max. queue depth: {snapshot_writer.max_depth})')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
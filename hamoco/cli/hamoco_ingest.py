@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import os
+import time
+import argparse
+
+from hamoco import Hand
+from hamoco.dataset import default_dataset_file
+from hamoco.ingest import find_labeled_files, ingest, image_extensions, video_extensions
+
+def main():
+
+    # All hand poses names
+    hand_poses = [pose.name for pose in Hand.Pose if pose.name != 'UNDEFINED']
+
+    # Parser
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    description = f"""{parser.prog} extracts the hand landmarks of existing images and video
+    files labeled by hand pose, in parallel on all CPU cores, and appends them to the binary
+    dataset file used for training (the same file as hamoco-data). Files are labeled with
+    --pose, or by the closest directory named after a hand pose (e.g. footage/OPEN/clip.mp4).
+    Supported files: {' '.join(image_extensions + video_extensions)}.""".replace('\n',' ')
+    parser.description = description
+    parser.add_argument('path_to_data',
+                        type=str,
+                        help='Path to the directory that will store the recorded data')
+    parser.add_argument('sources',
+                        nargs='+',
+                        type=str,
+                        help='Images, video files, or directories containing them (explored recursively)')
+    parser.add_argument('-p', '--pose',
+                        type=str,
+                        choices=hand_poses,
+                        default=None,
+                        help='Hand pose of all the sources (by default, the name of their directory)')
+    parser.add_argument('-w', '--workers',
+                        type=int,
+                        default=None,
+                        help='Number of processes extracting landmarks (number of CPU cores by default)')
+    parser.add_argument('--stride',
+                        type=int,
+                        default=5,
+                        help='Only record every n-th frame of the video files (consecutive frames are very similar)')
+    parser.add_argument('--chunk_size',
+                        type=int,
+                        default=32,
+                        help='Number of images processed by a worker at once')
+    parser.add_argument('--max_num_hands',
+                        type=int,
+                        default=1,
+                        help='Maximum number of hands to detect in each frame; every detected hand is recorded')
+    parser.add_argument('--min_detection_confidence',
+                        type=float,
+                        default=0.5,
+                        help='Minimum confidence of the hand detection')
+    parser.add_argument('--no_flip',
+                        action='store_true',
+                        help='Do not mirror the frames (they are mirrored by default, like the webcam feed in hamoco-data)')
+    args = parser.parse_args()
+    # Custom variables linked to parser
+    path_to_data = args.path_to_data
+    sources = args.sources
+    pose_name = args.pose
+    workers = args.workers
+    stride = args.stride
+    chunk_size = args.chunk_size
+    max_num_hands = args.max_num_hands
+    min_detection_confidence = args.min_detection_confidence
+    flip = not args.no_flip
+
+    # Labeled files
+    labeled_files = []
+    for source in sources:
+        labeled_files += find_labeled_files(source, pose=pose_name)
+    if len(labeled_files) == 0:
+        parser.error('no labeled image or video file found (see --pose)')
+    print(f'# Found {len(labeled_files)} labeled files')
+
+    # Extract and record the landmarks
+    os.makedirs(path_to_data, exist_ok=True)
+    path_to_file = os.path.join(path_to_data, default_dataset_file)
+    start = time.perf_counter()
+    counts = ingest(labeled_files,
+                    path_to_file,
+                    workers=workers,
+                    chunk_size=chunk_size,
+                    stride=stride,
+                    max_num_hands=max_num_hands,
+                    min_detection_confidence=min_detection_confidence,
+                    flip=flip)
+    elapsed = time.perf_counter() - start
+    print(f'# Recorded {counts["samples"]} samples from {counts["frames"]} frames to "{path_to_file}" in {elapsed:.1f}s ({counts["frames"] / elapsed:.1f} frames/s)')
+    if counts['unreadable'] > 0:
+        print(f'# Skipped {counts["unreadable"]} unreadable files')
+
+if __name__ == '__main__':
+    main()
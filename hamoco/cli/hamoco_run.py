@@ -2,21 +2,26 @@
 
 # TODO: add an optional overlay frame with PyQt that shows the edges in real time
 # TODO: add more complex actions (e.g. copy, cut, paste) with the second hand
+#       (each hand already has its own controller with --max_num_hands 2)
 
 import argparse
 import json
+import time
 from collections import deque
 
 import cv2
 import mediapipe as mp
-import pyautogui
-import keras
 import numpy
 
 from hamoco import Hand, HandyMouseController
 from hamoco.models import __default_model__
-from hamoco.utils import draw_hand_landmarks, draw_palm_center, draw_control_bounds, draw_scrolling_origin
-from hamoco.utils import write_pose, __window_name__
+from hamoco.inference import load_model, PredictionGate
+from hamoco.pipeline import FrameGrabber, MouseActuator
+from hamoco.actuation import backends, open_backend
+from hamoco.sources import open_source, downscale
+from hamoco.trace import TraceWriter, read_trace, iterate_frames
+from hamoco.profiling import StageProfiler
+from hamoco.utils import PreviewRenderer, __window_name__
 from hamoco.config import __default_config__
 
 # Mediapipe shortcuts
@@ -24,8 +29,45 @@ mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 mp_hands = mp.solutions.hands
 
-# Allow mouse to go on the border of the screen
-pyautogui.FAILSAFE = False
+def detect_hands(capture, hands, finite, trace_writer=None, profiler=None, working_size=None):
+    '''Detect hands in every frame with mediapipe (downscaled to `working_size`
+    if given). Yields (timestamp, image, landmarks, handedness, results),
+    where `landmarks` and `handedness` list the detected hands.'''
+    profiler = StageProfiler(enabled=False) if profiler is None else profiler
+    while capture.isOpened():
+        start = profiler.now()
+        success, image = capture.read()
+        start = profiler.record('capture', start)
+
+        if not success:
+            # End of a video file, directory or frame stack
+            if finite:
+                break
+            print('Ignoring empty camera frame.')
+            continue
+
+        timestamp = time.time()
+        if working_size is None:
+            results = hands.process(image)
+        else:
+            small_image = downscale(image, working_size)
+            start = profiler.record('downscale', start)
+            results = hands.process(small_image)
+        profiler.record('detect', start)
+        landmarks = [hand_landmarks.landmark for hand_landmarks in results.multi_hand_landmarks or []]
+        handedness = [hand.classification[0].label for hand in results.multi_handedness or []]
+
+        # Record the landmarks
+        if trace_writer is not None:
+            scores = [hand.classification[0].score for hand in results.multi_handedness or []]
+            trace_writer.record(timestamp, landmarks, handedness, scores)
+
+        yield timestamp, image, landmarks, handedness, results
+
+def replay_hands(path_to_trace):
+    '''Replay the hands recorded in a trace file, in the same format as `detect_hands` (without images).'''
+    for timestamp, landmarks, handedness, _ in iterate_frames(read_trace(path_to_trace)):
+        yield timestamp, None, landmarks, handedness, None
 
 def main():
 
@@ -70,7 +112,7 @@ def main():
     parser.add_argument('-m', '--model', 
                         default=default_config['model'],
                         type=str,
-                        help='Path to the Keras model to use for hand pose prediction')
+                        help='Path to the Keras (.h5) or TensorFlow Lite (.tflite) model to use for hand pose prediction')
     parser.add_argument('--show',
                         action='store_'+str(not default_config['show']).lower(),
                         help='Real-time display of the processed camera feed')
@@ -79,6 +121,57 @@ def main():
                         type=str,
                         default=default_config['stop_sequence'],
                         help='Sequence of consecutive poses to stop the application')
+    parser.add_argument('--max_num_hands',
+                        type=int,
+                        default=1,
+                        help='Maximum number of hands to detect; each hand (left or right) then has its own controller')
+    parser.add_argument('--pointer_hand',
+                        type=str,
+                        default='Right',
+                        choices=['Right', 'Left'],
+                        help='Hand that moves the pointer when several hands are detected (the other hand only clicks, scrolls and holds the button)')
+    parser.add_argument('--source',
+                        type=str,
+                        default='0',
+                        help='Input frames: webcam index, video file, directory of images, or .npy stack of frames')
+    parser.add_argument('--fast',
+                        action='store_true',
+                        help='Process the frames of a video file, directory or frame stack as fast as possible instead of in real time')
+    parser.add_argument('--gate_threshold',
+                        type=float,
+                        default=None,
+                        help='Reuse the last predicted pose while the processed landmarks move by less than this distance (no reuse by default)')
+    parser.add_argument('--gate_max_age',
+                        type=int,
+                        default=5,
+                        help='Maximum number of consecutive frames a predicted pose can be reused for')
+    parser.add_argument('--working_size',
+                        type=int,
+                        default=None,
+                        help='Downscale the frames passed to the hand detection to this size in pixels (largest side)')
+    parser.add_argument('--record_trace',
+                        type=str,
+                        default=None,
+                        help='Record the detected hand landmarks, handedness and timestamps of every frame to a binary trace file')
+    parser.add_argument('--replay',
+                        type=str,
+                        default=None,
+                        help='Replay the hand landmarks of a trace file (recorded with --record_trace) instead of detecting hands in the webcam feed')
+    parser.add_argument('--backend',
+                        type=str,
+                        default=None,
+                        choices=list(backends),
+                        help='Mouse backend: pyautogui (any platform), xtest (X11, with python-xlib), uinput (Linux, with python-evdev), or recording (no mouse action); pyautogui by default, and recording when replaying a trace')
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help='Time each stage of the processing of a frame and print a summary on exit')
+    parser.add_argument('--profile_output',
+                        type=str,
+                        default=None,
+                        help='Save the profiling summary to a JSON file (or CSV file if the name ends with .csv)')
+    parser.add_argument('--sequential',
+                        action='store_true',
+                        help='Run frame capture, hand detection and mouse actions in series on a single thread')
     args = parser.parse_args()
     # Custom variables linked to parser
     sensitivity = args.sensitivity
@@ -91,104 +184,216 @@ def main():
     model = args.model
     show_feed = args.show
     stop_sequence_litteral = args.stop_sequence
+    source = args.source
+    fast = args.fast
+    path_to_trace = args.record_trace
+    path_to_replay = args.replay
+    profile = args.profile or args.profile_output is not None
+    path_to_profile = args.profile_output
+    sequential = args.sequential
+    working_size = args.working_size
+    gate_threshold = args.gate_threshold
+    gate_max_age = args.gate_max_age
+    backend = args.backend
+    max_num_hands = args.max_num_hands
+    pointer_hand = args.pointer_hand
+    if path_to_replay is not None and path_to_trace is not None:
+        parser.error('--record_trace cannot be combined with --replay (no hand is detected when replaying a trace)')
+    # Replayed traces do not move the real mouse unless asked to
+    if backend is None:
+        backend = 'recording' if path_to_replay is not None else 'pyautogui'
 
     # Prepare stop sequence
     stop_sequence = []
     for pose in stop_sequence_litteral:
         stop_sequence.append(Hand.Pose[pose])
     stop_sequence = deque(stop_sequence, maxlen=len(stop_sequence))
-    consecutive_poses = deque(maxlen=stop_sequence.maxlen)
-    previous_pose = Hand.Pose.UNDEFINED
+    # Consecutive poses of each hand
+    consecutive_poses = {}
+    previous_poses = {}
 
     # Load classification model
     path_to_model = __default_model__ if model is None else model
-    trained_model = keras.models.load_model(path_to_model)
-
-    # Hand controller
-    hand_controller = HandyMouseController(sensitivity=sensitivity,
-                                        margin=margin,
-                                        scrolling_threshold=scrolling_threshold,
-                                        scrolling_speed=scrolling_speed,
-                                        min_cutoff_filter=min_cutoff_filter,
-                                        beta_filter=beta_filter)
-
-    # Webcam input
-    capture = cv2.VideoCapture(0)
-    with mp_hands.Hands(static_image_mode=False,
-                        model_complexity=1,
-                        max_num_hands=1,
-                        min_detection_confidence=0.5,
-                        min_tracking_confidence=0.5) as hands:
-
-        # Detect hand movement while the video capture is on
-        while capture.isOpened():
-            success, image = capture.read()
-            image = cv2.flip(image, 1)
-
-            if not success:
-                print('Ignoring empty camera frame.')
-                # If loading a video, use 'break' instead of 'continue'.
-                continue
-
-            # A hand is detected
-            results = hands.process(image)
-            hand_detected = bool(results.multi_hand_landmarks)
+    trained_model = load_model(path_to_model)
+    gate = None
+    if gate_threshold is not None:
+        gate = PredictionGate(trained_model, threshold=gate_threshold, max_age=gate_max_age)
+    classifier = trained_model if gate is None else gate
+
+    # Hand controllers: one per handedness label when several hands are
+    # detected (with their own state and smoothing), sharing the same mouse.
+    # Only the pointer hand moves the pointer, so that it does not jump
+    # from one hand to the other.
+    mouse_backend = open_backend(backend)
+    def new_controller(moves_pointer=True):
+        return HandyMouseController(sensitivity=sensitivity,
+                                    margin=margin,
+                                    scrolling_threshold=scrolling_threshold,
+                                    scrolling_speed=scrolling_speed,
+                                    min_cutoff_filter=min_cutoff_filter,
+                                    beta_filter=beta_filter,
+                                    backend=mouse_backend,
+                                    moves_pointer=moves_pointer)
+    hand_controller = new_controller()
+    controllers = {}
+    if max_num_hands > 1:
+        other_hand = 'Left' if pointer_hand == 'Right' else 'Right'
+        controllers = {pointer_hand: hand_controller, other_hand: new_controller(moves_pointer=False)}
+
+    # Timing of each stage
+    profiler = StageProfiler(enabled=profile)
+
+    # Mouse actions (performed in a separate thread unless sequential)
+    actuator = MouseActuator(hand_controller, min_confidence=minimum_prediction_confidence, profiler=profiler, controllers=controllers)
+    if not sequential:
+        actuator.start()
+
+    # Hands recorded in a trace file (mediapipe is bypassed)
+    if path_to_replay is not None:
+        frames = replay_hands(path_to_replay)
+
+    # Hands detected in input frames (grabbed in a separate thread unless
+    # sequential). Stale frames are dropped when frames arrive in real time.
+    else:
+        frame_source = open_source(source, realtime=not fast)
+        capture = FrameGrabber(frame_source, flip=True, latest_only=not (frame_source.finite and fast), profiler=profiler)
+        if not sequential:
+            capture.start()
+        hands = mp_hands.Hands(static_image_mode=frame_source.static,
+                               model_complexity=1,
+                               max_num_hands=max_num_hands,
+                               min_detection_confidence=0.5,
+                               min_tracking_confidence=0.5)
+        trace_writer = None if path_to_trace is None else TraceWriter(path_to_trace)
+        frames = detect_hands(capture, hands, frame_source.finite, trace_writer=trace_writer, profiler=profiler, working_size=working_size)
+
+    # Overlays of the preview window
+    renderer = PreviewRenderer()
+
+    # Buffers reused at every frame (one row per hand)
+    raw_landmark_vectors = numpy.empty((max_num_hands, Hand.dimension * Hand.n_landmarks))
+    processed_landmark_vectors = numpy.empty(raw_landmark_vectors.shape, dtype=numpy.float32)
+
+    # Frame rate measured from the first frame (not the loading of the models)
+    profiler.start()
+
+    # Process hands while the video capture is on
+    try:
+        for timestamp, image, landmarks, handedness, results in frames:
+            profiler.frame()
+
+            # Hands are detected (recorded traces may contain more hands)
+            n_hands = min(len(landmarks), max_num_hands)
+            hand_detected = n_hands > 0
+            poses = []
             if hand_detected:
 
-                # Draw the hand annotations on the image
-                draw_hand_landmarks(image, results.multi_hand_landmarks[0])
-
-                # Landmark coordinates of the detected hand
-                landmarks = results.multi_hand_landmarks[0].landmark
-                hand = Hand()
-                raw_landmark_vector = hand.vectorize_landmarks(landmarks)
-                palm_center = hand_controller.palm_center(raw_landmark_vector)
-
-                # Predict hand pose
-                processed_landmark_vector = hand.feature_process_landmarks(raw_landmark_vector)
-                probabilities = trained_model.predict(processed_landmark_vector, verbose=0).flatten()
-                prediction_confidence = numpy.max(probabilities)
-                predicted_pose = numpy.argmax(probabilities)
-                hand.pose = Hand.Pose(predicted_pose)
-
-                # Update consecutive poses queue for stop sequence
-                if hand.pose != previous_pose:
-                    consecutive_poses.append(hand.pose)
-                    previous_pose = hand.pose
-
-                # Perform the appropriate mouse action
-                hand_controller.operate_mouse(hand, 
-                                            palm_center,
-                                            prediction_confidence,
-                                            min_confidence=minimum_prediction_confidence)
-
-            # Stop sequence
-            if consecutive_poses == stop_sequence:
+                # Landmark coordinates of all the detected hands
+                start = profiler.now()
+                raw_vectors = raw_landmark_vectors[:n_hands]
+                for i in range(n_hands):
+                    Hand.vectorize_landmarks(landmarks[i], out=raw_vectors[i])
+
+                # Predict the poses of all the hands at once
+                processed_vectors = processed_landmark_vectors[:n_hands]
+                Hand.feature_process_landmarks(raw_vectors, out=processed_vectors)
+                start = profiler.record('features', start)
+                probabilities = classifier.predict(processed_vectors)
+                profiler.record('predict', start)
+                prediction_confidences = numpy.max(probabilities, axis=1)
+                predicted_poses = numpy.argmax(probabilities, axis=1)
+
+                # Each hand is routed to the controller of its handedness (the
+                # first one only if both hands are given the same label)
+                for i in range(n_hands):
+                    label = handedness[i] if max_num_hands > 1 and i < len(handedness) else None
+                    if any(label == other for other, _ in poses):
+                        continue
+                    pose = Hand.Pose(predicted_poses[i])
+                    poses.append((label, pose))
+
+                    # Update consecutive poses queue for stop sequence
+                    if pose != previous_poses.get(label, Hand.Pose.UNDEFINED):
+                        consecutive_poses.setdefault(label, deque(maxlen=stop_sequence.maxlen)).append(pose)
+                        previous_poses[label] = pose
+
+                    # Perform the appropriate mouse action
+                    actuator.submit(pose, raw_vectors[i], prediction_confidences[i], timestamp, label)
+
+            # The hands are lost: their poses will be predicted again when they reappear
+            elif gate is not None:
+                gate.reset()
+
+            # Stop sequence (with any hand)
+            if any(poses_ == stop_sequence for poses_ in consecutive_poses.values()):
                 print('# hamoco: stop sequence detected. Exiting the application...')
                 break
 
             # Show the camera feed
-            if show_feed:
+            if show_feed and image is not None:
+                start = profiler.now()
 
-                # Accessible area        
+                # Draw the hand annotations on the image
+                for hand_landmarks in (results.multi_hand_landmarks or [])[:n_hands]:
+                    renderer.draw_hand_landmarks(image, hand_landmarks)
+
+                # Accessible area
                 bounds = hand_controller.accessible_area(image)
-                draw_control_bounds(image, bounds)
+                renderer.draw_control_bounds(image, bounds)
 
-                # Show palm center
+                # Show palm centers
                 if hand_detected:
-                    draw_palm_center(image, palm_center, size=0.03)
-                    write_pose(image, hand.pose.name)
+                    for label, pose in poses:
+                        if label in actuator.palm_centers:
+                            renderer.draw_palm_center(image, actuator.palm_centers[label], size=0.03)
+                    names = [pose.name if label is None else f'{pose.name} ({label})' for label, pose in poses]
+                    renderer.write_pose(image, ', '.join(names))
 
                 # Draw scrolling origin
-                if hand_controller.current_mouse_state == HandyMouseController.MouseState.SCROLLING:
-                    draw_scrolling_origin(image, hand_controller.scrolling_origin, hand_controller.scrolling_threshold)
+                for controller in controllers.values() or [hand_controller]:
+                    if controller.current_mouse_state == HandyMouseController.MouseState.SCROLLING:
+                        renderer.draw_scrolling_origin(image, controller.scrolling_origin, controller.scrolling_threshold)
 
                 # Show
+                start = profiler.record('draw', start)
                 cv2.imshow(__window_name__, image)
-                if cv2.waitKey(5) & 0xFF == 27:
+                key = cv2.waitKey(5)
+                profiler.record('show', start)
+                if key & 0xFF == 27:
                     break
-                        
-    capture.release()
+
+    # Ctrl+C stops the application like ESC
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Release a held button, the mouse, the input and the trace file even after an error
+        try:
+            actuator.stop()
+        finally:
+            for controller in controllers.values() or [hand_controller]:
+                controller.release()
+            mouse_backend.close()
+            if path_to_replay is None:
+                try:
+                    capture.release()
+                finally:
+                    hands.close()
+                    if trace_writer is not None:
+                        trace_writer.close()
+
+    # Profiling summary (or throughput for recorded input)
+    counters = dict(mouse_events=mouse_backend.n_events)
+    if path_to_replay is None:
+        counters.update(dropped_frames=capture.n_dropped, failed_reads=capture.n_failed)
+    if gate is not None:
+        counters.update(gate_hits=gate.n_hits, gate_misses=gate.n_misses)
+    profiler.stop(**counters)
+    if profile:
+        print(profiler.report())
+        if path_to_profile is not None:
+            profiler.save(path_to_profile)
+    elif path_to_replay is not None or frame_source.finite:
+        print(f'# hamoco: processed {profiler.n_frames} frames in {profiler.elapsed:.2f}s ({profiler.n_frames / profiler.elapsed:.1f} FPS)')
 
 if __name__ == '__main__':
     main()
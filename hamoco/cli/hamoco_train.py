@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
 import argparse
+import os
+import datetime
 
-from hamoco import ClassificationModel
 from hamoco.models import __default_model__
 
 def main():
@@ -23,11 +24,12 @@ def main():
     parser.add_argument('-H', '--hidden_layers', 
                         nargs='+',
                         type=int,
+                        default=[50, 25, 10],
                         help='Dimensions of the hidden layers (e.g. -H 50 25')
     parser.add_argument('-l', '--learning_rate', 
                         type=float,
-                        default=0.01,
-                        help='Learning rate')
+                        default=None,
+                        help='Learning rate (0.01 for a new model, 0.001 to fine-tune a model by default)')
     parser.add_argument('-e', '--epochs', 
                         type=int,
                         default=15,
@@ -36,6 +38,94 @@ def main():
                         type=float,
                         default=0.3,
                         help='Fraction of data to use for validation (between 0 and 1)')
+    parser.add_argument('--stratify',
+                        action='store_true',
+                        help='Keep the same proportion of each hand pose in the training and validation sets')
+    parser.add_argument('-s', '--stream',
+                        action='store_true',
+                        help='Stream the binary dataset file from disk by shuffled chunks instead of loading it in memory')
+    parser.add_argument('--chunk_size',
+                        type=int,
+                        default=4096,
+                        help='Number of consecutive samples read from disk at once (streaming mode)')
+    parser.add_argument('--shuffle_buffer',
+                        type=int,
+                        default=16384,
+                        help='Number of samples kept in memory to shuffle the chunks together (streaming mode)')
+    parser.add_argument('-b', '--batch_size',
+                        type=int,
+                        default=32,
+                        help='Number of samples per gradient update')
+    parser.add_argument('--no_cache',
+                        action='store_true',
+                        help='Read and process the whole dataset instead of using (and updating) the cache of processed samples stored next to the data')
+    parser.add_argument('--base_model',
+                        nargs='?',
+                        type=str,
+                        const=__default_model__,
+                        default=None,
+                        help='Fine-tune this trained model (the default model of hamoco-run if no path is given) instead of training a new one')
+    parser.add_argument('--since',
+                        type=str,
+                        default=None,
+                        help='Only fine-tune on the samples recorded after this date (e.g. 2026-10-18T14:30) or timestamp (fine-tuning mode)')
+    parser.add_argument('--new_samples',
+                        type=int,
+                        default=None,
+                        help='Only fine-tune on this number of most recently recorded samples (fine-tuning mode)')
+    parser.add_argument('--replay',
+                        type=float,
+                        default=0.0,
+                        help='Number of older samples, picked at random, mixed with each new sample to fine-tune the model (fine-tuning mode)')
+    parser.add_argument('--checkpoints',
+                        type=str,
+                        default=None,
+                        help='Directory of the training state (weights, optimizer and epoch) saved after every epoch to resume an interrupted fine-tuning (same path as the model, with a -checkpoints suffix, by default), removed once the training is complete (fine-tuning mode)')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Resume an interrupted fine-tuning from its last checkpoint (fine-tuning mode)')
+    parser.add_argument('--tflite',
+                        choices=['float16', 'int8'],
+                        default=None,
+                        help='Also export a quantized TensorFlow Lite model (same path, with a .tflite extension) that can be used by hamoco-run (the best model with --sweep)')
+    parser.add_argument('--calibration_samples',
+                        type=int,
+                        default=500,
+                        help='Number of training samples used to calibrate the int8 quantization')
+    parser.add_argument('--evaluation_samples',
+                        type=int,
+                        default=10000,
+                        help='Maximum number of validation samples used to compare the TensorFlow Lite model with the float model')
+    parser.add_argument('--sweep',
+                        action='store_true',
+                        help='Train every combination of the --sweep_* values in parallel (instead of a single model) and save the most accurate one')
+    parser.add_argument('--sweep_hidden_layers',
+                        nargs='+',
+                        type=str,
+                        default=None,
+                        help='Dimensions of the hidden layers of each configuration, separated by commas (e.g. --sweep_hidden_layers 50,25,10 100,50,10); --hidden_layers by default')
+    parser.add_argument('--sweep_learning_rates',
+                        nargs='+',
+                        type=float,
+                        default=None,
+                        help='Learning rates to try; --learning_rate by default')
+    parser.add_argument('--sweep_epochs',
+                        nargs='+',
+                        type=int,
+                        default=None,
+                        help='Numbers of epochs to try; --epochs by default')
+    parser.add_argument('--random',
+                        type=int,
+                        default=None,
+                        help='Only train this number of configurations picked at random (random search)')
+    parser.add_argument('-w', '--workers',
+                        type=int,
+                        default=None,
+                        help='Number of configurations trained in parallel (number of CPU cores by default)')
+    parser.add_argument('--leaderboard',
+                        type=str,
+                        default=None,
+                        help='Path to the CSV leaderboard of the sweep (same path as the model, with a -leaderboard.csv suffix, by default)')
     args = parser.parse_args()
     # Custom variables linked to parser
     path_to_model = args.path_to_model
@@ -44,16 +134,139 @@ def main():
     learning_rate = args.learning_rate
     epochs = args.epochs
     test_size = args.test_size
+    stratify = args.stratify
+    stream = args.stream
+    chunk_size = args.chunk_size
+    shuffle_buffer = args.shuffle_buffer
+    batch_size = args.batch_size
+    cache = not args.no_cache
+    tflite = args.tflite
+    calibration_samples = args.calibration_samples
+    evaluation_samples = args.evaluation_samples
+    sweep = args.sweep
+    sweep_hidden_layers = args.sweep_hidden_layers
+    sweep_learning_rates = args.sweep_learning_rates
+    sweep_epochs = args.sweep_epochs
+    n_random = args.random
+    workers = args.workers
+    path_to_leaderboard = args.leaderboard
+    base_model = args.base_model
+    since = args.since
+    n_new_samples = args.new_samples
+    replay = args.replay
+    checkpoint_dir = args.checkpoints
+    resume = args.resume
+    fine_tune = base_model is not None
+    if learning_rate is None:
+        learning_rate = 0.001 if fine_tune else 0.01
+    if since is not None:
+        try:
+            since = float(since)
+        except ValueError:
+            try:
+                since = datetime.datetime.fromisoformat(since).timestamp()
+            except ValueError:
+                parser.error(f'invalid date "{since}" for --since (e.g. 2026-10-18T14:30)')
+    if fine_tune and (sweep or stream):
+        parser.error('--base_model cannot be combined with --sweep or --stream')
+    if fine_tune and since is None and n_new_samples is None:
+        parser.error('--base_model requires --since or --new_samples to select the samples to fine-tune on')
 
-    # Train the model
+    # Sweep over configurations: the dataset is read and processed once
+    if sweep:
+        if stream:
+            parser.error('--sweep cannot be combined with --stream')
+        from hamoco.sweep import Sweep, sweep_configurations
+        if sweep_hidden_layers is None:
+            sweep_hidden_layers = [hidden_layers]
+        else:
+            sweep_hidden_layers = [[int(size) for size in layers.split(',')] for layers in sweep_hidden_layers]
+        configurations = sweep_configurations(hidden_layers=sweep_hidden_layers,
+                                              learning_rates=sweep_learning_rates or [learning_rate],
+                                              epochs=sweep_epochs or [epochs],
+                                              n_random=n_random)
+        if path_to_leaderboard is None:
+            path_to_leaderboard = os.path.splitext(path_to_model)[0] + '-leaderboard.csv'
+        search = Sweep(path_to_data, test_size=test_size, stratify=stratify, cache=cache)
+        print(f'# Training {len(configurations)} configurations')
+        try:
+            search.run(configurations, batch_size=batch_size, workers=workers)
+            search.save_leaderboard(path_to_leaderboard)
+            print(search.report())
+            if search.best is None:
+                raise SystemExit(f'# Every configuration failed (see the leaderboard in {path_to_leaderboard})')
+            search.save_best(path_to_model)
+        finally:
+            search.cleanup()
+        print(f'# Saved the best model to {path_to_model} and the leaderboard to {path_to_leaderboard}')
+        if tflite is None:
+            return
+
+    # Train the model (Keras is only imported now, as it is slow to import)
+    from hamoco import ClassificationModel
     model = ClassificationModel()
-    model.read_dataset(path_to_data)
-    model.process_dataset()
-    model.train(hidden_layers=hidden_layers,
-                learning_rate=learning_rate,
-                epochs=epochs,
-                test_size=test_size)
-    model.save_model(path_to_model)
+    if sweep:
+        # The best model of the sweep is exported below
+        model.load_model(path_to_model)
+        model.training_data = (search.X_train, search.y_train)
+        model.validation_data = (search.X_test, search.y_test)
+    elif stream:
+        model.train_stream(path_to_data,
+                           hidden_layers=hidden_layers,
+                           learning_rate=learning_rate,
+                           epochs=epochs,
+                           test_size=test_size,
+                           chunk_size=chunk_size,
+                           shuffle_buffer=shuffle_buffer,
+                           batch_size=batch_size)
+    else:
+        dataset_cache = model.load_dataset(path_to_data, cache=cache)
+        if dataset_cache is not None:
+            state = 'rebuilt' if dataset_cache.rebuilt else f'{dataset_cache.n_cached} cached'
+            print(f'# Dataset cache: {dataset_cache.n_new} new samples processed ({state})')
+        # Fine-tune an existing model on the new samples only
+        if fine_tune:
+            if checkpoint_dir is None:
+                checkpoint_dir = os.path.splitext(path_to_model)[0] + '-checkpoints'
+            model.load_model(base_model)
+            new_samples = model.select_new_samples(since=since, n_samples=n_new_samples)
+            n_new, n_replay = model.fine_tune(new_samples,
+                                              replay=replay,
+                                              learning_rate=learning_rate,
+                                              epochs=epochs,
+                                              test_size=test_size,
+                                              batch_size=batch_size,
+                                              stratify=stratify,
+                                              checkpoint_dir=checkpoint_dir,
+                                              resume=resume)
+            print(f'# Fine-tuned {base_model} on {n_new} new samples and {n_replay} replayed samples')
+        else:
+            model.train(hidden_layers=hidden_layers,
+                        learning_rate=learning_rate,
+                        epochs=epochs,
+                        test_size=test_size,
+                        batch_size=batch_size,
+                        stratify=stratify)
+    if not sweep:
+        model.save_model(path_to_model)
+
+    # Quantized TensorFlow Lite model, compared with the float model
+    # (both as they are run by hamoco-run)
+    if tflite is not None:
+        from hamoco.inference import load_model, evaluate_model
+        path_to_tflite = os.path.splitext(path_to_model)[0] + '.tflite'
+        X_calibration, _ = model.sample_data(calibration_samples)
+        model.export_tflite(path_to_tflite, quantization=tflite, representative_data=X_calibration)
+        X_test, y_test = model.sample_data(evaluation_samples, validation=True)
+        if y_test.size == 0:
+            X_test, y_test = model.sample_data(evaluation_samples)
+        float_accuracy, float_latency = evaluate_model(load_model(path_to_model), X_test, y_test)
+        tflite_accuracy, tflite_latency = evaluate_model(load_model(path_to_tflite), X_test, y_test)
+        print(f'Exported {tflite} TensorFlow Lite model to {path_to_tflite} ({os.path.getsize(path_to_tflite)} bytes)')
+        print(f'{"model":>8} {"accuracy":>9} {"latency":>12}')
+        print(f'{"float32":>8} {float_accuracy:9.4f} {float_latency*1e6:9.1f} us')
+        print(f'{tflite:>8} {tflite_accuracy:9.4f} {tflite_latency*1e6:9.1f} us')
+        print(f'accuracy delta: {tflite_accuracy - float_accuracy:+.4f} ({y_test.size} samples)')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,17 +1,22 @@
 import enum
+import time
 
-import pyautogui
 import numpy
 
 from .hand import Hand
 from .utils import clamp
-from .filter import OneEuroFilter
+from .filter import OneEuroArrayFilter
+from .actuation import MouseBackend, open_backend
 
 class HandyMouseController:
 
     sensitivity_range = 1.5
     min_detection_margin = 0.15
     max_detection_margin = 0.50
+    # Time unit of the motion smoothing: the filter settings were tuned with
+    # time counted in frames at this frame rate
+    reference_fps = 30.0
+    palm_landmarks = numpy.array(Hand.palm_landmarks)
 
     @enum.unique
     class MouseState(enum.IntEnum):
@@ -28,7 +33,8 @@ class HandyMouseController:
         SCROLL = Hand.Pose.THUMB_SIDE
         LEFT_DOWN = Hand.Pose.INDEX_MIDDLE_UP
 
-    def __init__(self, sensitivity=0.5, margin=0.25, scrolling_threshold=0.1, scrolling_speed=1.0, min_cutoff_filter=0.1, beta_filter=0.0):        
+    def __init__(self, sensitivity=0.5, margin=0.25, scrolling_threshold=0.1, scrolling_speed=1.0, min_cutoff_filter=0.1, beta_filter=0.0,
+                 backend='pyautogui', moves_pointer=True):
         self.sensitivity = sensitivity
         self.margin = margin
         self.scrolling_threshold = scrolling_threshold
@@ -37,14 +43,21 @@ class HandyMouseController:
         self.min_cutoff_filter = min_cutoff_filter
         self.beta_filter = beta_filter
         self.frame = 0
-        self.filter = [OneEuroFilter(0, 0, min_cutoff=min_cutoff_filter, beta=beta_filter) for filter in range(2)]
+        self.filter = None
         # Mouse state and screen
         self.previous_hand_pose = Hand.Pose.UNDEFINED
         self.current_mouse_state = self.MouseState.STANDARD
         self.current_state_init = 0
         self.previous_position = numpy.zeros(2)
         self.scrolling_origin = 0
-        self.screen_resolution = numpy.array(pyautogui.size())
+        # Left button held by a drag
+        self.button_down = False
+        # Mouse actions (backend instance or name, see `hamoco.actuation`)
+        self.backend = backend if isinstance(backend, MouseBackend) else open_backend(backend)
+        self.screen_resolution = numpy.array(self.backend.size())
+        # Only one controller should move the pointer of a shared backend
+        # (the others click, scroll and hold the button)
+        self.moves_pointer = moves_pointer
 
     @property
     def sensitivity(self):
@@ -74,15 +87,21 @@ class HandyMouseController:
         min_margin = HandyMouseController.min_detection_margin
         self._margin = (max_margin - min_margin) * value + min_margin    
 
-    def palm_center(self, landmark_vector):
+    def palm_center(self, landmark_vector, timestamp=None):
+        '''Smoothed palm center of a hand observed at `timestamp` (in seconds, now by default).'''
         self.frame += 1
-        center = numpy.zeros(2)
-        for axis in range(2):
-            # Palm center
-            center[axis] = landmark_vector[axis::2][Hand.palm_landmarks].mean()
-            # Smoothing
-            center[axis] = self.filter[axis](self.frame, center[axis])
-        return center
+        # Palm center
+        center = numpy.reshape(landmark_vector, (-1, Hand.dimension))[self.palm_landmarks].sum(axis=0)
+        center /= self.palm_landmarks.size
+        # Smoothing (both axes at once), so that the motion is smoothed
+        # the same way whatever the frame rate
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        t = timestamp * HandyMouseController.reference_fps
+        if self.filter is None:
+            self.filter = OneEuroArrayFilter(t, center, min_cutoff=self.min_cutoff_filter, beta=self.beta_filter)
+            return center
+        return self.filter(t, center)
 
     def enter_state(self, state):
         self.current_mouse_state = state
@@ -90,7 +109,7 @@ class HandyMouseController:
 
     @property
     def pointer_position(self):
-        return pyautogui.position()
+        return self.backend.position()
 
     def to_screen_coordinates(self, xy):
         trim_xy = numpy.empty_like(xy)
@@ -103,9 +122,10 @@ class HandyMouseController:
 
     def handle_pointer(self, hand_center, hand_pose):
         screen_xy = self.to_screen_coordinates(hand_center)
-        if hand_pose == HandyMouseController.Event.MOVE or hand_pose == HandyMouseController.Event.LEFT_DOWN:
+        moves = hand_pose == HandyMouseController.Event.MOVE or hand_pose == HandyMouseController.Event.LEFT_DOWN
+        if moves and self.moves_pointer:
             delta = (1 + self._sensitivity) * (screen_xy - self.previous_position)
-            pyautogui.move(delta[0], delta[1], _pause=False)
+            self.backend.move(delta[0], delta[1])
         self.previous_position = screen_xy
 
     def accessible_area(self, image):
@@ -142,12 +162,22 @@ class HandyMouseController:
             self.enter_state(target_state)
 
     def left_click(self):
-        pyautogui.leftClick(_pause=False)
+        self.backend.left_click()
 
     def right_click(self):
-        pyautogui.rightClick(_pause=False)
+        self.backend.right_click()
 
-    def operate_mouse(self, hand, palm_center, confidence, min_confidence=0.5):
+    def release(self):
+        '''Release the button held by an unfinished drag (e.g. on exit).'''
+        if self.button_down:
+            self.backend.mouse_up()
+            self.button_down = False
+
+    def flush(self):
+        '''Send the pending pointer moves and scroll ticks as a single event.'''
+        self.backend.flush()
+
+    def operate_mouse(self, hand, palm_center, confidence, min_confidence=0.5, flush=True):
 
         # Mouse in STANDARD mode
         if self.current_mouse_state == HandyMouseController.MouseState.STANDARD:
@@ -176,7 +206,7 @@ class HandyMouseController:
                 else:
                     diff_to_origin_y = self.scrolling_origin - palm_center[1]
                     if abs(diff_to_origin_y) > self.scrolling_threshold:
-                        pyautogui.scroll(int(numpy.sign(diff_to_origin_y) * self.scrolling_speed), _pause=False)
+                        self.backend.scroll(int(numpy.sign(diff_to_origin_y) * self.scrolling_speed))
 
             # Hand pose changed: perform the appropriate action
             elif hand.pose != self.previous_hand_pose and confidence > min_confidence:
@@ -188,15 +218,21 @@ class HandyMouseController:
 
             # Begin dragging
             if self.current_state_init == self.frame - 1:
-                pyautogui.mouseDown(_pause=False)
+                self.backend.mouse_down()
+                self.button_down = True
             
             # Stop dragging if hand pose changed
             elif hand.pose != self.previous_hand_pose and confidence > min_confidence:
-                pyautogui.mouseUp(_pause=False)
+                self.backend.mouse_up()
+                self.button_down = False
                 self._on_pose_change(hand.pose)
                 self.previous_hand_pose = hand.pose
             
             # Move the pointer like in standard mode with dragging enabled
             else:
                 self.handle_pointer(palm_center, hand.pose)
-                self.previous_hand_pose = hand.pose
\ No newline at end of file
+                self.previous_hand_pose = hand.pose
+
+        # Send the pointer moves and scroll ticks of this tick
+        if flush:
+            self.flush()
@@ -0,0 +1,283 @@
+import os
+import time
+import warnings
+
+import numpy
+
+# Binary dataset: a small header followed by fixed-size records that are
+# appended one after the other (label, timestamp, processed landmarks)
+default_dataset_file = 'dataset.hamoco'
+dataset_magic = b'HAMOCODS'
+dataset_version = 1
+header_dtype = numpy.dtype([('magic', 'S8'), ('version', '<u4'), ('n_features', '<u4')])
+
+def dataset_dtype(n_features=42):
+    return numpy.dtype([('label', '<i4'),
+                        ('time', '<f8'),
+                        ('features', '<f4', (n_features,))])
+
+def read_header(path, magic=dataset_magic):
+    '''Return the header of a binary dataset file.'''
+    header = numpy.fromfile(path, dtype=header_dtype, count=1)
+    if header.size == 0 or header['magic'][0] != magic:
+        raise ValueError(f'"{path}" is not a valid binary file (expected {magic})')
+    return header[0]
+
+def write_header(file, magic=dataset_magic, version=dataset_version, n_features=42):
+    header = numpy.array([(magic, version, n_features)], dtype=header_dtype)
+    file.write(header.tobytes())
+
+def open_records(path, dtype_function, magic, mode='r'):
+    '''Memory-map the records that follow the header of a binary file.'''
+    header = read_header(path, magic=magic)
+    dtype = dtype_function(int(header['n_features']))
+    # Ignore an incomplete record at the end of the file (interrupted write)
+    n_records = (os.path.getsize(path) - header_dtype.itemsize) // dtype.itemsize
+    if n_records == 0:
+        return numpy.empty(0, dtype=dtype)
+    return numpy.memmap(path, dtype=dtype, mode=mode, offset=header_dtype.itemsize, shape=(n_records,))
+
+def open_dataset(path, mode='r'):
+    '''Memory-map the records of a binary dataset file (no data is copied).
+    Use mode "c" to be able to modify the records in memory without
+    changing the file.'''
+    return open_records(path, dataset_dtype, dataset_magic, mode=mode)
+
+def find_dataset(path):
+    '''Return the path to the binary dataset file in `path` (file or directory), or None.'''
+    if os.path.isfile(path):
+        return path
+    path_to_file = os.path.join(path, default_dataset_file)
+    if os.path.isfile(path_to_file):
+        return path_to_file
+    return None
+
+class DatasetWriter:
+    '''Append labeled samples to a binary dataset file.'''
+
+    def __init__(self, path, n_features=42):
+        self.path = path
+        self.dtype = dataset_dtype(n_features)
+        new_file = not os.path.isfile(path) or os.path.getsize(path) == 0
+        if not new_file:
+            header = read_header(path)
+            if header['n_features'] != n_features:
+                raise ValueError(f'"{path}" contains samples with {header["n_features"]} features (expected {n_features})')
+        self.file = open(path, 'ab')
+        if new_file:
+            write_header(self.file, n_features=n_features)
+        # Drop an incomplete record at the end of the file (interrupted write)
+        else:
+            size = os.path.getsize(path) - header_dtype.itemsize
+            if size % self.dtype.itemsize:
+                self.file.truncate(header_dtype.itemsize + size - size % self.dtype.itemsize)
+        self.file.seek(0, os.SEEK_END)
+        self.n_samples = (self.file.tell() - header_dtype.itemsize) // self.dtype.itemsize
+
+    def append(self, label, features, timestamp=None):
+        self.extend([label], numpy.reshape(features, (1, -1)), None if timestamp is None else [timestamp])
+
+    def extend(self, labels, features, timestamps=None):
+        records = numpy.empty(len(labels), dtype=self.dtype)
+        records['label'] = labels
+        records['time'] = time.time() if timestamps is None else timestamps
+        records['features'] = features
+        self.file.write(records.tobytes())
+        self.n_samples += records.size
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def remove_label(path, label):
+    '''Remove every sample with a given label from a binary dataset file.'''
+    records = open_dataset(path)
+    kept = records[records['label'] != label]
+    header = read_header(path)
+    path_to_tmp = path + '.tmp'
+    with open(path_to_tmp, 'wb') as tmp_file:
+        write_header(tmp_file, n_features=int(header['n_features']))
+        tmp_file.write(kept.tobytes())
+    del records
+    os.replace(path_to_tmp, path)
+    return kept.size
+
+def read_text_sample(path_to_sample):
+    '''Read a sample saved in text format (label, then features on the next line).'''
+    with open(path_to_sample, 'r') as file:
+        # label
+        y_i = int(file.readline())
+        # features
+        x_i = file.readline().split()
+        x_i = list(map(numpy.float32, x_i))
+        return x_i, y_i
+
+def list_text_samples(path_to_dataset):
+    '''Sorted paths to the samples saved in text format in a directory.'''
+    paths_to_dataset_files = os.listdir(path_to_dataset)
+    paths_to_dataset_files = [os.path.join(path_to_dataset, f) for f in paths_to_dataset_files if f.endswith('.dat')]
+    paths_to_dataset_files.sort()
+    return paths_to_dataset_files
+
+def read_dataset(path_to_dataset, n_features=42):
+    '''Samples (X, y) of a directory with a binary dataset file (memory-mapped
+    copy-on-write, so that the file is never modified) or text samples.'''
+    path_to_file = find_dataset(path_to_dataset)
+    if path_to_file is not None:
+        warn_ignored_text_samples(path_to_dataset)
+        records = open_dataset(path_to_file, mode='c')
+        return records['features'], records['label']
+    paths_to_samples = list_text_samples(path_to_dataset)
+    X = numpy.empty((len(paths_to_samples), n_features), dtype=numpy.float32)
+    y = numpy.empty(len(paths_to_samples), dtype=numpy.int32)
+    for i, sample in enumerate(paths_to_samples):
+        X[i,:], y[i] = read_text_sample(sample)
+    return X, y
+
+def ignored_text_samples(path_to_dataset):
+    '''Text samples of a directory that are not in its binary dataset file (which
+    is read instead of them), e.g. recorded in text format after a conversion.
+    Converted samples are recognized by their timestamps (see `convert_text_dataset`).'''
+    path_to_file = find_dataset(path_to_dataset)
+    if path_to_file is None or not os.path.isdir(path_to_dataset):
+        return []
+    paths_to_samples = list_text_samples(path_to_dataset)
+    if len(paths_to_samples) == 0:
+        return []
+    times = numpy.array([os.path.getmtime(sample) for sample in paths_to_samples])
+    converted = numpy.isin(times, open_dataset(path_to_file)['time'])
+    return [sample for sample, found in zip(paths_to_samples, converted) if not found]
+
+def warn_ignored_text_samples(path_to_dataset):
+    ignored = ignored_text_samples(path_to_dataset)
+    if ignored:
+        warnings.warn(f'{len(ignored)} text samples of "{path_to_dataset}" are not in its binary dataset file '
+                      'and are ignored (convert them again with hamoco-convert --force)', stacklevel=3)
+
+def read_timestamps(path_to_dataset):
+    '''Recording times of the samples of `read_dataset` (modification times of
+    the text samples, as in `convert_text_dataset`).'''
+    path_to_file = find_dataset(path_to_dataset)
+    if path_to_file is not None:
+        return numpy.array(open_dataset(path_to_file)['time'])
+    return numpy.array([os.path.getmtime(sample) for sample in list_text_samples(path_to_dataset)], dtype=numpy.float64)
+
+def convert_text_dataset(path_to_dataset, path_to_file=None, n_features=42, overwrite=False):
+    '''Convert a directory of samples saved in text format (`.dat` files) to a
+    binary dataset file. An existing file is only replaced with `overwrite` (its
+    samples are lost). Returns the number of converted samples.'''
+    if path_to_file is None:
+        path_to_file = os.path.join(path_to_dataset, default_dataset_file)
+    if os.path.exists(path_to_file) and not overwrite:
+        raise FileExistsError(f'"{path_to_file}" already exists')
+    paths_to_samples = list_text_samples(path_to_dataset)
+    labels = numpy.empty(len(paths_to_samples), dtype=numpy.int32)
+    features = numpy.empty((len(paths_to_samples), n_features), dtype=numpy.float32)
+    times = numpy.empty(len(paths_to_samples))
+    for i, sample in enumerate(paths_to_samples):
+        features[i], labels[i] = read_text_sample(sample)
+        times[i] = os.path.getmtime(sample)
+    # New file, that replaces the existing one once complete
+    path_to_tmp = path_to_file + '.tmp'
+    if os.path.isfile(path_to_tmp):
+        os.remove(path_to_tmp)
+    with DatasetWriter(path_to_tmp, n_features=n_features) as writer:
+        writer.extend(labels, features, timestamps=times)
+    os.replace(path_to_tmp, path_to_file)
+    return len(paths_to_samples)
+
+class DatasetStream:
+    '''Iterate over batches of a binary dataset file without loading it in
+    memory. Chunks of consecutive samples are read from disk in random order
+    and mixed in a shuffle buffer before being split into batches, so that
+    memory usage only depends on `chunk_size` and `shuffle_buffer`. The
+    iterator loops over epochs indefinitely, and `len()` returns the number
+    of batches per epoch. With `index`, only these samples are used (the
+    chunks that contain them are read, and the other samples dropped).'''
+
+    def __init__(self, path, index=None, chunk_size=4096, shuffle_buffer=16384, batch_size=32,
+                 shuffle=True, transform=None, seed=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.shuffle_buffer = shuffle_buffer if shuffle else 0
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.transform = transform
+        self.rng = numpy.random.default_rng(seed)
+        self.n_samples_file = open_dataset(path).size
+        if index is None:
+            self.index = None
+            self.chunks = numpy.arange(-(-self.n_samples_file // chunk_size))
+            self.n_samples = self.n_samples_file
+        else:
+            self.index = numpy.sort(numpy.asarray(index, dtype=numpy.int64))
+            self.chunks = numpy.unique(self.index // chunk_size)
+            self.n_samples = self.index.size
+
+    @classmethod
+    def split(cls, path, test_size=0.0, chunk_size=4096, seed=None, **kwargs):
+        '''Training and validation streams from a random split of the samples that
+        preserves the proportion of each label in both streams. The split is not
+        drawn by chunks, as the poses are recorded one after the other and most
+        chunks hold a single pose: both streams read the chunks and keep their
+        own samples.'''
+        rng = numpy.random.default_rng(seed)
+        labels = numpy.array(open_dataset(path)['label'])
+        is_test = numpy.zeros(labels.size, dtype=bool)
+        for label in numpy.unique(labels):
+            samples = numpy.flatnonzero(labels == label)
+            is_test[rng.permutation(samples)[:int(test_size * samples.size)]] = True
+        train_index, test_index = numpy.flatnonzero(~is_test), numpy.flatnonzero(is_test)
+        train = cls(path, index=train_index, chunk_size=chunk_size, seed=seed, **kwargs)
+        kwargs['shuffle'] = False
+        test = cls(path, index=test_index, chunk_size=chunk_size, **kwargs)
+        return train, test
+
+    def __len__(self):
+        return -(-self.n_samples // self.batch_size)
+
+    def __iter__(self):
+        while True:
+            yield from self.epoch()
+
+    def epoch(self):
+        '''Iterate over the batches of a single epoch.'''
+        records = open_dataset(self.path)
+        chunks = self.rng.permutation(self.chunks) if self.shuffle else self.chunks
+        X_pool = numpy.empty((0, records.dtype['features'].shape[0]), dtype=numpy.float32)
+        y_pool = numpy.empty(0, dtype=numpy.int32)
+        for chunk in chunks:
+            start, stop = self._chunk_bounds(chunk)
+            block = records[start:stop]
+            if self.index is not None:
+                block = block[self.index[numpy.searchsorted(self.index, start):numpy.searchsorted(self.index, stop)] - start]
+            X = numpy.array(block['features'], dtype=numpy.float32)
+            y = numpy.array(block['label'], dtype=numpy.int32)
+            if self.transform is not None:
+                self.transform(X)
+            X_pool = numpy.concatenate((X_pool, X))
+            y_pool = numpy.concatenate((y_pool, y))
+            if self.shuffle:
+                order = self.rng.permutation(y_pool.size)
+                X_pool, y_pool = X_pool[order], y_pool[order]
+            # Keep `shuffle_buffer` samples to be mixed with the next chunks
+            n_batches = max(y_pool.size - self.shuffle_buffer, 0) // self.batch_size
+            n_out = n_batches * self.batch_size
+            for start in range(0, n_out, self.batch_size):
+                yield X_pool[start:start+self.batch_size], y_pool[start:start+self.batch_size]
+            X_pool, y_pool = X_pool[n_out:], y_pool[n_out:]
+        # Flush the remaining samples
+        for start in range(0, y_pool.size, self.batch_size):
+            yield X_pool[start:start+self.batch_size], y_pool[start:start+self.batch_size]
+
+    def _chunk_bounds(self, chunk):
+        start = int(chunk) * self.chunk_size
+        return start, min(start + self.chunk_size, self.n_samples_file)
@@ -1,5 +1,7 @@
 import math
 
+import numpy
+
 def smoothing_factor(t_e, cutoff):
     r = 2 * math.pi * cutoff * t_e
     return r / (r + 1)
@@ -41,4 +43,84 @@ class OneEuroFilter:
         self.dx_prev = dx_hat
         self.t_prev = t
 
-        return x_hat
\ No newline at end of file
+        return x_hat
+
+class OneEuroArrayFilter:
+    '''One euro filter applied element-wise to an array of any shape (e.g. the
+    palm center, or all the landmarks of a hand), updated in a single vectorized
+    step per sample. It gives the same results as one `OneEuroFilter` per element.'''
+
+    def __init__(self, t0, x0, dx0=0.0, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        self.min_cutoff = float(min_cutoff)
+        self.beta = float(beta)
+        self.d_cutoff = float(d_cutoff)
+        # Previous values
+        self.x_prev = numpy.array(x0, dtype=numpy.float64)
+        self.dx_prev = numpy.empty_like(self.x_prev)
+        self.dx_prev[...] = dx0
+        self.t_prev = float(t0)
+        # Buffers
+        self._dx = numpy.empty_like(self.x_prev)
+        self._a = numpy.empty_like(self.x_prev)
+
+    @property
+    def shape(self):
+        return self.x_prev.shape
+
+    def __call__(self, t, x, out=None):
+        '''Filter a new sample `x` observed at time `t`. Returns the filtered
+        sample (written into `out` if provided).'''
+        t_e = t - self.t_prev
+        # Repeated timestamp: nothing to update
+        if t_e > 0:
+            dx, a = self._dx, self._a
+
+            # The filtered derivative of the signal
+            a_d = smoothing_factor(t_e, self.d_cutoff)
+            numpy.subtract(x, self.x_prev, out=dx)
+            dx /= t_e
+            dx *= a_d
+            self.dx_prev *= 1 - a_d
+            self.dx_prev += dx
+
+            # The filtered signal (same operations as `smoothing_factor`
+            # and `exponential_smoothing`, element-wise). The cutoff is the
+            # same for all elements when it does not depend on the speed.
+            if self.beta == 0:
+                a = smoothing_factor(t_e, self.min_cutoff)
+                dx[...] = 1 - a
+            else:
+                numpy.abs(self.dx_prev, out=a)
+                a *= self.beta
+                a += self.min_cutoff
+                a *= 2 * math.pi
+                a *= t_e
+                numpy.add(a, 1, out=dx)
+                a /= dx
+                numpy.subtract(1, a, out=dx)
+            self.x_prev *= dx
+            numpy.multiply(a, x, out=dx)
+            self.x_prev += dx
+            self.t_prev = t
+
+        if out is None:
+            return self.x_prev.copy()
+        out[...] = self.x_prev
+        return out
+
+    def filter_sequence(self, timestamps, sequence, out=None):
+        '''Filter a sequence of samples with shape (T, ...) observed at `timestamps`.
+        Returns the filtered sequence (written into `out` if provided).'''
+        sequence = numpy.asarray(sequence)
+        if out is None:
+            out = numpy.empty(sequence.shape)
+        for i, t in enumerate(timestamps):
+            self(t, sequence[i], out=out[i])
+        return out
+
+def filter_sequence(timestamps, sequence, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, out=None):
+    '''Filter a recorded sequence of samples with shape (T, ...) from its first
+    sample (e.g. to tune the filter parameters offline).'''
+    sequence = numpy.asarray(sequence)
+    one_euro_filter = OneEuroArrayFilter(timestamps[0], sequence[0], min_cutoff=min_cutoff, beta=beta, d_cutoff=d_cutoff)
+    return one_euro_filter.filter_sequence(timestamps, sequence, out=out)
@@ -2,7 +2,6 @@ import time
 import enum
 
 import numpy
-import cv2
 
 class Hand:
 
@@ -19,6 +18,9 @@ class Hand:
     # Indices of palm landmarks in mediapipe hands
     palm_landmarks = [0, 5, 9, 13, 17]
 
+    # Number of landmarks in mediapipe hands
+    n_landmarks = 21
+
     # Dimension: only look at X and Y for landmarks (discard Z)
     # If Z must be added at some point, changes will be minor
     dimension = 2
@@ -34,21 +36,54 @@ class Hand:
             if isinstance(pose, str):
                 self.pose = self.Pose[pose]
 
-    def vectorize_landmarks(self, landmarks):
-        landmarks_vector = numpy.zeros(self.dimension * len(landmarks))
+    @classmethod
+    def vectorize_landmarks(cls, landmarks, out=None):
+        '''Flatten landmarks into a vector (x0, y0, x1, y1, ...). `landmarks` is either
+        a sequence of mediapipe landmarks, or an array of coordinates with shape
+        (21,2) for one hand or (N,21,2) for a stack of N hands. The result is written
+        into `out` if provided.'''
+        # Array of coordinates
+        if isinstance(landmarks, numpy.ndarray):
+            points = landmarks[..., :cls.dimension]
+            shape = points.shape[:-2] + (cls.dimension * points.shape[-2],)
+            if out is None:
+                out = numpy.empty(shape)
+            out.reshape(points.shape)[...] = points
+            return out
+        # Mediapipe landmarks
+        if out is None:
+            out = numpy.empty(cls.dimension * len(landmarks))
         for lm_i, landmark in enumerate(landmarks):
-            landmarks_vector[self.dimension*lm_i] = landmark.x
-            landmarks_vector[self.dimension*lm_i+1] = landmark.y
-        return landmarks_vector
+            out[cls.dimension*lm_i] = landmark.x
+            out[cls.dimension*lm_i+1] = landmark.y
+        return out
 
-    def feature_process_landmarks(self, landmarks_vector):
-        processed_landmarks = landmarks_vector.copy()
-        for axis in range(self.dimension):
-            # Translate center of mass back to origin
-            processed_landmarks[axis::self.dimension] -= processed_landmarks[axis::self.dimension].mean()
-            # Make scale invariant
-            processed_landmarks[axis::self.dimension] /= processed_landmarks[axis::self.dimension].std()
-        return processed_landmarks.reshape(1,-1)
+    @classmethod
+    def feature_process_landmarks(cls, landmarks_vector, out=None):
+        '''Translate the center of mass of the hand back to the origin and make the
+        landmarks scale invariant. Accepts a single landmarks vector or a stack of
+        them (with shape (N,42) or (N,21,2)), and returns an array of shape (N,42). The result is written into `out`
+        if provided, which can be the input array itself.'''
+        landmarks_vector = numpy.asarray(landmarks_vector)
+        points = landmarks_vector.reshape(-1, cls.n_landmarks, cls.dimension)
+        if out is None:
+            out = numpy.empty((points.shape[0], points.shape[1] * cls.dimension), dtype=points.dtype)
+        processed_points = out.reshape(points.shape)
+        # Non-contiguous buffer (e.g. column slice): processed in the copy made
+        # by `reshape`, then written back
+        write_back = not numpy.may_share_memory(processed_points, out)
+        # Translate center of mass back to origin
+        center = points.sum(axis=1, keepdims=True)
+        center /= cls.n_landmarks
+        numpy.subtract(points, center, out=processed_points)
+        # Make scale invariant (divide by the standard deviation along each axis)
+        scale = numpy.einsum('nij,nij->nj', processed_points, processed_points)
+        scale /= cls.n_landmarks
+        numpy.sqrt(scale, out=scale)
+        processed_points /= scale[:,None,:]
+        if write_back:
+            out[...] = processed_points.reshape(out.shape)
+        return out.reshape(points.shape[0], -1)
 
 class HandSnapshot:
 
@@ -61,10 +96,26 @@ class HandSnapshot:
 
     def save_processed_image(self, image, path=None):
         '''Save image with landmarks on them.'''
+        import cv2
         if path is None:
             path = 'hand_snapshot'
         cv2.imwrite(f'{path}.jpg', image)
 
+    def append_landmarks_vector(self, landmarks, writer):
+        '''Append the landmarks vector to a binary dataset (see `hamoco.dataset.DatasetWriter`).'''
+        raw_landmarks_vector = self.hand.vectorize_landmarks(landmarks)
+        processed_landmarks_vector = self.hand.feature_process_landmarks(raw_landmarks_vector)
+        writer.append(self.hand.pose.value, processed_landmarks_vector, timestamp=self.time)
+
+    def append_landmarks_vectors(self, multi_landmarks, writer):
+        '''Append the landmarks vectors of several hands (same pose) to a binary dataset at once.'''
+        raw_landmarks_vectors = numpy.empty((len(multi_landmarks), self.hand.dimension * self.hand.n_landmarks))
+        for i, landmarks in enumerate(multi_landmarks):
+            self.hand.vectorize_landmarks(landmarks, out=raw_landmarks_vectors[i])
+        processed_landmarks_vectors = self.hand.feature_process_landmarks(raw_landmarks_vectors, out=raw_landmarks_vectors)
+        n_hands = len(multi_landmarks)
+        writer.extend([self.hand.pose.value] * n_hands, processed_landmarks_vectors, timestamps=[self.time] * n_hands)
+
     def save_landmarks_vector(self, landmarks, path=None):
         '''Save the landmarks vector to a text file.'''
         if path is None:
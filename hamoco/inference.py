@@ -0,0 +1,220 @@
+import json
+import time
+
+import numpy
+import h5py
+
+def relu(x):
+    return numpy.maximum(x, 0, out=x)
+
+def softmax(x):
+    x -= x.max(axis=-1, keepdims=True)
+    numpy.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+def sigmoid(x):
+    numpy.negative(x, out=x)
+    numpy.exp(x, out=x)
+    x += 1
+    return numpy.reciprocal(x, out=x)
+
+def tanh(x):
+    return numpy.tanh(x, out=x)
+
+def linear(x):
+    return x
+
+class NumpyModel:
+    '''Lightweight inference engine for the dense classification models
+    trained with `ClassificationModel`. The weights are read directly from
+    the Keras `.h5` file and the forward pass only relies on NumPy, so
+    TensorFlow does not need to be imported to predict hand poses.'''
+
+    activations = {'relu': relu,
+                   'softmax': softmax,
+                   'sigmoid': sigmoid,
+                   'tanh': tanh,
+                   'linear': linear}
+
+    def __init__(self, layers, dtype=numpy.float32):
+        # Each layer is a (kernel, bias, activation) tuple
+        self.dtype = dtype
+        self.layers = []
+        for kernel, bias, activation in layers:
+            if activation not in self.activations:
+                raise ValueError(f'unsupported activation function "{activation}"')
+            self.layers.append((numpy.ascontiguousarray(kernel, dtype=dtype),
+                                numpy.ascontiguousarray(bias, dtype=dtype),
+                                self.activations[activation]))
+        self.n_features = self.layers[0][0].shape[0]
+        self.num_classes = self.layers[-1][0].shape[1]
+
+    @classmethod
+    def from_h5(cls, path, dtype=numpy.float32):
+        '''Extract the weights of a Sequential model of Dense layers saved in HDF5 format.'''
+        with h5py.File(path, 'r') as h5_file:
+            model_config = h5_file.attrs['model_config']
+            if isinstance(model_config, bytes):
+                model_config = model_config.decode('utf-8')
+            model_config = json.loads(model_config)
+            if model_config['class_name'] != 'Sequential':
+                raise ValueError(f'unsupported model type "{model_config["class_name"]}"')
+            weights = h5_file['model_weights'] if 'model_weights' in h5_file else h5_file
+
+            layers = []
+            for layer in model_config['config']['layers']:
+                class_name = layer['class_name']
+                config = layer['config']
+                # No computation in these layers
+                if class_name in ['InputLayer', 'Dropout']:
+                    continue
+                if class_name != 'Dense':
+                    raise ValueError(f'unsupported layer type "{class_name}"')
+                # Weights are listed in the order (kernel, bias)
+                group = weights[config['name']]
+                weight_names = [_decode(name) for name in group.attrs['weight_names']]
+                kernel = group[weight_names[0]][()]
+                if config.get('use_bias', True):
+                    bias = group[weight_names[1]][()]
+                else:
+                    bias = numpy.zeros(kernel.shape[1])
+                layers.append((kernel, bias, config.get('activation', 'linear')))
+        return cls(layers, dtype=dtype)
+
+    def predict(self, X):
+        '''Return the class probabilities for a single vector or a batch of vectors.'''
+        output = numpy.asarray(X, dtype=self.dtype).reshape(-1, self.n_features)
+        for kernel, bias, activation in self.layers:
+            output = output @ kernel
+            output += bias
+            output = activation(output)
+        return output
+
+    __call__ = predict
+
+def _decode(name):
+    return name.decode('utf-8') if isinstance(name, bytes) else name
+
+class TFLiteModel:
+    '''Inference engine for the TensorFlow Lite models exported with
+    `ClassificationModel.export_tflite` (float16 or int8 quantization). The
+    interpreter of the lightweight `tflite-runtime` (or `ai-edge-litert`)
+    package is used when it is installed, otherwise the one of TensorFlow.
+    Quantized inputs and outputs are converted from and to floats, so that
+    the model is used like `NumpyModel`.'''
+
+    def __init__(self, path, num_threads=1):
+        Interpreter = _tflite_interpreter()
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.n_features = int(self.input['shape'][-1])
+        self.num_classes = int(self.output['shape'][-1])
+        self.batch_size = int(self.input['shape'][0])
+
+    def predict(self, X):
+        '''Return the class probabilities for a single vector or a batch of vectors.'''
+        X = numpy.asarray(X, dtype=numpy.float32).reshape(-1, self.n_features)
+        # Tensors are only reallocated when the batch size changes
+        if X.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input['index'], X.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = X.shape[0]
+        self.interpreter.set_tensor(self.input['index'], _quantize(X, self.input))
+        self.interpreter.invoke()
+        return _dequantize(self.interpreter.get_tensor(self.output['index']), self.output)
+
+    __call__ = predict
+
+def _tflite_interpreter():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+def _quantize(X, details):
+    scale, zero_point = details['quantization']
+    if scale == 0:
+        return X.astype(details['dtype'], copy=False)
+    limits = numpy.iinfo(details['dtype'])
+    X = numpy.round(X / scale + zero_point)
+    return numpy.clip(X, limits.min, limits.max, out=X).astype(details['dtype'])
+
+def _dequantize(X, details):
+    scale, zero_point = details['quantization']
+    if scale == 0:
+        return X.astype(numpy.float32, copy=False)
+    return (X.astype(numpy.float32) - zero_point) * numpy.float32(scale)
+
+def load_model(path):
+    '''Load a classification model for inference (Keras `.h5` or TensorFlow Lite `.tflite` file).'''
+    if str(path).endswith('.tflite'):
+        return TFLiteModel(path)
+    return NumpyModel.from_h5(path)
+
+def evaluate_model(model, X, y, n_latency=1000):
+    '''Accuracy of `model` on the samples (X, y), and its mean latency (in seconds)
+    to predict a single sample, as in the main application.'''
+    accuracy = float(numpy.mean(numpy.argmax(model.predict(X), axis=1) == y)) if len(y) > 0 else float('nan')
+    samples = X[:n_latency]
+    start = time.perf_counter()
+    for x in samples:
+        model.predict(x)
+    latency = (time.perf_counter() - start) / len(samples) if len(samples) > 0 else float('nan')
+    return accuracy, latency
+
+class PredictionGate:
+    '''Reuse the last prediction of a model while its input barely changes.
+    The model is only evaluated when the landmark vectors moved by more than
+    `threshold` (Euclidean distance) since the last evaluated ones, or when
+    the last prediction has been reused `max_age` times in a row. Reused and
+    evaluated predictions are counted by `n_hits` and `n_misses`.'''
+
+    def __init__(self, model, threshold=0.1, max_age=5):
+        self.model = model
+        self.threshold = threshold
+        self.max_age = max_age
+        self.n_hits = 0
+        self.n_misses = 0
+        self.reset()
+
+    def reset(self):
+        '''Forget the last prediction (e.g. when the hand is lost).'''
+        self.last_X = None
+        self.last_probabilities = None
+        self.age = 0
+
+    @property
+    def hit_rate(self):
+        n_calls = self.n_hits + self.n_misses
+        return self.n_hits / n_calls if n_calls > 0 else 0.0
+
+    def predict(self, X):
+        '''Return the class probabilities for a single vector or a batch of vectors.'''
+        X = numpy.atleast_2d(X)
+        if self._reusable(X):
+            self.age += 1
+            self.n_hits += 1
+            return self.last_probabilities
+        self.n_misses += 1
+        probabilities = self.model.predict(X)
+        self.last_X = X.copy()
+        self.last_probabilities = probabilities
+        self.age = 0
+        return probabilities
+
+    __call__ = predict
+
+    def _reusable(self, X):
+        if self.last_X is None or self.age >= self.max_age or X.shape != self.last_X.shape:
+            return False
+        difference = X - self.last_X
+        distances = numpy.einsum('ij,ij->i', difference, difference)
+        return distances.max() <= self.threshold ** 2
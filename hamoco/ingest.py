@@ -0,0 +1,155 @@
+import os
+import concurrent.futures
+import multiprocessing
+
+import numpy
+import cv2
+
+from .hand import Hand
+from .dataset import DatasetWriter
+from .sources import ImageDirectorySource
+
+image_extensions = ImageDirectorySource.extensions
+video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+
+def find_labeled_files(path, pose=None):
+    '''Images and video files (label, path) found in `path` (a file or a directory
+    explored recursively). Files are labeled with `pose` if given, otherwise with
+    the closest directory named after a hand pose (e.g. "footage/OPEN/clip.mp4");
+    unlabeled files are ignored.'''
+    default_label = None if pose is None else Hand.Pose[pose].value
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = []
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            paths += [os.path.join(root, f) for f in sorted(files)]
+    labeled_files = []
+    for file_path in paths:
+        if not file_path.lower().endswith(image_extensions + video_extensions):
+            continue
+        label = default_label if default_label is not None else _directory_label(file_path)
+        if label is not None:
+            labeled_files.append((label, file_path))
+    return labeled_files
+
+def _directory_label(path):
+    for name in reversed(os.path.normpath(os.path.dirname(os.path.abspath(path))).split(os.sep)):
+        if name in Hand.Pose.__members__ and name != 'UNDEFINED':
+            return Hand.Pose[name].value
+    return None
+
+def ingest_jobs(labeled_files, chunk_size=32):
+    '''Split labeled files into jobs: chunks of images with the same label
+    (processed independently) and single video files (processed in order).'''
+    jobs = []
+    images = {}
+    for label, path in labeled_files:
+        if path.lower().endswith(video_extensions):
+            jobs.append(('video', label, [path]))
+        else:
+            images.setdefault(label, []).append(path)
+    for label, paths in images.items():
+        for start in range(0, len(paths), chunk_size):
+            jobs.append(('images', label, paths[start:start+chunk_size]))
+    return jobs
+
+# Settings and hand detection of a worker process
+_worker_settings = None
+_static_hands = None
+
+def _init_worker(settings):
+    global _worker_settings
+    _worker_settings = settings
+
+def _new_hands(static_image_mode):
+    import mediapipe as mp
+    return mp.solutions.hands.Hands(static_image_mode=static_image_mode,
+                                    model_complexity=1,
+                                    max_num_hands=_worker_settings['max_num_hands'],
+                                    min_detection_confidence=_worker_settings['min_detection_confidence'],
+                                    min_tracking_confidence=0.5)
+
+def _landmarks(hands, image, vectors):
+    # Same orientation as the live recording (mirrored webcam feed)
+    if _worker_settings['flip']:
+        image = cv2.flip(image, 1)
+    results = hands.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    for hand_landmarks in results.multi_hand_landmarks or []:
+        vectors.append(Hand.vectorize_landmarks(hand_landmarks.landmark))
+
+def _process_job(job):
+    global _static_hands
+    kind, label, paths = job
+    vectors = []
+    n_frames = 0
+    n_unreadable = 0
+    # Unrelated images: one detection per image, with a single instance per worker
+    if kind == 'images':
+        if _static_hands is None:
+            _static_hands = _new_hands(static_image_mode=True)
+        for path in paths:
+            image = cv2.imread(path)
+            if image is None:
+                n_unreadable += 1
+                continue
+            n_frames += 1
+            _landmarks(_static_hands, image, vectors)
+    # Video: hands are tracked from one frame to the next
+    else:
+        capture = cv2.VideoCapture(paths[0])
+        if not capture.isOpened():
+            n_unreadable += 1
+        else:
+            with _new_hands(static_image_mode=False) as hands:
+                stride = _worker_settings['stride']
+                index = 0
+                while True:
+                    success, image = capture.read()
+                    if not success:
+                        break
+                    if index % stride == 0:
+                        n_frames += 1
+                        _landmarks(hands, image, vectors)
+                    index += 1
+        capture.release()
+    features = numpy.empty((len(vectors), Hand.dimension * Hand.n_landmarks), dtype=numpy.float32)
+    if vectors:
+        Hand.feature_process_landmarks(numpy.array(vectors), out=features)
+    return label, features, n_frames, n_unreadable
+
+def ingest(labeled_files, path_to_file, workers=None, chunk_size=32, stride=1, max_num_hands=1,
+           min_detection_confidence=0.5, flip=True, verbose=True):
+    '''Extract the hand landmarks of labeled images and video files (see
+    `find_labeled_files`) in a pool of processes, and append them to a binary
+    dataset file as soon as they are ready. Each worker has its own hand
+    detection (static mode for images, tracking mode for videos, with every
+    `stride`-th frame processed). Returns the numbers of processed frames,
+    recorded samples and unreadable files.'''
+    jobs = ingest_jobs(labeled_files, chunk_size=chunk_size)
+    counts = dict(frames=0, samples=0, unreadable=0)
+    if len(jobs) == 0:
+        return counts
+    settings = dict(max_num_hands=max_num_hands, min_detection_confidence=min_detection_confidence,
+                    flip=flip, stride=max(stride, 1))
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    # Fresh interpreters: the hand detection is not fork-safe
+    context = multiprocessing.get_context('spawn')
+    with DatasetWriter(path_to_file) as writer, \
+         concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=_init_worker, initargs=(settings,)) as pool:
+        futures = {pool.submit(_process_job, job): job for job in jobs}
+        # Results are written as soon as they are ready (not in the order of the jobs)
+        for index, future in enumerate(concurrent.futures.as_completed(futures)):
+            label, features, n_frames, n_unreadable = future.result()
+            writer.extend(numpy.full(features.shape[0], label), features)
+            writer.flush()
+            counts['frames'] += n_frames
+            counts['samples'] += features.shape[0]
+            counts['unreadable'] += n_unreadable
+            if verbose:
+                kind, _, paths = futures[future]
+                source = paths[0] if kind == 'video' else f'{len(paths)} images'
+                print(f'# [{index+1}/{len(jobs)}] {Hand.Pose(label).name}: {features.shape[0]} samples from {source}')
+    return counts
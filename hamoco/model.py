@@ -1,13 +1,17 @@
 import os
+import json
+import shutil
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3' # disable tensorflow warning message for CPU-only installation
 
 import numpy
 import keras
 from keras.models import Sequential
 from keras.layers import Dense
-from .utils import train_test_split
+from .utils import train_test_split, stratified_train_test_split
 
 from .hand import Hand
+from .dataset import find_dataset, read_dataset, read_timestamps, read_text_sample, DatasetStream
+from .cache import DatasetCache
 
 class ClassificationModel:
 
@@ -17,41 +21,45 @@ class ClassificationModel:
     def __init__(self):
         self.num_classes = len(Hand.Pose)
         self.model = Sequential()
+        # Training and validation data of the last training (arrays or streams)
+        self.training_data = None
+        self.validation_data = None
 
     def read_sample(self, path_to_sample):
-        with open(path_to_sample, 'r') as file:
-            # label
-            y_i = int(file.readline())
-            # features
-            x_i = file.readline().split()
-            x_i = list(map(numpy.float32, x_i))
-            return x_i, y_i
+        return read_text_sample(path_to_sample)
 
     def read_dataset(self, path_to_dataset):
-        # list of sample files
-        paths_to_dataset_files = os.listdir(path_to_dataset)
-        paths_to_dataset_files = [os.path.join(path_to_dataset, f) for f in paths_to_dataset_files if f.endswith('.dat')]
-        paths_to_dataset_files.sort()
-        n_samples = len(paths_to_dataset_files)
-
-        # Fill the dataset
-        X = numpy.empty((n_samples, self.n_features), dtype=numpy.float32)
-        y = numpy.empty(n_samples, dtype=numpy.int32)
-        for i, sample in enumerate(paths_to_dataset_files):
-            x_i, y_i = self.read_sample(sample)
-            X[i,:] = x_i
-            y[i] = y_i
-        self.data = X
-        self.classes = y
-        self.n_samples = n_samples
-
-    def process_dataset(self):
-        # Translate points back based on the center of mass of the hand
-        for i in range(self.n_samples):
-            self.data[i,0::2] -= self.data[i,0::2].mean() # x
-            self.data[i,1::2] -= self.data[i,1::2].mean() # y
-
-    def train(self, hidden_layers=(50,25,10), learning_rate=0.01, epochs=15, test_size=0.30):
+        # Binary dataset file (memory-mapped) or list of sample files
+        self.data, self.classes = read_dataset(path_to_dataset, n_features=self.n_features)
+        self.timestamps = read_timestamps(path_to_dataset)
+        self.n_samples = self.classes.size
+
+    def load_dataset(self, path_to_dataset, cache=True):
+        '''Read and process a dataset at once. With `cache`, the processed samples
+        are stored next to the data and only new samples are processed by the next
+        calls (see `hamoco.cache.DatasetCache`), which is returned.'''
+        if not cache:
+            self.read_dataset(path_to_dataset)
+            self.process_dataset()
+            return None
+        dataset_cache = DatasetCache(path_to_dataset, n_features=self.n_features)
+        self.data, self.classes = dataset_cache.load()
+        self.timestamps = dataset_cache.timestamps
+        self.n_samples = self.classes.size
+        return dataset_cache
+
+    @staticmethod
+    def process_samples(X):
+        '''Process a block of samples in place, with the same centering and scaling
+        as live landmarks (see `Hand.feature_process_landmarks`).'''
+        return Hand.feature_process_landmarks(X, out=X)
+
+    def process_dataset(self, chunk_size=65536):
+        # Process by chunks to keep the temporary arrays small (and in cache)
+        for start in range(0, self.n_samples, chunk_size):
+            self.process_samples(self.data[start:start+chunk_size])
+
+    def build(self, hidden_layers=(50,25,10), learning_rate=0.01):
         # Model
         for layer, size in enumerate(hidden_layers):
             # first hidden layer
@@ -69,9 +77,170 @@ class ClassificationModel:
         optimizer = keras.optimizers.adam_v2.Adam(learning_rate=learning_rate)
         self.model.compile(optimizer=optimizer, loss='sparse_categorical_crossentropy', metrics=['accuracy'])
 
+    def train(self, hidden_layers=(50,25,10), learning_rate=0.01, epochs=15, test_size=0.30, batch_size=32,
+              stratify=False, seed=None):
+        self.build(hidden_layers=hidden_layers, learning_rate=learning_rate)
+
+        # Train (the test set has the same proportion of each pose with `stratify`)
+        split = stratified_train_test_split if stratify else train_test_split
+        X_train, X_test, y_train, y_test = split(self.data, self.classes, test_size=test_size, seed=seed)
+        self.fit(X_train, y_train, X_test, y_test, epochs=epochs, batch_size=batch_size)
+
+    def fit(self, X_train, y_train, X_test, y_test, epochs=15, batch_size=32, verbose=2, callbacks=None):
+        '''Train the built model on processed samples that are already split.'''
+        self.training_data = (X_train, y_train)
+        self.validation_data = (X_test, y_test)
+        _ = self.model.fit(X_train, y_train, validation_data=(X_test, y_test), epochs=epochs, batch_size=batch_size,
+                           verbose=verbose, callbacks=callbacks)
+
+    def select_new_samples(self, since=None, n_samples=None):
+        '''Indices of the samples of the dataset recorded after `since` (a timestamp),
+        or of the `n_samples` most recent ones.'''
+        if since is not None:
+            return numpy.flatnonzero(self.timestamps > since)
+        if n_samples is not None:
+            recent = numpy.argsort(self.timestamps, kind='stable')[self.n_samples-min(n_samples, self.n_samples):]
+            return numpy.sort(recent)
+        raise ValueError('either `since` or `n_samples` is required to select the new samples')
+
+    def fine_tune(self, new_samples, replay=0.0, learning_rate=0.001, epochs=5, test_size=0.30, batch_size=32,
+                  stratify=False, checkpoint_dir=None, resume=False, seed=None, callbacks=None):
+        '''Fine-tune the loaded model (see `load_model`) on the samples of the dataset
+        given by `new_samples` (indices, see `select_new_samples`), mixed with `replay`
+        old samples per new sample, picked at random, so that the poses that are not
+        recorded again are not forgotten. With `checkpoint_dir`, the model is saved after
+        every epoch along with the state of the training: an interrupted run continues
+        from its last epoch with `resume`, on the same samples (and with the weights
+        and optimizer state of that epoch). Additional Keras `callbacks` are passed
+        to `fit`. Returns the numbers of new and replayed samples.'''
+        callbacks = list(callbacks or [])
+        if checkpoint_dir is not None:
+            path_to_state = os.path.join(checkpoint_dir, 'fine_tune.json')
+            path_to_samples = os.path.join(checkpoint_dir, 'new_samples.npy')
+            path_to_backup = os.path.join(checkpoint_dir, 'backup')
+            # Same samples and split as the interrupted run
+            if resume and os.path.isfile(path_to_state):
+                with open(path_to_state) as file:
+                    seed = json.load(file)['seed']
+                new_samples = numpy.load(path_to_samples)
+            else:
+                if os.path.isdir(path_to_backup):
+                    shutil.rmtree(path_to_backup)
+                os.makedirs(checkpoint_dir, exist_ok=True)
+                if seed is None:
+                    seed = int(numpy.random.default_rng().integers(2**31))
+                numpy.save(path_to_samples, new_samples)
+                with open(path_to_state, 'w') as file:
+                    json.dump(dict(seed=seed), file)
+            callbacks.insert(0, keras.callbacks.BackupAndRestore(path_to_backup))
+
+        # New samples and replayed old samples
+        rng = numpy.random.default_rng(seed)
+        new_samples = numpy.asarray(new_samples, dtype=numpy.int64)
+        old_samples = numpy.setdiff1d(numpy.arange(self.n_samples), new_samples)
+        n_replay = min(int(round(replay * new_samples.size)), old_samples.size)
+        replayed = numpy.sort(rng.choice(old_samples, n_replay, replace=False))
+        index = numpy.concatenate([new_samples, replayed])
+        if index.size == 0:
+            raise ValueError('no sample to fine-tune the model on')
+
+        # Smaller steps than for a training from scratch
+        optimizer = keras.optimizers.adam_v2.Adam(learning_rate=learning_rate)
+        self.model.compile(optimizer=optimizer, loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+        split = stratified_train_test_split if stratify else train_test_split
+        X_train, X_test, y_train, y_test = split(self.data[index], self.classes[index], test_size=test_size, seed=rng)
+        self.fit(X_train, y_train, X_test, y_test, epochs=epochs, batch_size=batch_size, callbacks=callbacks)
+
+        # Nothing left to resume
+        if checkpoint_dir is not None:
+            shutil.rmtree(path_to_backup, ignore_errors=True)
+            for path in [path_to_state, path_to_samples]:
+                if os.path.isfile(path):
+                    os.remove(path)
+            if len(os.listdir(checkpoint_dir)) == 0:
+                os.rmdir(checkpoint_dir)
+        return new_samples.size, n_replay
+
+    def train_stream(self, path_to_dataset, hidden_layers=(50,25,10), learning_rate=0.01, epochs=15, test_size=0.30,
+                     chunk_size=4096, shuffle_buffer=16384, batch_size=32, seed=None):
+        '''Train from a binary dataset file that is streamed from disk by shuffled chunks
+        instead of being loaded in memory (see `hamoco.dataset.DatasetStream`).'''
+        path_to_file = find_dataset(path_to_dataset)
+        if path_to_file is None:
+            raise ValueError(f'no binary dataset file found in "{path_to_dataset}" (see hamoco-convert)')
+        self.build(hidden_layers=hidden_layers, learning_rate=learning_rate)
+
+        # Training and validation streams (processed chunk by chunk)
+        transform = self.process_samples
+        train_stream, test_stream = DatasetStream.split(path_to_file,
+                                                        test_size=test_size,
+                                                        chunk_size=chunk_size,
+                                                        shuffle_buffer=shuffle_buffer,
+                                                        batch_size=batch_size,
+                                                        transform=transform,
+                                                        seed=seed)
+        self.n_samples = train_stream.n_samples + test_stream.n_samples
+        self.training_data = train_stream
+        self.validation_data = test_stream
+
         # Train
-        X_train, X_test, y_train, y_test = train_test_split(self.data, self.classes, test_size=test_size)
-        _ = self.model.fit(X_train, y_train, validation_data=(X_test, y_test), epochs=epochs, verbose=2)
+        validation = {}
+        if test_stream.n_samples > 0:
+            validation = dict(validation_data=iter(test_stream), validation_steps=len(test_stream))
+        _ = self.model.fit(iter(train_stream), steps_per_epoch=len(train_stream), epochs=epochs, verbose=2, **validation)
+
+    def sample_data(self, n_samples=None, validation=False, seed=None):
+        '''Random subset of at most `n_samples` processed samples (X, y) of the
+        training (or validation) data of the last training.'''
+        data = self.validation_data if validation else self.training_data
+        if data is None:
+            raise ValueError('the model has not been trained yet')
+        # Streamed dataset: the first shuffled batches of an epoch
+        if isinstance(data, DatasetStream):
+            X, y = [], []
+            n_read = 0
+            for X_batch, y_batch in data.epoch():
+                X.append(X_batch)
+                y.append(y_batch)
+                n_read += y_batch.size
+                if n_samples is not None and n_read >= n_samples:
+                    break
+            if n_read == 0:
+                return numpy.empty((0, self.n_features), dtype=numpy.float32), numpy.empty(0, dtype=numpy.int32)
+            return numpy.concatenate(X)[:n_samples], numpy.concatenate(y)[:n_samples]
+        X, y = data
+        if n_samples is not None and n_samples < y.size:
+            index = numpy.sort(numpy.random.default_rng(seed).choice(y.size, n_samples, replace=False))
+            X, y = X[index], y[index]
+        return X, y
 
     def save_model(self, path):
-        self.model.save(path)
\ No newline at end of file
+        self.model.save(path)
+
+    def load_model(self, path):
+        '''Load a trained model (e.g. `hamoco.models.__default_model__`) to fine-tune it.'''
+        self.model = keras.models.load_model(path)
+
+    def export_tflite(self, path, quantization='float16', representative_data=None):
+        '''Export the model to TensorFlow Lite (see `hamoco.inference.TFLiteModel`), with
+        float16 weights or full int8 quantization. The int8 ranges are calibrated on
+        `representative_data` (processed samples, e.g. from `sample_data`).'''
+        import tensorflow as tf
+        converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == 'int8':
+            if representative_data is None or len(representative_data) == 0:
+                raise ValueError('int8 quantization requires representative data')
+            def representative_dataset():
+                for x in representative_data:
+                    yield [numpy.asarray(x, dtype=numpy.float32).reshape(1, self.n_features)]
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+        else:
+            raise ValueError(f'unknown quantization "{quantization}" (available: float16, int8)')
+        with open(path, 'wb') as file:
+            file.write(converter.convert())
\ No newline at end of file
@@ -1,6 +1,3 @@
-#TODO: Find a better method to dynamically set more global variables
-#      (ex. https://stackoverflow.com/questions/1429814/how-to-programmatically-set-a-global-module-variable)
-
 import os
 
 # Default model
@@ -27,17 +24,19 @@ def _get_model_name(name):
             new_name += char
     return new_name
 
-# Look for models
-files = os.listdir(models_dir)
-discard = ['__init__.py', '__pycache__', default_model]
-# Remove unimportant files
-for file in discard:
-    if file in files:
-        files.remove(file)
-# Add other models
-for file in files:
-    if _check_file_name(file):
-        model_name = _get_model_name(file)
-        file = os.path.join(models_dir, file)
-        new_model = f'{model_name} = file'
-        exec(new_model)
\ No newline at end of file
+def available_models():
+    '''Paths to the models in the models directory (other than the default one), by name.'''
+    models = {}
+    files = os.listdir(models_dir)
+    discard = ['__init__.py', '__pycache__', default_model]
+    for file in files:
+        if file not in discard and _check_file_name(file):
+            models[_get_model_name(file)] = os.path.join(models_dir, file)
+    return models
+
+def __getattr__(name):
+    # Look for models on demand (e.g. `hamoco.models.my_model`)
+    models = available_models()
+    if name in models:
+        return models[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
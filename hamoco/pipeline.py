@@ -0,0 +1,351 @@
+import threading
+import queue
+
+import numpy
+import cv2
+
+from .hand import Hand
+from .profiling import StageProfiler
+
+def _put_while_alive(jobs, item, thread, timeout=0.1):
+    '''Put an item in a bounded queue, unless the thread consuming it has
+    stopped (instead of blocking forever). Returns False if it has.'''
+    while thread.is_alive():
+        try:
+            jobs.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+class FrameGrabber:
+    '''Wrapper around a video capture that mimics its `isOpened`/`read`/`release`
+    interface. Once started, frames are grabbed (and flipped) in a background
+    thread, and only the newest frame is handed over: stale frames are dropped.
+    A capture error ends the stream, and is raised by `read` or `release`. If
+    the grabber is not started, frames are read synchronously.'''
+
+    def __init__(self, capture, flip=True, latest_only=True, maxsize=2, profiler=None):
+        self.capture = capture
+        self.flip = flip
+        self.latest_only = latest_only
+        self.frames = queue.Queue(maxsize=1 if latest_only else maxsize)
+        self.profiler = StageProfiler(enabled=False) if profiler is None else profiler
+        self.n_frames = 0
+        self.n_dropped = 0
+        self.n_failed = 0
+        self.error = None
+        self._thread = None
+        self._running = threading.Event()
+        self._exhausted = False
+
+    def start(self):
+        self._running.set()
+        self._thread = threading.Thread(target=self._grab, daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def isOpened(self):
+        if self.started:
+            return not self._exhausted
+        return self.capture.isOpened()
+
+    def read(self):
+        # Synchronous mode
+        if not self.started:
+            return self._read_frame()
+        # Threaded mode: wait for the next available frame
+        frame = self.frames.get()
+        if frame is None:
+            self._exhausted = True
+            self._raise_error()
+            return False, None
+        return frame
+
+    def release(self):
+        self._running.clear()
+        if self.started:
+            # Unblock the grabbing thread if it waits on a full queue
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join()
+        self.capture.release()
+        self._raise_error()
+
+    def _raise_error(self):
+        # Error of the background thread, raised once in the caller's thread
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _read_frame(self):
+        start = self.profiler.now()
+        success, image = self.capture.read()
+        start = self.profiler.record('read', start)
+        if success:
+            self.n_frames += 1
+            if self.flip:
+                image = cv2.flip(image, 1)
+                self.profiler.record('flip', start)
+        else:
+            self.n_failed += 1
+        return success, image
+
+    def _grab(self):
+        try:
+            while self._running.is_set() and self.capture.isOpened():
+                frame = self._read_frame()
+                if self.latest_only:
+                    self._put_latest(frame)
+                else:
+                    self._put(frame)
+        except Exception as error:
+            self.error = error
+        finally:
+            # End of stream
+            self._put(None)
+
+    def _put(self, item):
+        # Wait for the consumer, unless the grabber gets released
+        while self._running.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _put_latest(self, item):
+        while True:
+            try:
+                self.frames.put_nowait(item)
+                return
+            except queue.Full:
+                # Drop the stale frame
+                try:
+                    self.frames.get_nowait()
+                    self.n_dropped += 1
+                except queue.Empty:
+                    pass
+
+class MouseActuator:
+    '''Compute the palm center and operate the mouse for each classified hand.
+    Once started, actions are executed in a background thread fed by a bounded
+    queue, so that detection and classification of the next frame are not delayed
+    by the mouse calls. When several frames are pending, they are processed at
+    once and their pointer moves and scroll ticks are merged into a single
+    event. If the actuator is not started, actions are executed synchronously.
+    Hands can be routed to their own controller (e.g. by handedness) with
+    `controllers`, a mapping of the labels given to `submit` to controllers;
+    `controller` is used for the other labels. An error raised in the
+    background thread stops it, and is raised again by the next call to
+    `submit` or `stop`.'''
+
+    def __init__(self, controller, min_confidence=0.5, maxsize=4, profiler=None, controllers=None):
+        self.controller = controller
+        self.controllers = {} if controllers is None else controllers
+        self.min_confidence = min_confidence
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self.profiler = StageProfiler(enabled=False) if profiler is None else profiler
+        self.palm_center = None
+        # Last palm center of each label
+        self.palm_centers = {}
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._actuate, daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def controller_for(self, label=None):
+        return self.controllers.get(label, self.controller)
+
+    def submit(self, pose, landmark_vector, confidence, timestamp=None, label=None):
+        if self.started:
+            # The landmark vector may be reused by the caller for the next frame
+            job = (pose, landmark_vector.copy(), confidence, timestamp, label)
+            if not _put_while_alive(self.jobs, job, self._thread):
+                self._raise_error()
+                raise RuntimeError('the actuation thread has stopped')
+        else:
+            self.operate(pose, landmark_vector, confidence, timestamp, label)
+
+    def operate(self, pose, landmark_vector, confidence, timestamp=None, label=None, flush=True):
+        start = self.profiler.now()
+        hand = Hand(pose=pose)
+        controller = self.controller_for(label)
+        palm_center = controller.palm_center(landmark_vector, timestamp)
+        controller.operate_mouse(hand,
+                                 palm_center,
+                                 confidence,
+                                 min_confidence=self.min_confidence,
+                                 flush=flush)
+        self.palm_center = palm_center
+        self.palm_centers[label] = palm_center
+        self.profiler.record('actuate', start)
+
+    def stop(self):
+        if self.started:
+            _put_while_alive(self.jobs, None, self._thread)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def _raise_error(self):
+        # Error of the background thread, raised once in the caller's thread
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _actuate(self):
+        running = True
+        try:
+            while running:
+                # Wait for a job, then catch up with the ones submitted in the meantime
+                jobs = [self.jobs.get()]
+                while True:
+                    try:
+                        jobs.append(self.jobs.get_nowait())
+                    except queue.Empty:
+                        break
+                controllers = []
+                for job in jobs:
+                    if job is None:
+                        running = False
+                        break
+                    self.operate(*job, flush=False)
+                    controller = self.controller_for(job[4])
+                    if controller not in controllers:
+                        controllers.append(controller)
+                for controller in controllers or [self.controller]:
+                    controller.flush()
+        except Exception as error:
+            self.error = error
+
+class SnapshotWriter:
+    '''Write the snapshots recorded by hamoco-data (see `HandSnapshot`). Once
+    started, landmarks and images are written in a background thread fed by a
+    bounded queue, so that text formatting, image encoding and file writes do
+    not delay the capture. Pending snapshots are written in batches, with a
+    single write to the binary dataset file per batch, and snapshots submitted
+    while the queue is full are dropped (and counted by `n_dropped`). A write
+    error stops the thread, and is raised by the next `submit` or by `stop`. If
+    the writer is not started, snapshots are written synchronously. Images are
+    saved as separate files, or appended to `frame_archive` if given (see
+    `hamoco.archive.FrameArchiveWriter`).'''
+
+    def __init__(self, dataset_writer=None, maxsize=64, batch_size=32, frame_archive=None):
+        self.dataset_writer = dataset_writer
+        self.frame_archive = frame_archive
+        self.batch_size = batch_size
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self.n_written = 0
+        self.n_dropped = 0
+        # Largest number of pending snapshots
+        self.max_depth = 0
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_batches, daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    @property
+    def depth(self):
+        '''Number of pending snapshots.'''
+        return self.jobs.qsize()
+
+    def submit(self, snapshot, landmarks, text_paths=None, image=None, image_path=None, snapshot_index=-1):
+        '''Write the raw landmark vectors of the hands of a snapshot (one per row)
+        to the binary dataset, or to text files `text_paths` (one per hand), and
+        `image` to `image_path` (without extension) or to the frame archive (with
+        `snapshot_index`). Returns False if the snapshot is dropped.'''
+        job = (snapshot, numpy.array(landmarks, ndmin=2), text_paths, image, image_path, snapshot_index)
+        if not self.started:
+            self._write([job])
+            return True
+        # The image may be modified by the caller (e.g. preview overlays)
+        if image is not None:
+            job = job[:3] + (image.copy(),) + job[4:]
+        # Not counted as dropped: nothing is written anymore
+        if not self._thread.is_alive():
+            self._raise_error()
+            raise RuntimeError('the snapshot writing thread has stopped')
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            self.n_dropped += 1
+            return False
+        self.max_depth = max(self.max_depth, self.jobs.qsize())
+        return True
+
+    def stop(self):
+        '''Write the pending snapshots and stop the background thread.'''
+        if self.started:
+            _put_while_alive(self.jobs, None, self._thread)
+            self._thread.join()
+            self._thread = None
+        if self.dataset_writer is not None:
+            self.dataset_writer.flush()
+        if self.frame_archive is not None:
+            self.frame_archive.flush()
+        self._raise_error()
+
+    def _raise_error(self):
+        # Error of the background thread, raised once in the caller's thread
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _write_batches(self):
+        running = True
+        try:
+            while running:
+                # Wait for a snapshot, then take the ones submitted in the meantime
+                jobs = [self.jobs.get()]
+                while len(jobs) < self.batch_size:
+                    try:
+                        jobs.append(self.jobs.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in jobs:
+                    running = False
+                    jobs = jobs[:jobs.index(None)]
+                self._write(jobs)
+        except Exception as error:
+            self.error = error
+
+    def _write(self, jobs):
+        labels, vectors, times = [], [], []
+        for snapshot, landmarks, text_paths, image, image_path, snapshot_index in jobs:
+            if text_paths is not None:
+                for path, vector in zip(text_paths, landmarks):
+                    snapshot.save_landmarks_vector(vector.reshape(Hand.n_landmarks, Hand.dimension), path=path)
+            else:
+                labels += [snapshot.hand.pose.value] * len(landmarks)
+                vectors.append(landmarks)
+                times += [snapshot.time] * len(landmarks)
+            if image is not None and self.frame_archive is not None:
+                self.frame_archive.append(image, snapshot=snapshot_index, label=snapshot.hand.pose.value, timestamp=snapshot.time)
+            elif image is not None:
+                snapshot.save_processed_image(image, path=image_path)
+        # Binary samples of the whole batch at once
+        if labels:
+            features = Hand.feature_process_landmarks(numpy.concatenate(vectors))
+            self.dataset_writer.extend(labels, features, timestamps=times)
+        self.n_written += len(jobs)
@@ -0,0 +1,113 @@
+import csv
+import json
+import time
+import platform
+
+import numpy
+
+from .core import __version__
+
+class StageProfiler:
+    '''Record the duration of the stages of each frame in fixed-size ring
+    buffers (the most recent `size` durations of each stage are kept).
+    A stage is timed by passing its start time to `record`, which returns
+    the current time so that consecutive stages can be chained:
+
+        t = profiler.now()
+        ...
+        t = profiler.record('detect', t)
+
+    Each stage should always be recorded from the same thread.'''
+
+    def __init__(self, size=4096, enabled=True):
+        self.size = size
+        self.enabled = enabled
+        self.durations = {}
+        self.counts = {}
+        self.counters = {}
+        self.n_frames = 0
+        self.start_time = time.perf_counter()
+        self.stop_time = None
+
+    def now(self):
+        return time.perf_counter()
+
+    def start(self):
+        '''Restart the clock of the frame rate (e.g. once the models are loaded).'''
+        self.start_time = time.perf_counter()
+
+    def record(self, stage, start):
+        now = time.perf_counter()
+        if self.enabled:
+            if stage not in self.durations:
+                self.durations[stage] = numpy.zeros(self.size)
+                self.counts[stage] = 0
+            self.durations[stage][self.counts[stage] % self.size] = now - start
+            self.counts[stage] += 1
+        return now
+
+    def frame(self):
+        '''Count a processed frame.'''
+        self.n_frames += 1
+
+    def stop(self, **counters):
+        '''Stop the profiling, with additional counters to report (e.g. dropped frames).'''
+        self.stop_time = time.perf_counter()
+        self.counters.update(counters)
+
+    @property
+    def elapsed(self):
+        stop_time = time.perf_counter() if self.stop_time is None else self.stop_time
+        return stop_time - self.start_time
+
+    def summary(self):
+        '''Frame rate, counters, and statistics of the duration of each stage (in milliseconds).'''
+        stages = {}
+        for stage, durations in self.durations.items():
+            count = self.counts[stage]
+            durations = 1e3 * durations[:min(count, self.size)]
+            p50, p95, p99 = numpy.percentile(durations, [50, 95, 99])
+            stages[stage] = {'count': count,
+                             'mean': float(durations.mean()),
+                             'p50': float(p50),
+                             'p95': float(p95),
+                             'p99': float(p99),
+                             'max': float(durations.max())}
+        return {'version': __version__,
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'frames': self.n_frames,
+                'elapsed': self.elapsed,
+                'fps': self.n_frames / self.elapsed if self.elapsed > 0 else 0.0,
+                'counters': dict(self.counters),
+                'stages': stages}
+
+    def report(self):
+        '''Human-readable summary.'''
+        summary = self.summary()
+        lines = [f'# hamoco: {summary["frames"]} frames in {summary["elapsed"]:.2f}s ({summary["fps"]:.1f} FPS)']
+        for name, value in summary['counters'].items():
+            lines.append(f'#   {name}: {value}')
+        lines.append(f'#   {"stage":<10} {"count":>8} {"mean":>8} {"p50":>8} {"p95":>8} {"p99":>8} (ms)')
+        for stage, stats in summary['stages'].items():
+            lines.append(f'#   {stage:<10} {stats["count"]:>8} {stats["mean"]:>8.3f} {stats["p50"]:>8.3f} {stats["p95"]:>8.3f} {stats["p99"]:>8.3f}')
+        return '\n'.join(lines)
+
+    def save(self, path):
+        '''Save the summary to a JSON file, or to a CSV file if `path` ends with
+        `.csv`: one row per stage, followed by the frame rate, counters and
+        platform of the run (the same on every row).'''
+        summary = self.summary()
+        if path.endswith('.csv'):
+            fields = ['count', 'mean', 'p50', 'p95', 'p99', 'max']
+            run = ['frames', 'elapsed', 'fps'] + list(summary['counters']) + ['version', 'platform', 'processor']
+            values = {key: summary[key] for key in run if key in summary}
+            values.update(summary['counters'])
+            with open(path, 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(['stage'] + fields + run)
+                for stage, stats in (summary['stages'] or {'': {}}).items():
+                    writer.writerow([stage] + [stats.get(key, '') for key in fields] + [values[key] for key in run])
+        else:
+            with open(path, 'w') as output:
+                json.dump(summary, output, indent=4)
@@ -0,0 +1,155 @@
+import os
+import time
+
+import numpy
+import cv2
+
+class FrameSource:
+    '''Base class for frame sources, with the same `isOpened`/`read`/`release`
+    interface as `cv2.VideoCapture`. Finite sources (video files, images,
+    frame stacks) are paced at `fps` frames per second when `realtime` is
+    enabled, and are processed as fast as possible otherwise.'''
+
+    # Unrelated frames (e.g. images) rather than a continuous video stream
+    static = False
+    # The source ends after its last frame
+    finite = True
+
+    def __init__(self, fps=30.0, realtime=True):
+        self.fps = fps
+        self.realtime = realtime
+        self.n_frames = 0
+        self._exhausted = False
+        self._next_frame_time = None
+
+    @property
+    def timestamp(self):
+        '''Time of the last frame read, in seconds since the beginning of the source.'''
+        return max(self.n_frames - 1, 0) / self.fps if self.fps else 0.0
+
+    def isOpened(self):
+        return not self._exhausted
+
+    def read(self):
+        image = self._read_image() if not self._exhausted else None
+        if image is None:
+            self._exhausted = True
+            return False, None
+        self.n_frames += 1
+        self._pace()
+        return True, image
+
+    def release(self):
+        self._exhausted = True
+
+    def _read_image(self):
+        raise NotImplementedError
+
+    def _pace(self):
+        # Wait until the frame is due when emulating a real-time source
+        if not self.realtime or not self.fps:
+            return
+        now = time.perf_counter()
+        if self._next_frame_time is None:
+            self._next_frame_time = now
+        elif self._next_frame_time > now:
+            time.sleep(self._next_frame_time - now)
+        self._next_frame_time = max(self._next_frame_time, now) + 1.0 / self.fps
+
+class CameraSource(FrameSource):
+    '''Live frames from a webcam.'''
+
+    finite = False
+
+    def __init__(self, index=0):
+        super().__init__(realtime=False)
+        self.capture = cv2.VideoCapture(index)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.start_time = time.time()
+
+    @property
+    def timestamp(self):
+        return time.time() - self.start_time
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        success, image = self.capture.read()
+        if success:
+            self.n_frames += 1
+        return success, image
+
+    def release(self):
+        self.capture.release()
+
+class VideoFileSource(FrameSource):
+    '''Frames from a video file.'''
+
+    def __init__(self, path, realtime=True):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f'cannot open video file "{path}"')
+        super().__init__(fps=self.capture.get(cv2.CAP_PROP_FPS), realtime=realtime)
+
+    def _read_image(self):
+        success, image = self.capture.read()
+        return image if success else None
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+class ImageDirectorySource(FrameSource):
+    '''Frames from the images in a directory (sorted by name).'''
+
+    static = True
+    extensions = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, path, fps=30.0, realtime=True):
+        super().__init__(fps=fps, realtime=realtime)
+        files = [f for f in os.listdir(path) if f.lower().endswith(self.extensions)]
+        files.sort()
+        self.paths = [os.path.join(path, f) for f in files]
+
+    def _read_image(self):
+        if self.n_frames >= len(self.paths):
+            return None
+        return cv2.imread(self.paths[self.n_frames])
+
+class ArraySource(FrameSource):
+    '''Frames from a stack of images of shape (n_frames, height, width, 3)
+    saved with `numpy.save` (memory-mapped).'''
+
+    def __init__(self, path, fps=30.0, realtime=True):
+        super().__init__(fps=fps, realtime=realtime)
+        self.frames = numpy.load(path, mmap_mode='r')
+
+    def _read_image(self):
+        if self.n_frames >= self.frames.shape[0]:
+            return None
+        return numpy.array(self.frames[self.n_frames])
+
+def open_source(source, realtime=True):
+    '''Open a frame source from a webcam index (e.g. "0"), a directory of
+    images, a `.npy` stack of frames, or a video file.'''
+    source = str(source)
+    if source.isdigit():
+        return CameraSource(int(source))
+    if os.path.isdir(source):
+        return ImageDirectorySource(source, realtime=realtime)
+    if source.endswith('.npy'):
+        return ArraySource(source, realtime=realtime)
+    return VideoFileSource(source, realtime=realtime)
+
+def downscale(image, working_size=None):
+    '''`image` downscaled so that its largest side does not exceed `working_size`
+    pixels (if given). Landmarks detected in the downscaled image have the
+    same normalized coordinates as in `image`.'''
+    if working_size is None:
+        return image
+    scale = working_size / max(image.shape[:2])
+    if scale >= 1.0:
+        return image
+    size = (max(int(image.shape[1] * scale), 1), max(int(image.shape[0] * scale), 1))
+    return cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
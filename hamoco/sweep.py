@@ -0,0 +1,150 @@
+import os
+import csv
+import time
+import shutil
+import itertools
+import tempfile
+import concurrent.futures
+import multiprocessing
+
+import numpy
+
+from .cache import load_processed_dataset
+from .utils import train_test_split, stratified_train_test_split
+
+# Columns of the leaderboard
+leaderboard_fields = ['rank', 'hidden_layers', 'learning_rate', 'epochs', 'accuracy', 'training_time', 'latency', 'error']
+
+def sweep_configurations(hidden_layers=((50,25,10),), learning_rates=(0.01,), epochs=(15,), n_random=None, seed=None):
+    '''Configurations (dicts of `ClassificationModel.train` arguments) of the grid
+    of all the given values, or `n_random` of them picked at random.'''
+    grid = [dict(hidden_layers=tuple(layers), learning_rate=learning_rate, epochs=n_epochs)
+            for layers, learning_rate, n_epochs in itertools.product(hidden_layers, learning_rates, epochs)]
+    if n_random is not None and n_random < len(grid):
+        index = numpy.random.default_rng(seed).choice(len(grid), n_random, replace=False)
+        grid = [grid[i] for i in sorted(index)]
+    return grid
+
+# Data shared by the configurations trained in a worker process
+_worker_data = None
+
+def _init_worker(X_train, y_train, X_test, y_test, n_threads):
+    global _worker_data
+    _worker_data = (X_train, y_train, X_test, y_test)
+    # The cores are shared between the workers
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def _train_configuration(configuration, path_to_model, batch_size):
+    from .model import ClassificationModel
+    from .inference import load_model, evaluate_model
+    X_train, y_train, X_test, y_test = _worker_data
+    model = ClassificationModel()
+    model.build(hidden_layers=configuration['hidden_layers'], learning_rate=configuration['learning_rate'])
+    start = time.perf_counter()
+    model.fit(X_train, y_train, X_test, y_test, epochs=configuration['epochs'], batch_size=batch_size, verbose=0)
+    training_time = time.perf_counter() - start
+    # Evaluated as in the main application
+    model.save_model(path_to_model)
+    accuracy, latency = evaluate_model(load_model(path_to_model), X_test, y_test)
+    return dict(configuration, accuracy=accuracy, training_time=training_time, latency=latency)
+
+class Sweep:
+    '''Train a set of model configurations (see `sweep_configurations`) in
+    parallel in a pool of processes. The dataset is read, processed (through
+    `hamoco.cache.DatasetCache` with `cache`) and split once, then sent once
+    to each worker. Every configuration is evaluated on the same validation
+    set, and the results are ranked by validation accuracy (then inference
+    latency). Configurations that fail are ranked last, with their error.'''
+
+    def __init__(self, path_to_dataset, test_size=0.30, stratify=False, seed=None, cache=True):
+        X, y = load_processed_dataset(path_to_dataset, cache=cache)
+        split = stratified_train_test_split if stratify else train_test_split
+        self.X_train, self.X_test, self.y_train, self.y_test = split(X, y, test_size=test_size, seed=seed)
+        self.results = []
+        self._tmp_dir = None
+
+    def run(self, configurations, batch_size=32, workers=None, verbose=True):
+        '''Train every configuration and return the results, best first. The
+        trained models are removed if the sweep is interrupted.'''
+        workers = min(workers or os.cpu_count() or 1, len(configurations))
+        n_threads = max((os.cpu_count() or 1) // workers, 1)
+        self.cleanup()
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix='hamoco-sweep-')
+        data = (self.X_train, self.y_train, self.X_test, self.y_test, n_threads)
+        # TensorFlow is not fork-safe: fresh interpreters are started
+        context = multiprocessing.get_context('spawn')
+        self.results = []
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                        initializer=_init_worker, initargs=data) as pool:
+                futures = {}
+                for index, configuration in enumerate(configurations):
+                    path_to_model = os.path.join(self._tmp_dir.name, f'model-{index}.h5')
+                    future = pool.submit(_train_configuration, configuration, path_to_model, batch_size)
+                    futures[future] = (configuration, path_to_model)
+                for future in concurrent.futures.as_completed(futures):
+                    configuration, path_to_model = futures[future]
+                    # A failing configuration does not stop the sweep
+                    try:
+                        result = dict(future.result(), path=path_to_model, error=None)
+                    except Exception as error:
+                        result = dict(configuration, accuracy=None, training_time=None, latency=None, path=None,
+                                      error=f'{type(error).__name__}: {error}')
+                    self.results.append(result)
+                    if verbose:
+                        print(f'# [{len(self.results)}/{len(configurations)}] {_describe(result)}')
+        except BaseException:
+            self.cleanup()
+            raise
+        self.results.sort(key=lambda result: (result['error'] is not None, -(result['accuracy'] or 0.0), result['latency'] or 0.0))
+        return self.results
+
+    @property
+    def best(self):
+        '''Best result, or None if every configuration failed.'''
+        if self.results and self.results[0]['error'] is None:
+            return self.results[0]
+        return None
+
+    def save_best(self, path):
+        '''Copy the best trained model to `path`.'''
+        if self.best is None:
+            raise RuntimeError('no configuration was trained successfully')
+        shutil.copyfile(self.best['path'], path)
+
+    def save_leaderboard(self, path):
+        '''Write the results to a CSV file, best first (times in seconds).'''
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=leaderboard_fields)
+            writer.writeheader()
+            for rank, result in enumerate(self.results, start=1):
+                row = {field: '' if result[field] is None else result[field] for field in leaderboard_fields[1:]}
+                row['hidden_layers'] = ' '.join(map(str, result['hidden_layers']))
+                writer.writerow(dict(row, rank=rank))
+
+    def report(self):
+        lines = [f'{"rank":>4} {"hidden_layers":<16} {"learning_rate":>13} {"epochs":>6} {"accuracy":>9} {"training":>9} {"latency":>10}']
+        for rank, result in enumerate(self.results, start=1):
+            layers = ' '.join(map(str, result['hidden_layers']))
+            line = f'{rank:4d} {layers:<16} {result["learning_rate"]:13g} {result["epochs"]:6d}'
+            if result['error'] is None:
+                line += f' {result["accuracy"]:9.4f} {result["training_time"]:8.1f}s {result["latency"]*1e6:7.1f} us'
+            else:
+                line += f' failed ({result["error"]})'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def cleanup(self):
+        '''Remove the trained models (except the ones saved with `save_best`).'''
+        if self._tmp_dir is not None:
+            self._tmp_dir.cleanup()
+            self._tmp_dir = None
+
+def _describe(result):
+    layers = ' '.join(map(str, result['hidden_layers']))
+    description = f'hidden_layers={layers} learning_rate={result["learning_rate"]:g} epochs={result["epochs"]}: '
+    if result['error'] is not None:
+        return description + f'failed ({result["error"]})'
+    return description + f'accuracy={result["accuracy"]:.4f}, trained in {result["training_time"]:.1f}s'
@@ -0,0 +1,77 @@
+import numpy
+
+from .hand import Hand
+from .dataset import open_records, write_header
+
+# Binary trace: a small header followed by one record per detected hand and
+# per frame (frames without any hand have a single record with handedness -1)
+trace_magic = b'HAMOCOTR'
+trace_version = 1
+handedness_labels = ['Left', 'Right']
+
+def trace_dtype(n_features=42):
+    return numpy.dtype([('frame', '<u4'),
+                        ('time', '<f8'),
+                        ('handedness', 'i1'),
+                        ('score', '<f4'),
+                        ('landmarks', '<f4', (n_features,))])
+
+class TraceWriter:
+    '''Record the raw hand landmarks detected at each frame, with their
+    handedness and timestamp, to a binary trace file.'''
+
+    def __init__(self, path, n_features=42):
+        self.path = path
+        self.dtype = trace_dtype(n_features)
+        self.file = open(path, 'wb')
+        write_header(self.file, magic=trace_magic, version=trace_version, n_features=n_features)
+        self.n_frames = 0
+
+    def record(self, timestamp, landmarks=(), handedness=(), scores=()):
+        '''Record a frame. `landmarks` is a list with the landmarks of each
+        detected hand (mediapipe landmarks or arrays), `handedness` and
+        `scores` the corresponding labels ("Left"/"Right") and confidences.'''
+        records = numpy.empty(max(len(landmarks), 1), dtype=self.dtype)
+        records['frame'] = self.n_frames
+        records['time'] = timestamp
+        records['handedness'] = -1
+        records['score'] = 0.0
+        records['landmarks'] = numpy.nan
+        for i, hand_landmarks in enumerate(landmarks):
+            Hand.vectorize_landmarks(hand_landmarks, out=records['landmarks'][i])
+            records['handedness'][i] = handedness_labels.index(handedness[i]) if len(handedness) > i else -1
+            records['score'][i] = scores[i] if len(scores) > i else 0.0
+        self.file.write(records.tobytes())
+        self.n_frames += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def read_trace(path):
+    '''Memory-map the records of a binary trace file.'''
+    return open_records(path, trace_dtype, trace_magic)
+
+def iterate_frames(records):
+    '''Iterate over the frames of a trace. Yields (timestamp, landmarks,
+    handedness, scores) for each frame, where `landmarks` is an array of
+    shape (n_hands, 21, 2) and `handedness` a list of labels.'''
+    if records.size == 0:
+        return
+    boundaries = numpy.flatnonzero(numpy.diff(records['frame'])) + 1
+    starts = numpy.concatenate(([0], boundaries))
+    stops = numpy.concatenate((boundaries, [records.size]))
+    for start, stop in zip(starts, stops):
+        frame = records[start:stop]
+        hands = frame[frame['handedness'] >= 0]
+        landmarks = numpy.array(hands['landmarks'], dtype=numpy.float64).reshape(-1, Hand.n_landmarks, Hand.dimension)
+        handedness = [handedness_labels[h] for h in hands['handedness']]
+        yield float(frame['time'][0]), landmarks, handedness, hands['score']
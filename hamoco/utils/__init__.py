@@ -1,5 +1,7 @@
 import os
 from .utils import *
+from .split import *
+from .preview import *
 
 # Default config
 config_dir = os.path.dirname(os.path.abspath(__file__))
@@ -0,0 +1,54 @@
+import cv2
+
+from .utils import draw_palm_center, draw_scrolling_origin, write_pose
+
+class PreviewRenderer:
+    '''Draw the overlays of the preview window, with the same result as the
+    `draw_*` and `write_pose` functions. Everything that only depends on the
+    resolution of the frames and on the margin (regions of the margins) or
+    that never changes (drawing styles of the landmarks) is computed once, and
+    only the pixels of the margins are dimmed, in place.'''
+
+    def __init__(self, alpha=0.25):
+        self.alpha = alpha
+        self.shape = None
+        self.bounds = None
+        self.margins = []
+        self._landmark_styles = None
+
+    def draw_control_bounds(self, image, bounds):
+        if image.shape != self.shape or bounds != self.bounds:
+            self._set_margins(image.shape, bounds)
+        # Same blending as `draw_control_bounds` (with an overlay of ones)
+        for rows, columns in self.margins:
+            region = image[rows, columns]
+            cv2.convertScaleAbs(region, dst=region, alpha=self.alpha, beta=1 - self.alpha)
+
+    # Overlays without anything to precompute: the functions themselves
+    draw_palm_center = staticmethod(draw_palm_center)
+    draw_scrolling_origin = staticmethod(draw_scrolling_origin)
+    write_pose = staticmethod(write_pose)
+
+    def draw_hand_landmarks(self, image, hand_landmark):
+        # Mediapipe is only imported when needed (slow import), and its
+        # drawing styles are only built once
+        import mediapipe as mp
+        if self._landmark_styles is None:
+            self._landmark_styles = (mp.solutions.drawing_styles.get_default_hand_landmarks_style(),
+                                     mp.solutions.drawing_styles.get_default_hand_connections_style())
+        mp.solutions.drawing_utils.draw_landmarks(image,
+            hand_landmark,
+            mp.solutions.hands.HAND_CONNECTIONS,
+            *self._landmark_styles)
+
+    def _set_margins(self, shape, bounds):
+        # Regions covered by the (inclusive) rectangles of `draw_control_bounds`:
+        # top and bottom bands, then left and right bands in between
+        height, width = shape[:2]
+        xmin, ymin, xmax, ymax = bounds
+        self.shape = shape
+        self.bounds = list(bounds)
+        self.margins = [(slice(0, ymin+1), slice(0, width)),
+                        (slice(max(ymax, ymin+1), height), slice(0, width)),
+                        (slice(ymin+1, ymax), slice(0, xmin+1)),
+                        (slice(ymin+1, ymax), slice(max(xmax, xmin+1), width))]
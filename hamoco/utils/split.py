@@ -0,0 +1,56 @@
+import numpy
+
+def _group_by_label(y, rng):
+    '''Random permutation of the samples, grouped by label (stable radix sort on small labels).'''
+    order = rng.permutation(y.shape[0])
+    labels = y[order]
+    labels = (labels - labels.min()).astype(numpy.int16) if labels.size > 0 else labels
+    order = order[numpy.argsort(labels, kind='stable')]
+    counts = numpy.bincount(labels)
+    return order, counts
+
+def train_test_split(X, y, test_size=0.0, seed=None):
+    '''Random split of a dataset into a training set and a test set. `seed` is
+    either a seed or a numpy.random.Generator.'''
+    rng = numpy.random.default_rng(seed)
+    # Bounds
+    n_samples = X.shape[0]
+    n_samples_train = int( (1.0 - test_size) * n_samples )
+    # Separate datasets
+    indices = rng.permutation(n_samples)
+    indices_train = indices[:n_samples_train]
+    indices_test = indices[n_samples_train:]
+    return X[indices_train], X[indices_test], y[indices_train], y[indices_test]
+
+def stratified_train_test_split(X, y, test_size=0.0, seed=None):
+    '''Random split of a dataset into a training set and a test set that preserves
+    the proportion of each label (e.g. `Hand.Pose`) in both sets.'''
+    rng = numpy.random.default_rng(seed)
+    order, counts = _group_by_label(y, rng)
+    # Rank of each sample among the samples with the same label
+    starts = numpy.cumsum(counts) - counts
+    ranks = numpy.arange(order.size) - numpy.repeat(starts, counts)
+    n_samples_train = ((1.0 - test_size) * counts).astype(int)
+    is_train = ranks < numpy.repeat(n_samples_train, counts)
+    # Shuffle again so that the labels are not sorted
+    indices_train = rng.permutation(order[is_train])
+    indices_test = rng.permutation(order[~is_train])
+    return X[indices_train], X[indices_test], y[indices_train], y[indices_test]
+
+def k_fold(y, n_splits=5, stratified=False, seed=None):
+    '''Iterate over `n_splits` (train indices, test indices) pairs, where each
+    sample is used exactly once for testing. With `stratified`, each fold
+    preserves the proportion of each label.'''
+    rng = numpy.random.default_rng(seed)
+    y = numpy.asarray(y)
+    n_samples = y.shape[0]
+    if stratified:
+        order, _ = _group_by_label(y, rng)
+    else:
+        order = rng.permutation(n_samples)
+    # Samples are dealt to the folds one after the other
+    folds = numpy.empty(n_samples, dtype=numpy.int64)
+    folds[order] = numpy.arange(n_samples) % n_splits
+    for fold in range(n_splits):
+        is_test = folds == fold
+        yield numpy.flatnonzero(~is_test), numpy.flatnonzero(is_test)
@@ -1,13 +1,5 @@
-import random
-
 import numpy
 import cv2
-import mediapipe as mp
-
-# Mediapipe shortcuts
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
-mp_hands = mp.solutions.hands
 
 def clamp(value, min_value, max_value):
     value = max(value, min_value)
@@ -15,11 +7,13 @@ def clamp(value, min_value, max_value):
     return value
 
 def draw_hand_landmarks(image, hand_landmark):
-    mp_drawing.draw_landmarks(image, 
+    # Mediapipe is only imported when needed (slow import)
+    import mediapipe as mp
+    mp.solutions.drawing_utils.draw_landmarks(image,
         hand_landmark,
-        mp_hands.HAND_CONNECTIONS,
-        mp_drawing_styles.get_default_hand_landmarks_style(),
-        mp_drawing_styles.get_default_hand_connections_style())
+        mp.solutions.hands.HAND_CONNECTIONS,
+        mp.solutions.drawing_styles.get_default_hand_landmarks_style(),
+        mp.solutions.drawing_styles.get_default_hand_connections_style())
 
 def draw_palm_center(image, palm_center, color_BGR=(255,255,255), size=0.05):
     height, width, _ = image.shape
@@ -68,18 +62,3 @@ def write_pose(image, pose, color_BGR=(0, 255, 0), thickness=2, font_size=1, mar
     height, _, _ = image.shape
     font = cv2.FONT_HERSHEY_SIMPLEX
     cv2.putText(image, f'Pose: {pose}', (margin[0], height-margin[1]), font, font_size, color_BGR, thickness=thickness)
-
-def train_test_split(X, y, test_size=0.0, seed=None):
-    # Seed
-    random.seed(seed)
-    # Bounds
-    n_samples = X.shape[0]
-    n_samples_train = int( (1.0 - test_size) * n_samples )
-    # Separate datasets
-    indices_train = random.sample(range(n_samples), n_samples_train)
-    indices_test = [i for i in range(n_samples) if i not in indices_train]
-    X_train = X[indices_train, :]
-    X_test = X[indices_test, :]
-    y_train = y[indices_train]
-    y_test = y[indices_test]
-    return X_train, X_test, y_train, y_test
\ No newline at end of file
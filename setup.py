@@ -29,8 +29,13 @@ args = dict(name='hamoco',
             entry_points={'console_scripts':
                           ['hamoco-run = hamoco.cli.hamoco_run:main',
                            'hamoco-data = hamoco.cli.hamoco_data:main',
-                           'hamoco-train = hamoco.cli.hamoco_train:main']},
-            install_requires=['pyautogui', 'numpy', 'opencv-python', 'mediapipe', 'tensorflow'],
+                           'hamoco-train = hamoco.cli.hamoco_train:main',
+                           'hamoco-convert = hamoco.cli.hamoco_convert:main',
+                           'hamoco-ingest = hamoco.cli.hamoco_ingest:main']},
+            install_requires=['pyautogui', 'numpy', 'h5py', 'opencv-python', 'mediapipe', 'tensorflow'],
+            extras_require={'xtest': ['python-xlib'],
+                            'uinput': ['evdev'],
+                            'tflite': ['tflite-runtime']},
             license='GPLv3',
             classifiers=[
                 'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import unittest
+
+from hamoco import Hand, HandyMouseController
+from hamoco.actuation import RecordingBackend, open_backend
+from hamoco.pipeline import MouseActuator
+import numpy
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = RecordingBackend(resolution=(1000, 800))
+
+    def events(self):
+        return [event[1:] for event in self.backend.events]
+
+    def test_coalescing(self):
+        # Pending moves and scroll ticks are sent as one event per flush
+        for _ in range(4):
+            self.backend.move(2.3, -1.0)
+            self.backend.scroll(1)
+        self.backend.flush()
+        self.assertEqual(self.events(), [('move', 9, -4), ('scroll', 4)])
+        # Sub-pixel moves are kept for the next flush
+        self.backend.move(0.4, 0)
+        self.backend.flush()
+        self.assertEqual(self.events()[-1], ('move', 1, 0))
+        self.assertEqual(self.backend.position(), (510, 396))
+        # Buttons are pressed after the pending moves
+        self.backend.move(5, 5)
+        self.backend.left_click()
+        self.assertEqual(self.events()[-3:], [('move', 5, 5), ('down', 'left'), ('up', 'left')])
+        self.assertEqual(self.backend.n_events, len(self.backend.events))
+        self.assertRaises(ValueError, open_backend, 'unknown')
+
+    def test_controller(self):
+        controller = HandyMouseController(backend=self.backend)
+        self.assertEqual(list(controller.screen_resolution), [1000, 800])
+        rng = numpy.random.default_rng(0)
+        landmarks = 0.5 + 0.01 * rng.normal(size=(12, 42))
+        poses = ['OPEN', 'OPEN', 'OPEN', 'CLOSE', 'INDEX_UP', 'CLOSE', 'PINKY_UP', 'CLOSE',
+                 'INDEX_MIDDLE_UP', 'INDEX_MIDDLE_UP', 'INDEX_MIDDLE_UP', 'CLOSE']
+        for i, (pose, landmark_vector) in enumerate(zip(poses, landmarks)):
+            palm_center = controller.palm_center(landmark_vector, timestamp=i / 30)
+            controller.operate_mouse(Hand(pose=pose), palm_center, 0.9)
+        names = [event[0] for event in self.events()]
+        self.assertIn('move', names)
+        buttons = [event for event in self.events() if event[0] in ['down', 'up']]
+        self.assertEqual(buttons, [('down', 'left'), ('up', 'left'),
+                                   ('down', 'right'), ('up', 'right'),
+                                   ('down', 'left'), ('up', 'left')])
+        # Unfinished drag: the button is released on exit
+        for i in range(2):
+            palm_center = controller.palm_center(landmarks[i], timestamp=(12 + i) / 30)
+            controller.operate_mouse(Hand(pose='INDEX_MIDDLE_UP'), palm_center, 0.9)
+        self.assertEqual(self.events()[-1], ('down', 'left'))
+        controller.release()
+        controller.release()
+        self.assertEqual(self.events()[-1], ('up', 'left'))
+        self.assertEqual(self.events()[-2][0], 'down')
+
+    def test_actuator(self):
+        controller = HandyMouseController(backend=self.backend)
+        actuator = MouseActuator(controller)
+        # Queued jobs are processed together, with their moves merged
+        for i in range(3):
+            actuator.jobs.put((Hand.Pose.OPEN, numpy.full(42, 0.1 + 0.2 * i), 0.9, i / 30, None))
+        actuator.start()
+        actuator.stop()
+        self.assertEqual([event[0] for event in self.events()], ['move'])
+
+    def test_actuator_error(self):
+        # A failing backend stops the thread: the error is raised by `submit`,
+        # which does not block on the full queue
+        def fail(dx, dy):
+            raise OSError('no display')
+        self.backend._move = fail
+        actuator = MouseActuator(HandyMouseController(backend=self.backend), maxsize=1).start()
+        with self.assertRaises(OSError):
+            for i in range(100):
+                actuator.submit(Hand.Pose.OPEN, numpy.full(42, 0.1 + 0.005 * i), 0.9, i / 30)
+        actuator.stop()
+        self.assertFalse(actuator.started)
+
+    def test_routing(self):
+        # Each hand has its own controller, and both share the mouse
+        controllers = {'Left': HandyMouseController(backend=self.backend),
+                       'Right': HandyMouseController(backend=self.backend)}
+        actuator = MouseActuator(controllers['Right'], controllers=controllers)
+        for i in range(3):
+            actuator.submit(Hand.Pose.INDEX_MIDDLE_UP, numpy.full(42, 0.2), 0.9, i / 30, label='Left')
+            actuator.submit(Hand.Pose.OPEN, numpy.full(42, 0.3 + 0.1 * i), 0.9, i / 30, label='Right')
+        self.assertEqual(controllers['Left'].current_mouse_state, HandyMouseController.MouseState.DRAGGING)
+        self.assertEqual(controllers['Right'].current_mouse_state, HandyMouseController.MouseState.STANDARD)
+        self.assertEqual(sorted(actuator.palm_centers), ['Left', 'Right'])
+        self.assertTrue(numpy.allclose(actuator.palm_centers['Left'], 0.2))
+        names = [event[0] for event in self.events()]
+        self.assertIn('down', names)
+        self.assertIn('move', names)
+
+    def test_pointer_hand(self):
+        # Only the pointer hand moves the pointer of the shared mouse
+        controllers = {'Left': HandyMouseController(backend=self.backend, moves_pointer=False),
+                       'Right': HandyMouseController(backend=self.backend)}
+        actuator = MouseActuator(controllers['Right'], controllers=controllers)
+        for i in range(3):
+            actuator.submit(Hand.Pose.OPEN, numpy.full(42, 0.2 + 0.1 * i), 0.9, i / 30, label='Left')
+        self.assertEqual(self.events(), [])
+        for i in range(3):
+            actuator.submit(Hand.Pose.OPEN, numpy.full(42, 0.2 + 0.1 * i), 0.9, i / 30, label='Left')
+            actuator.submit(Hand.Pose.OPEN, numpy.full(42, 0.6 - 0.1 * i), 0.9, i / 30, label='Right')
+        moves = [event[1:] for event in self.events() if event[0] == 'move']
+        # Moves of the right hand only (after its first position)
+        self.assertEqual(len(moves), 3)
+        self.assertTrue(all(dx < 0 and dy < 0 for dx, dy in moves[1:]))
+        # The other hand still clicks
+        actuator.submit(Hand.Pose.INDEX_UP, numpy.full(42, 0.4), 0.9, 0.1, label='Left')
+        self.assertEqual(self.events()[-2:], [('down', 'left'), ('up', 'left')])
+
+if __name__ == '__main__':
+    unittest.main()
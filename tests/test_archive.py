@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import tempfile
+
+import cv2
+import numpy
+from hamoco.archive import FrameArchiveWriter, FrameArchive, remove_archive_label, archive_chunk_path
+from hamoco.dataset import DatasetWriter, open_dataset
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'frames')
+        rng = numpy.random.default_rng(0)
+        self.images = [numpy.full((32, 48, 3), 40 * i, dtype=numpy.uint8) for i in range(6)]
+        for image in self.images:
+            image[:8] = rng.integers(0, 255, (8, 48, 3))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_archive(self):
+        # Small chunks: a new chunk file every few images
+        with FrameArchiveWriter(self.path, chunk_size=2000) as writer:
+            for i, image in enumerate(self.images[:4]):
+                self.assertEqual(writer.append(image, snapshot=i, label=i % 2, timestamp=float(i)), i)
+        # Append to an existing archive
+        with FrameArchiveWriter(self.path, chunk_size=2000) as writer:
+            self.assertEqual(writer.n_images, 4)
+            for i, image in enumerate(self.images[4:], start=4):
+                writer.append(image, snapshot=i, label=i % 2, timestamp=float(i))
+        self.assertTrue(os.path.isfile(archive_chunk_path(self.path, 1)))
+        # Random access
+        with FrameArchive(self.path) as archive:
+            self.assertEqual(len(archive), 6)
+            for i in [5, 0, 3]:
+                expected = cv2.imdecode(cv2.imencode('.jpg', self.images[i], [cv2.IMWRITE_JPEG_QUALITY, 90])[1], cv2.IMREAD_COLOR)
+                self.assertTrue(numpy.array_equal(archive.read(i), expected))
+            self.assertEqual(archive.find_snapshot(label=1, snapshot=3), 3)
+            self.assertIsNone(archive.find_snapshot(label=0, snapshot=3))
+        # Remove a label
+        self.assertEqual(remove_archive_label(self.path, 0), 3)
+        with FrameArchive(self.path) as archive:
+            self.assertEqual(list(archive.index['snapshot']), [1, 3, 5])
+            self.assertEqual(archive.read(2).shape, self.images[5].shape)
+
+    def test_dataset_samples(self):
+        # Samples and images of the same snapshot share label and timestamp
+        path_to_file = os.path.join(self.tmp_dir.name, 'dataset.hamoco')
+        with DatasetWriter(path_to_file) as dataset, FrameArchiveWriter(self.path) as writer:
+            for i, image in enumerate(self.images):
+                if i != 2:
+                    writer.append(image, snapshot=i, label=1, timestamp=100.0 + i)
+                dataset.append(1, numpy.zeros(42), timestamp=100.0 + i)
+        records = open_dataset(path_to_file)
+        with FrameArchive(self.path) as archive:
+            self.assertEqual(archive.find_sample(1, 103.0), 2)
+            self.assertIsNone(archive.find_sample(0, 103.0))
+            self.assertIsNone(archive.sample_image(records, 2))
+            self.assertEqual(archive.sample_image(records, 4).shape, self.images[4].shape)
+
+if __name__ == '__main__':
+    unittest.main()
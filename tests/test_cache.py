@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+import tempfile
+import warnings
+
+from hamoco.cache import DatasetCache, load_processed_dataset
+from hamoco.dataset import DatasetWriter, list_text_samples, remove_label
+import numpy
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_text_samples(self):
+        path_to_data = os.path.join(self.tmp_dir.name, 'text')
+        os.makedirs(path_to_data)
+        # Samples of the repository only (not the ones left by other tests)
+        for path in list_text_samples(self.data_dir):
+            if os.path.basename(path).startswith('snapshot_'):
+                shutil.copy(path, path_to_data)
+        n_samples = len(list_text_samples(path_to_data))
+        cache = DatasetCache(path_to_data)
+        X, y = cache.load()
+        self.assertTrue(cache.rebuilt)
+        X_expected, y_expected = load_processed_dataset(path_to_data, cache=False)
+        self.assertTrue(numpy.allclose(X, X_expected))
+        self.assertTrue(numpy.array_equal(y, y_expected))
+        # Unchanged: nothing to process
+        cache = DatasetCache(path_to_data)
+        X, y = cache.load()
+        self.assertEqual((cache.n_cached, cache.n_new, cache.rebuilt), (n_samples, 0, False))
+        # New sample: appended to the cache
+        shutil.copy(os.path.join(path_to_data, 'snapshot_0000_pose-0-OPEN.dat'),
+                    os.path.join(path_to_data, 'snapshot_0001_pose-0-OPEN.dat'))
+        X, y = cache.load()
+        self.assertEqual((cache.n_new, cache.rebuilt, y.size), (1, False, n_samples + 1))
+        self.assertTrue(numpy.array_equal(X[-1], X_expected[0]))
+        # Modified sample: rebuilt
+        os.utime(os.path.join(path_to_data, 'snapshot_0000_pose-1-CLOSE.dat'), ns=(0, 0))
+        X, y = cache.load()
+        self.assertEqual((cache.n_new, cache.rebuilt), (n_samples + 1, True))
+
+    def test_read_only(self):
+        # The cache directory cannot be created: samples processed without it
+        path_to_data = os.path.join(self.tmp_dir.name, 'text')
+        os.makedirs(path_to_data)
+        for path in list_text_samples(self.data_dir):
+            if os.path.basename(path).startswith('snapshot_'):
+                shutil.copy(path, path_to_data)
+        cache = DatasetCache(path_to_data)
+        open(cache.directory, 'w').close()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            X, y = cache.load()
+        self.assertEqual(len(caught), 1)
+        X_expected, y_expected = load_processed_dataset(path_to_data, cache=False)
+        self.assertTrue(numpy.allclose(X, X_expected))
+        self.assertTrue(numpy.array_equal(y, y_expected))
+        self.assertEqual((cache.n_new, cache.timestamps.size), (y.size, y.size))
+        self.assertTrue(os.path.isfile(cache.directory))
+
+    def test_binary_dataset(self):
+        path_to_file = os.path.join(self.tmp_dir.name, 'dataset.hamoco')
+        rng = numpy.random.default_rng(0)
+        features = rng.random((100, 42), dtype=numpy.float32)
+        labels = numpy.arange(100) % 3
+        with DatasetWriter(path_to_file) as writer:
+            writer.extend(labels[:80], features[:80])
+        cache = DatasetCache(self.tmp_dir.name, chunk_size=32)
+        X, y = cache.load()
+        self.assertEqual((cache.n_new, cache.rebuilt), (80, True))
+        # Appended records only
+        with DatasetWriter(path_to_file) as writer:
+            writer.extend(labels[80:], features[80:])
+        X, y = cache.load()
+        self.assertEqual((cache.n_cached, cache.n_new, cache.rebuilt), (80, 20, False))
+        X_expected, y_expected = load_processed_dataset(path_to_file, cache=False)
+        self.assertTrue(numpy.allclose(X, X_expected))
+        self.assertTrue(numpy.array_equal(y, y_expected))
+        # Rewritten file: rebuilt
+        remove_label(path_to_file, 0)
+        X, y = cache.load()
+        self.assertTrue(cache.rebuilt)
+        self.assertNotIn(0, y)
+        # Interrupted update of the cache: rebuilt
+        with open(cache.path_to_cache, 'ab') as file:
+            file.write(numpy.zeros(1, dtype=[('label', '<i4'), ('time', '<f8'), ('features', '<f4', (42,))]).tobytes())
+        X, y = cache.load()
+        self.assertTrue(cache.rebuilt)
+        self.assertEqual(y.size, 66)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,13 @@
 
 import unittest
 import os
+import tempfile
 
-from hamoco import ClassificationModel
+from hamoco import Hand, ClassificationModel
+from hamoco.models import __default_model__
+from hamoco.dataset import convert_text_dataset, list_text_samples
 import numpy
+import keras
 
 class Test(unittest.TestCase):
 
@@ -18,12 +22,66 @@ class Test(unittest.TestCase):
         model.read_dataset(self.data_dir)
         self.assertEqual(set(model.classes), set([0,1,2,3,4,5]), 'not the expected labels')
 
-        # Process the data
-        model.process_dataset()
+        # Process the data (same processing as live landmarks)
+        raw_data = model.data.copy()
+        model.process_dataset(chunk_size=4)
+        for raw_vector, vector in zip(raw_data, model.data):
+            expected = Hand.feature_process_landmarks(raw_vector)
+            self.assertTrue(numpy.allclose(vector, expected, atol=1e-5))
         
         # Train the model
         model.train(hidden_layers=(5,5,5), epochs=5)
         model.save_model(os.path.join(self.data_dir, 'phony_model.h5'))
         
+    def test_model_streaming(self):
+
+        # Binary dataset file streamed by chunks
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            convert_text_dataset(self.data_dir, os.path.join(tmp_dir, 'dataset.hamoco'))
+            model = ClassificationModel()
+            model.train_stream(tmp_dir, hidden_layers=(5,5,5), epochs=2, test_size=0.3,
+                               chunk_size=2, shuffle_buffer=3, batch_size=2, seed=0)
+            self.assertEqual(model.n_samples, len(list_text_samples(self.data_dir)))
+
+    def test_model_fine_tuning(self):
+
+        # Default model fine-tuned on the most recent samples, with replay
+        model = ClassificationModel()
+        model.read_dataset(self.data_dir)
+        model.process_dataset()
+        model.load_model(__default_model__)
+        new_samples = model.select_new_samples(n_samples=2)
+        self.assertEqual(len(new_samples), 2)
+        self.assertEqual(len(model.select_new_samples(since=model.timestamps.max())), 0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_dir = os.path.join(tmp_dir, 'checkpoints')
+            n_new, n_replay = model.fine_tune(new_samples, replay=1.0, epochs=2, test_size=0.3,
+                                              checkpoint_dir=checkpoint_dir, seed=0)
+            self.assertEqual((n_new, n_replay), (2, 2))
+            self.assertFalse(os.path.exists(checkpoint_dir))
+            # Run interrupted after its first epoch
+            weights = []
+            def interrupt(epoch, logs):
+                weights.extend(model.model.get_weights())
+                raise KeyboardInterrupt
+            with self.assertRaises(KeyboardInterrupt):
+                model.fine_tune(numpy.arange(3), epochs=3, test_size=0.3, checkpoint_dir=checkpoint_dir,
+                                callbacks=[keras.callbacks.LambdaCallback(on_epoch_end=interrupt)])
+            # Resumed on the same samples, from the second epoch and the weights of the first one
+            epochs = []
+            def resumed(epoch, logs):
+                if not epochs:
+                    for restored, saved in zip(model.model.get_weights(), weights):
+                        self.assertTrue(numpy.array_equal(restored, saved))
+                epochs.append(epoch)
+            n_new, n_replay = model.fine_tune(new_samples, epochs=3, test_size=0.3, checkpoint_dir=checkpoint_dir,
+                                              resume=True, callbacks=[keras.callbacks.LambdaCallback(on_epoch_begin=resumed)])
+            self.assertEqual((n_new, n_replay), (3, 0))
+            self.assertEqual(epochs, [1, 2])
+            self.assertFalse(os.path.exists(checkpoint_dir))
+        # The new samples must be selected
+        with self.assertRaises(ValueError):
+            model.select_new_samples()
+
 if __name__ == '__main':
     unittest.main()
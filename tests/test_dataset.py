@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+
+from hamoco.dataset import DatasetWriter, DatasetStream, open_dataset, find_dataset, remove_label
+from hamoco.dataset import convert_text_dataset, read_text_sample, list_text_samples, read_dataset, ignored_text_samples
+from hamoco import Hand, HandSnapshot
+from hamoco.pipeline import SnapshotWriter
+import numpy
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_to_file = os.path.join(self.tmp_dir.name, 'dataset.hamoco')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_conversion(self):
+        # Convert text samples to a binary file
+        n_samples = convert_text_dataset(self.data_dir, self.path_to_file)
+        paths_to_samples = list_text_samples(self.data_dir)
+        self.assertEqual(n_samples, len(paths_to_samples))
+        self.assertEqual(find_dataset(self.tmp_dir.name), self.path_to_file)
+        # Same content
+        records = open_dataset(self.path_to_file)
+        self.assertEqual(records.size, n_samples)
+        for record, sample in zip(records, paths_to_samples):
+            x_i, y_i = read_text_sample(sample)
+            self.assertEqual(record['label'], y_i)
+            self.assertTrue(numpy.array_equal(record['features'], x_i))
+        # Same samples read from both formats
+        X_text, y_text = read_dataset(self.data_dir)
+        X_binary, y_binary = read_dataset(self.tmp_dir.name)
+        self.assertTrue(numpy.array_equal(X_text, X_binary))
+        self.assertTrue(numpy.array_equal(y_text, y_binary))
+        # Converting twice would duplicate the samples
+        self.assertRaises(FileExistsError, convert_text_dataset, self.data_dir, self.path_to_file)
+        convert_text_dataset(self.data_dir, self.path_to_file, overwrite=True)
+        self.assertEqual(open_dataset(self.path_to_file).size, n_samples)
+
+    def test_ignored_text_samples(self):
+        # Text samples recorded after the conversion are not read with the binary file
+        for path in list_text_samples(self.data_dir):
+            shutil.copy2(path, self.tmp_dir.name)
+        convert_text_dataset(self.tmp_dir.name)
+        self.assertEqual(ignored_text_samples(self.tmp_dir.name), [])
+        path_to_sample = os.path.join(self.tmp_dir.name, 'snapshot_0001_pose-0-OPEN.dat')
+        shutil.copy(os.path.join(self.tmp_dir.name, 'snapshot_0000_pose-0-OPEN.dat'), path_to_sample)
+        os.utime(path_to_sample, (1e9, 1e9))
+        self.assertEqual(ignored_text_samples(self.tmp_dir.name), [path_to_sample])
+        with self.assertWarns(UserWarning):
+            read_dataset(self.tmp_dir.name)
+
+    def test_writer(self):
+        rng = numpy.random.default_rng(0)
+        features = rng.random((10, 42), dtype=numpy.float32)
+        labels = numpy.arange(10) % 3
+        with DatasetWriter(self.path_to_file) as writer:
+            writer.extend(labels[:5], features[:5])
+        # Append to an existing file
+        with DatasetWriter(self.path_to_file) as writer:
+            self.assertEqual(writer.n_samples, 5)
+            for label, vector in zip(labels[5:], features[5:]):
+                writer.append(label, vector, timestamp=1.0)
+            self.assertEqual(writer.n_samples, 10)
+        records = open_dataset(self.path_to_file)
+        self.assertTrue(numpy.array_equal(records['features'], features))
+        self.assertTrue(numpy.array_equal(records['label'], labels))
+        self.assertTrue(numpy.all(records['time'][5:] == 1.0))
+        # An interrupted write is ignored, then overwritten
+        del records
+        with open(self.path_to_file, 'ab') as file:
+            file.write(b'\x00' * 10)
+        self.assertEqual(open_dataset(self.path_to_file).size, 10)
+        with DatasetWriter(self.path_to_file) as writer:
+            writer.append(0, features[0])
+        self.assertEqual(open_dataset(self.path_to_file).size, 11)
+        # Remove a label
+        n_kept = remove_label(self.path_to_file, 0)
+        records = open_dataset(self.path_to_file)
+        self.assertEqual(n_kept, records.size)
+        self.assertNotIn(0, records['label'])
+        # Wrong number of features
+        with self.assertRaises(ValueError):
+            DatasetWriter(self.path_to_file, n_features=63)
+
+    def test_snapshot_hands(self):
+        # Several hands are written at once, like one by one
+        hands = numpy.random.default_rng(0).random((3, 21, 2))
+        snapshot = HandSnapshot(hand=Hand(Hand.Pose.OPEN))
+        with DatasetWriter(self.path_to_file) as writer:
+            snapshot.append_landmarks_vectors(hands, writer)
+            for landmarks in hands:
+                snapshot.append_landmarks_vector(landmarks, writer)
+        records = open_dataset(self.path_to_file)
+        self.assertTrue(numpy.all(records['label'] == Hand.Pose.OPEN.value))
+        self.assertTrue(numpy.allclose(records['features'][:3], records['features'][3:]))
+
+    def test_snapshot_writer(self):
+        hands = numpy.random.default_rng(0).random((6, 42))
+        snapshot = HandSnapshot(hand=Hand(Hand.Pose.CLOSE))
+        with DatasetWriter(self.path_to_file) as writer:
+            # The background writes are blocked until `resume` is set
+            blocked, resume = threading.Event(), threading.Event()
+            extend = writer.extend
+            def blocked_extend(*args, **kwargs):
+                blocked.set()
+                resume.wait()
+                extend(*args, **kwargs)
+            writer.extend = blocked_extend
+            snapshot_writer = SnapshotWriter(writer, maxsize=2).start()
+            self.assertTrue(snapshot_writer.submit(snapshot, hands[:2]))
+            blocked.wait()
+            self.assertTrue(snapshot_writer.submit(snapshot, hands[2]))
+            self.assertTrue(snapshot_writer.submit(snapshot, hands[3]))
+            # Full queue: dropped
+            self.assertFalse(snapshot_writer.submit(snapshot, hands[4]))
+            self.assertEqual((snapshot_writer.max_depth, snapshot_writer.n_dropped), (2, 1))
+            # Pending snapshots are written on stop
+            resume.set()
+            snapshot_writer.stop()
+            self.assertEqual(snapshot_writer.n_written, 3)
+            # Synchronous text files and image
+            path = os.path.join(self.tmp_dir.name, 'snapshot')
+            image = numpy.zeros((8, 8, 3), dtype=numpy.uint8)
+            SnapshotWriter().submit(snapshot, hands[5], text_paths=[path], image=image, image_path=path)
+        records = open_dataset(self.path_to_file)
+        self.assertEqual(records.size, 4)
+        self.assertTrue(numpy.all(records['label'] == Hand.Pose.CLOSE.value))
+        self.assertTrue(numpy.allclose(records['features'], Hand.feature_process_landmarks(hands[:4])))
+        x, y = read_text_sample(path + '.dat')
+        self.assertEqual(y, Hand.Pose.CLOSE.value)
+        self.assertTrue(numpy.allclose(x, Hand.feature_process_landmarks(hands[5]), atol=1e-6))
+        self.assertTrue(os.path.isfile(path + '.jpg'))
+
+    def test_snapshot_writer_error(self):
+        # A failing write stops the thread: the error is raised by `submit`
+        # instead of dropping the next snapshots, and `stop` does not block
+        hands = numpy.random.default_rng(0).random((4, 42))
+        snapshot = HandSnapshot(hand=Hand(Hand.Pose.CLOSE))
+        with DatasetWriter(self.path_to_file) as writer:
+            def fail(*args, **kwargs):
+                raise OSError('disk full')
+            writer.extend = fail
+            snapshot_writer = SnapshotWriter(writer, maxsize=1).start()
+            snapshot_writer.submit(snapshot, hands[0])
+            snapshot_writer._thread.join(timeout=5)
+            with self.assertRaises(OSError):
+                snapshot_writer.submit(snapshot, hands[1])
+            with self.assertRaises(RuntimeError):
+                snapshot_writer.submit(snapshot, hands[2])
+            self.assertEqual(snapshot_writer.n_dropped, 0)
+            # Full queue that is not consumed anymore
+            snapshot_writer.jobs.put_nowait(None)
+            snapshot_writer.stop()
+            self.assertFalse(snapshot_writer.started)
+            # Raised by `stop` if no snapshot was submitted since
+            snapshot_writer = SnapshotWriter(writer).start()
+            snapshot_writer.submit(snapshot, hands[3])
+            with self.assertRaises(OSError):
+                snapshot_writer.stop()
+
+    def test_stream(self):
+        # Samples are numbered to check that each is read once per epoch
+        n_samples = 1003
+        features = numpy.repeat(numpy.arange(n_samples, dtype=numpy.float32)[:,None], 42, axis=1)
+        # Poses recorded one after the other (single-pose chunks)
+        labels = numpy.arange(n_samples) * 6 // n_samples
+        with DatasetWriter(self.path_to_file) as writer:
+            writer.extend(labels, features)
+        train, test = DatasetStream.split(self.path_to_file, test_size=0.2, chunk_size=100,
+                                          shuffle_buffer=250, batch_size=16, seed=0)
+        self.assertEqual(train.n_samples + test.n_samples, n_samples)
+        seen = []
+        for stream in [train, test]:
+            batches = list(stream.epoch())
+            self.assertEqual(len(batches), len(stream))
+            self.assertTrue(all(X.shape[0] == y.shape[0] <= 16 for X, y in batches))
+            seen.extend(int(x) for X, _ in batches for x in X[:,0])
+            # Same proportion of each pose in both streams
+            y = numpy.concatenate([y for _, y in batches])
+            self.assertTrue(numpy.allclose(numpy.bincount(y, minlength=6) / y.size, 1/6, atol=0.01))
+        self.assertEqual(sorted(seen), list(range(n_samples)))
+
+if __name__ == '__main':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import unittest
+
+from hamoco.filter import OneEuroFilter, OneEuroArrayFilter, filter_sequence
+import numpy
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.default_rng(0)
+        self.timestamps = numpy.cumsum(rng.uniform(0.5, 1.5, size=50))
+        self.sequence = numpy.cumsum(rng.normal(size=(50, 21, 2)), axis=0)
+
+    def test_same_as_scalar_filter(self):
+        t, X = self.timestamps, self.sequence
+        for parameters in [dict(min_cutoff=0.1, beta=0.5, d_cutoff=1.0),
+                           dict(min_cutoff=0.1, beta=0.0, d_cutoff=2.0)]:
+            array_filter = OneEuroArrayFilter(t[0], X[0], **parameters)
+            filtered = numpy.array([array_filter(t_i, x_i) for t_i, x_i in zip(t[1:], X[1:])])
+            for i, j in [(0, 0), (4, 1), (20, 1)]:
+                scalar_filter = OneEuroFilter(t[0], X[0, i, j], **parameters)
+                expected = [scalar_filter(t_i, x_i) for t_i, x_i in zip(t[1:], X[1:, i, j])]
+                self.assertTrue(numpy.array_equal(filtered[:, i, j], expected))
+
+    def test_filter_sequence(self):
+        t, X = self.timestamps, self.sequence
+        filtered = filter_sequence(t, X, min_cutoff=0.1, beta=0.5)
+        self.assertEqual(filtered.shape, X.shape)
+        self.assertTrue(numpy.array_equal(filtered[0], X[0]))
+        array_filter = OneEuroArrayFilter(t[0], X[0], min_cutoff=0.1, beta=0.5)
+        for t_i, x_i, y_i in zip(t[1:], X[1:], filtered[1:]):
+            self.assertTrue(numpy.array_equal(array_filter(t_i, x_i), y_i))
+        # Smoothing reduces the jitter
+        self.assertLess(numpy.abs(numpy.diff(filtered, axis=0)).mean(),
+                        numpy.abs(numpy.diff(X, axis=0)).mean())
+
+if __name__ == '__main__':
+    unittest.main()
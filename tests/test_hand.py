@@ -5,6 +5,7 @@ import os
 
 import cv2
 import mediapipe
+import numpy
 from hamoco import Hand, HandSnapshot
 from hamoco.utils import draw_hand_landmarks
 
@@ -26,6 +27,33 @@ class Test(unittest.TestCase):
         self.assertEqual(hand_0.pose, hand_1.pose)
         self.assertEqual(hand_1.pose, hand_2.pose)
 
+    def test_batched_landmarks(self):
+        # A stack of hands is processed like each hand separately
+        hand = Hand()
+        rng = numpy.random.default_rng(0)
+        landmarks = rng.random((10, Hand.n_landmarks, Hand.dimension))
+        vectors = Hand.vectorize_landmarks(landmarks)
+        self.assertEqual(vectors.shape, (10, Hand.n_landmarks * Hand.dimension))
+        processed = hand.feature_process_landmarks(landmarks)
+        for vector, processed_vector in zip(vectors, processed):
+            expected = hand.feature_process_landmarks(vector)
+            self.assertEqual(expected.shape, (1, vectors.shape[1]))
+            self.assertTrue(numpy.allclose(processed_vector, expected))
+        # Centered and scale invariant along each axis
+        self.assertTrue(numpy.allclose(processed[:,0::2].mean(axis=1), 0.0))
+        self.assertTrue(numpy.allclose(processed[:,1::2].std(axis=1), 1.0))
+        # Caller-provided (and in-place) output buffers
+        out = numpy.empty((10, vectors.shape[1]), dtype=numpy.float32)
+        result = Hand.feature_process_landmarks(vectors, out=out)
+        self.assertTrue(numpy.shares_memory(result, out))
+        self.assertTrue(numpy.allclose(out, processed, atol=1e-5))
+        Hand.feature_process_landmarks(vectors, out=vectors)
+        self.assertTrue(numpy.allclose(vectors, processed))
+        # Output buffer that cannot be reshaped without a copy
+        out = numpy.zeros((2, 5, vectors.shape[1])).transpose(1, 0, 2)
+        Hand.feature_process_landmarks(landmarks, out=out)
+        self.assertTrue(numpy.allclose(out.reshape(10, -1), processed))
+
     def test_snapshot(self):
 
         hands = mp_hands.Hands(static_image_mode=True)
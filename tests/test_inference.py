@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+
+from hamoco import ClassificationModel
+from hamoco.models import __default_model__
+from hamoco.inference import NumpyModel, TFLiteModel, PredictionGate, load_model, evaluate_model
+import keras
+import numpy
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.model = ClassificationModel()
+        self.model.read_dataset(self.data_dir)
+
+    def test_default_model(self):
+        # NumPy and Keras models should predict the same probabilities
+        keras_model = keras.models.load_model(__default_model__)
+        numpy_model = load_model(__default_model__)
+        self.assertIsInstance(numpy_model, NumpyModel)
+        expected = keras_model.predict(self.model.data, verbose=0)
+        probabilities = numpy_model.predict(self.model.data)
+        self.assertEqual(probabilities.shape, expected.shape)
+        self.assertTrue(numpy.allclose(probabilities, expected, atol=1e-5))
+        # Single vector
+        probabilities = numpy_model.predict(self.model.data[0])
+        self.assertEqual(probabilities.shape, (1, expected.shape[1]))
+        self.assertTrue(numpy.allclose(probabilities.sum(), 1.0))
+
+    def test_trained_model(self):
+        path_to_model = os.path.join(self.data_dir, 'phony_inference_model.h5')
+        self.model.process_dataset()
+        self.model.train(hidden_layers=(5,5,5), epochs=1)
+        self.model.save_model(path_to_model)
+        expected = self.model.model.predict(self.model.data, verbose=0)
+        probabilities = load_model(path_to_model).predict(self.model.data)
+        self.assertTrue(numpy.allclose(probabilities, expected, atol=1e-5))
+
+    def test_tflite_model(self):
+        self.model.process_dataset()
+        self.model.train(hidden_layers=(5,5,5), epochs=1)
+        expected = self.model.model.predict(self.model.data, verbose=0)
+        X_calibration, _ = self.model.sample_data(3)
+        self.assertEqual(X_calibration.shape, (3, self.model.n_features))
+        # Calibrated on every compared sample (the int8 ranges are clipped otherwise)
+        X_calibration = self.model.data
+        for quantization, atol in [('float16', 1e-2), ('int8', 1e-1)]:
+            path_to_model = os.path.join(self.data_dir, f'phony_inference_model_{quantization}.tflite')
+            self.model.export_tflite(path_to_model, quantization=quantization, representative_data=X_calibration)
+            tflite_model = load_model(path_to_model)
+            self.assertIsInstance(tflite_model, TFLiteModel)
+            probabilities = tflite_model.predict(self.model.data)
+            self.assertEqual(probabilities.shape, expected.shape)
+            self.assertTrue(numpy.allclose(probabilities, expected, atol=atol))
+            # Single vector
+            self.assertEqual(tflite_model.predict(self.model.data[0]).shape, (1, expected.shape[1]))
+            accuracy, latency = evaluate_model(tflite_model, self.model.data, self.model.classes)
+            self.assertTrue(0 <= accuracy <= 1 and latency > 0)
+            os.remove(path_to_model)
+
+    def test_prediction_gate(self):
+        numpy_model = load_model(__default_model__)
+        gate = PredictionGate(numpy_model, threshold=0.1, max_age=2)
+        X = self.model.data[0].copy()
+        expected = numpy_model.predict(X)
+        self.assertTrue(numpy.array_equal(gate.predict(X), expected))
+        # Small moves reuse the last prediction, up to `max_age` times
+        for _ in range(2):
+            X[0] += 0.01
+            self.assertIs(gate.predict(X), gate.last_probabilities)
+        gate.predict(X)
+        self.assertEqual((gate.n_hits, gate.n_misses), (2, 2))
+        # Large moves are classified again
+        gate.predict(X + 1.0)
+        self.assertEqual(gate.n_misses, 3)
+        self.assertTrue(numpy.array_equal(gate.last_probabilities, numpy_model.predict(X + 1.0)))
+        gate.reset()
+        gate.predict(X + 1.0)
+        self.assertEqual(gate.n_misses, 4)
+        self.assertAlmostEqual(gate.hit_rate, 2 / 6)
+
+if __name__ == '__main':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy
+from hamoco import Hand
+from hamoco.dataset import open_dataset
+from hamoco.ingest import find_labeled_files, ingest_jobs, ingest
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # Footage labeled by directory: images and a video
+        self.footage = os.path.join(self.tmp_dir.name, 'footage')
+        for pose in ['OPEN', 'unlabeled']:
+            os.makedirs(os.path.join(self.footage, pose))
+        for i in range(3):
+            shutil.copy(os.path.join(self.data_dir, 'POSE_1_OPEN.jpg'), os.path.join(self.footage, 'OPEN', f'open_{i}.jpg'))
+        shutil.copy(os.path.join(self.data_dir, 'POSE_3_INDEX_UP.jpg'), os.path.join(self.footage, 'unlabeled'))
+        os.makedirs(os.path.join(self.footage, 'session', 'CLOSE'))
+        image = cv2.imread(os.path.join(self.data_dir, 'POSE_2_CLOSE.jpg'))
+        video = cv2.VideoWriter(os.path.join(self.footage, 'session', 'CLOSE', 'close.avi'),
+                                cv2.VideoWriter_fourcc(*'MJPG'), 30, (image.shape[1], image.shape[0]))
+        for _ in range(10):
+            video.write(image)
+        video.release()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_labels(self):
+        labeled_files = find_labeled_files(self.footage)
+        labels = {os.path.basename(path): label for label, path in labeled_files}
+        self.assertEqual(labels, {'close.avi': Hand.Pose.CLOSE.value,
+                                  'open_0.jpg': Hand.Pose.OPEN.value,
+                                  'open_1.jpg': Hand.Pose.OPEN.value,
+                                  'open_2.jpg': Hand.Pose.OPEN.value})
+        # Forced label
+        labeled_files = find_labeled_files(os.path.join(self.footage, 'unlabeled'), pose='INDEX_UP')
+        self.assertEqual([label for label, _ in labeled_files], [Hand.Pose.INDEX_UP.value])
+        # Images are grouped by chunks, videos are processed alone
+        jobs = ingest_jobs(find_labeled_files(self.footage), chunk_size=2)
+        self.assertEqual([(kind, len(paths)) for kind, _, paths in jobs], [('video', 1), ('images', 2), ('images', 1)])
+
+    def test_ingest(self):
+        path_to_file = os.path.join(self.tmp_dir.name, 'dataset.hamoco')
+        counts = ingest(find_labeled_files(self.footage), path_to_file, workers=2, chunk_size=2, stride=2, verbose=False)
+        self.assertEqual(counts['frames'], 5 + 3)
+        records = open_dataset(path_to_file)
+        self.assertEqual(records.size, counts['samples'])
+        self.assertEqual(numpy.count_nonzero(records['label'] == Hand.Pose.OPEN.value), 3)
+        self.assertGreater(numpy.count_nonzero(records['label'] == Hand.Pose.CLOSE.value), 0)
+        # Same landmarks for identical images
+        open_features = records['features'][records['label'] == Hand.Pose.OPEN.value]
+        self.assertTrue(numpy.allclose(open_features, open_features[0], atol=1e-5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+
+from hamoco.utils import PreviewRenderer, draw_control_bounds, draw_palm_center, draw_scrolling_origin, write_pose
+import numpy
+import cv2
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.image = cv2.imread(os.path.join(self.data_dir, 'POSE_1_OPEN.jpg'))
+
+    def test_same_as_functions(self):
+        renderer = PreviewRenderer()
+        height, width, _ = self.image.shape
+        for margin in [0.15, 0.3, 0.5]:
+            xmin, ymin = int(margin / 2 * width), int(margin / 2 * height)
+            bounds = [xmin, ymin, width - xmin, height - ymin]
+            expected, image = self.image.copy(), self.image.copy()
+            draw_control_bounds(expected, bounds)
+            draw_palm_center(expected, numpy.array([0.4, 0.6]), size=0.03)
+            draw_scrolling_origin(expected, 0.5, 0.1)
+            write_pose(expected, 'OPEN')
+            renderer.draw_control_bounds(image, bounds)
+            renderer.draw_palm_center(image, numpy.array([0.4, 0.6]), size=0.03)
+            renderer.draw_scrolling_origin(image, 0.5, 0.1)
+            renderer.write_pose(image, 'OPEN')
+            self.assertTrue(numpy.array_equal(image, expected))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import csv
+import json
+import tempfile
+
+from hamoco.profiling import StageProfiler
+
+class Test(unittest.TestCase):
+
+    def test_profiler(self):
+        profiler = StageProfiler(size=8)
+        for i in range(20):
+            start = profiler.now()
+            start = profiler.record('detect', start)
+            profiler.record('predict', start)
+            profiler.frame()
+        profiler.stop(dropped_frames=3)
+        summary = profiler.summary()
+        self.assertEqual(summary['frames'], 20)
+        self.assertEqual(summary['counters']['dropped_frames'], 3)
+        self.assertEqual(list(summary['stages']), ['detect', 'predict'])
+        stats = summary['stages']['detect']
+        self.assertEqual(stats['count'], 20)
+        self.assertLessEqual(stats['p50'], stats['p99'])
+        self.assertLessEqual(stats['p99'], stats['max'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'profile.json')
+            profiler.save(path)
+            with open(path) as file:
+                self.assertEqual(json.load(file)['frames'], 20)
+            path = os.path.join(tmp_dir, 'profile.csv')
+            profiler.save(path)
+            with open(path) as file:
+                rows = list(csv.reader(file))
+            self.assertEqual(len(rows), 3)
+            # Same data as the JSON file
+            row = dict(zip(rows[0], rows[1]))
+            self.assertEqual((row['stage'], row['count'], row['frames'], row['dropped_frames']), ('detect', '20', '20', '3'))
+            self.assertGreater(float(row['fps']), 0)
+
+    def test_disabled(self):
+        profiler = StageProfiler(enabled=False)
+        profiler.record('detect', profiler.now())
+        self.assertEqual(profiler.summary()['stages'], {})
+
+if __name__ == '__main__':
+    unittest.main()
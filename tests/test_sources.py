@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import tempfile
+
+from hamoco.sources import open_source, downscale, ImageDirectorySource, ArraySource
+from hamoco.pipeline import FrameGrabber
+import numpy
+import cv2
+import mediapipe as mp
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def test_image_directory(self):
+        source = open_source(self.data_dir, realtime=False)
+        self.assertIsInstance(source, ImageDirectorySource)
+        self.assertTrue(source.static)
+        n_frames = 0
+        while source.isOpened():
+            success, image = source.read()
+            if success:
+                n_frames += 1
+                self.assertEqual(image.ndim, 3)
+        self.assertEqual(n_frames, len(source.paths))
+
+    def test_frame_stack(self):
+        frames = numpy.arange(10 * 4 * 6 * 3, dtype=numpy.uint8).reshape(10, 4, 6, 3)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'frames.npy')
+            numpy.save(path, frames)
+            # Every frame is handed over by the threaded grabber when no frame is dropped
+            source = open_source(path, realtime=False)
+            self.assertIsInstance(source, ArraySource)
+            capture = FrameGrabber(source, flip=True, latest_only=False).start()
+            images = []
+            while capture.isOpened():
+                success, image = capture.read()
+                if success:
+                    images.append(image)
+            capture.release()
+            self.assertTrue(numpy.array_equal(numpy.array(images), frames[:,:,::-1]))
+            self.assertEqual(source.timestamp, 9 / source.fps)
+
+    def test_downscale(self):
+        image = numpy.zeros((1000, 2000, 3), dtype=numpy.uint8)
+        self.assertEqual(downscale(image, 100).shape, (50, 100, 3))
+        self.assertIs(downscale(image, 4000), image)
+        self.assertIs(downscale(image), image)
+        # Same normalized landmarks as in the full frame
+        image = cv2.imread(os.path.join(self.data_dir, 'POSE_1_OPEN.jpg'))
+        image = cv2.cvtColor(cv2.resize(image, (1600, 1200)), cv2.COLOR_BGR2RGB)
+        with mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=1) as hands:
+            reference = hands.process(image).multi_hand_landmarks[0].landmark
+            landmarks = hands.process(downscale(image, 400)).multi_hand_landmarks[0].landmark
+        expected = [(landmark.x, landmark.y) for landmark in reference]
+        detected = [(landmark.x, landmark.y) for landmark in landmarks]
+        self.assertLess(numpy.abs(numpy.array(expected) - numpy.array(detected)).max(), 0.02)
+
+    def test_grabber_error(self):
+        # A failing capture ends the stream: the error is raised by `read`
+        # instead of blocking on an empty queue
+        class FailingCapture:
+            def isOpened(self):
+                return True
+            def read(self):
+                raise OSError('camera unplugged')
+            def release(self):
+                pass
+        for latest_only in [True, False]:
+            capture = FrameGrabber(FailingCapture(), latest_only=latest_only).start()
+            with self.assertRaises(OSError):
+                capture.read()
+            self.assertFalse(capture.isOpened())
+            capture.release()
+
+if __name__ == '__main':
+    unittest.main()
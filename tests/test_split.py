@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import unittest
+
+from hamoco.utils import train_test_split, stratified_train_test_split, k_fold
+import numpy
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.default_rng(0)
+        self.y = rng.integers(-1, 6, size=1000)
+        self.X = numpy.arange(self.y.size)[:,None].repeat(3, axis=1)
+
+    def test_train_test_split(self):
+        X_train, X_test, y_train, y_test = train_test_split(self.X, self.y, test_size=0.3, seed=1)
+        self.assertEqual(X_train.shape[0], 700)
+        self.assertEqual(sorted(X_train[:,0].tolist() + X_test[:,0].tolist()), list(range(self.y.size)))
+        self.assertTrue(numpy.array_equal(self.y[X_test[:,0]], y_test))
+        # Reproducible, and the global random state is left untouched
+        state = numpy.random.get_state()[1].copy()
+        split = train_test_split(self.X, self.y, test_size=0.3, seed=1)
+        self.assertTrue(numpy.array_equal(split[1], X_test))
+        self.assertTrue(numpy.array_equal(numpy.random.get_state()[1], state))
+
+    def test_stratified_split(self):
+        X_train, X_test, y_train, y_test = stratified_train_test_split(self.X, self.y, test_size=0.25, seed=1)
+        self.assertEqual(sorted(X_train[:,0].tolist() + X_test[:,0].tolist()), list(range(self.y.size)))
+        self.assertTrue(numpy.array_equal(self.y[X_train[:,0]], y_train))
+        for label in numpy.unique(self.y):
+            n_label = numpy.count_nonzero(self.y == label)
+            self.assertEqual(numpy.count_nonzero(y_train == label), int(0.75 * n_label))
+
+    def test_k_fold(self):
+        for stratified in [False, True]:
+            tested = []
+            for train, test in k_fold(self.y, n_splits=4, stratified=stratified, seed=1):
+                self.assertEqual(train.size + test.size, self.y.size)
+                self.assertEqual(numpy.intersect1d(train, test).size, 0)
+                tested.extend(test.tolist())
+                if stratified:
+                    for label in numpy.unique(self.y):
+                        n_label = numpy.count_nonzero(self.y == label)
+                        self.assertLessEqual(abs(4 * numpy.count_nonzero(self.y[test] == label) - n_label), 4)
+            self.assertEqual(sorted(tested), list(range(self.y.size)))
+
+if __name__ == '__main':
+    unittest.main()
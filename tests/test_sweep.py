@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import csv
+import tempfile
+import importlib.util
+
+from hamoco.sweep import Sweep, sweep_configurations
+from hamoco.inference import load_model
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_configurations(self):
+        grid = sweep_configurations(hidden_layers=[(5,5,5), (10,5,5)], learning_rates=[0.1, 0.01], epochs=[1, 2])
+        self.assertEqual(len(grid), 8)
+        self.assertEqual(grid[0], dict(hidden_layers=(5,5,5), learning_rate=0.1, epochs=1))
+        # Random search: distinct configurations of the grid
+        picked = sweep_configurations(hidden_layers=[(5,5,5), (10,5,5)], learning_rates=[0.1, 0.01], epochs=[1, 2], n_random=3, seed=0)
+        self.assertEqual(len(picked), 3)
+        self.assertTrue(all(configuration in grid for configuration in picked))
+        self.assertEqual(len(set(map(str, picked))), 3)
+
+    # The configurations are trained with TensorFlow in worker processes,
+    # where a missing dependency would only be recorded as a failure
+    @unittest.skipUnless(importlib.util.find_spec('tensorflow'), 'TensorFlow is not installed')
+    def test_sweep(self):
+        search = Sweep(self.data_dir, test_size=0.3, seed=0, cache=False)
+        configurations = sweep_configurations(hidden_layers=[(5,5,5)], learning_rates=[0.1, 0.01], epochs=[1])
+        # A failing configuration does not stop the sweep, and is ranked last
+        configurations.insert(0, dict(hidden_layers=(-5,), learning_rate=0.1, epochs=1))
+        results = search.run(configurations, workers=1, verbose=False)
+        self.assertEqual(len(results), 3)
+        self.assertEqual([result['error'] for result in results[:2]], [None, None])
+        self.assertIsNotNone(results[2]['error'])
+        accuracies = [result['accuracy'] for result in results[:2]]
+        self.assertEqual(accuracies, sorted(accuracies, reverse=True))
+        self.assertIs(search.best, results[0])
+        # Best model and leaderboard
+        path_to_model = os.path.join(self.tmp_dir.name, 'best.h5')
+        path_to_leaderboard = os.path.join(self.tmp_dir.name, 'leaderboard.csv')
+        search.save_best(path_to_model)
+        search.save_leaderboard(path_to_leaderboard)
+        search.cleanup()
+        self.assertEqual(load_model(path_to_model).num_classes, 7)
+        with open(path_to_leaderboard) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row['rank'] for row in rows], ['1', '2', '3'])
+        self.assertEqual(rows[0]['hidden_layers'], '5 5 5')
+        self.assertEqual(rows[0]['error'], '')
+        self.assertEqual(rows[2]['accuracy'], '')
+        self.assertNotEqual(rows[2]['error'], '')
+
+if __name__ == '__main__':
+    unittest.main()
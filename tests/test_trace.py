@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import tempfile
+
+from hamoco.trace import TraceWriter, read_trace, iterate_frames
+import numpy
+
+class Test(unittest.TestCase):
+
+    def test_trace(self):
+        rng = numpy.random.default_rng(0)
+        hands = rng.random((3, 21, 2))
+        frames = [(0.0, [], []),
+                  (0.1, [hands[0]], ['Right']),
+                  (0.2, [hands[1], hands[2]], ['Left', 'Right']),
+                  (0.3, [], [])]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'session.trace')
+            with TraceWriter(path) as writer:
+                for timestamp, landmarks, handedness in frames:
+                    writer.record(timestamp, landmarks, handedness, scores=[0.9] * len(landmarks))
+            records = read_trace(path)
+            self.assertEqual(records.size, 5)
+            replayed = list(iterate_frames(records))
+            self.assertEqual(len(replayed), len(frames))
+            for (timestamp, landmarks, handedness), frame in zip(frames, replayed):
+                self.assertEqual(frame[0], timestamp)
+                self.assertEqual(frame[1].shape, (len(landmarks), 21, 2))
+                self.assertTrue(numpy.allclose(frame[1], numpy.reshape(landmarks, (-1, 21, 2))))
+                self.assertEqual(frame[2], handedness)
+            del records
+
+if __name__ == '__main':
+    unittest.main()